@@ -0,0 +1,55 @@
+"""
+Compares the HCAT mapping with dicts and Series.map (one per HCAT column)
+to the compiled HCATLookup, in time and memory of the resulting columns.
+
+Usage: python benchmarks/hcat_lookup.py [rows] [codes]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from fiboa_cli.datasets.commons.hcat import HCAT_ATTRIBUTES, HCATLookup
+
+
+def make_mapping(codes):
+    return [
+        {
+            "original_code": str(i),
+            "translated_name": f"Crop {i}",
+            "HCAT3_name": f"hcat_crop_{i % 300}",
+            "HCAT3_code": str(3300000000 + i % 300),
+        }
+        for i in range(codes)
+    ]
+
+
+def map_dicts(mapping, column):
+    column = column if column.dtype == "object" else column.astype(str)
+    return {
+        attribute: column.map({e["original_code"]: e[attribute] or None for e in mapping})
+        for attribute in HCAT_ATTRIBUTES
+    }
+
+
+def map_compiled(mapping, column):
+    return HCATLookup(mapping, "original_code", list(HCAT_ATTRIBUTES)).lookup(column)
+
+
+def main(rows=10_000_000, codes=500):
+    mapping = make_mapping(codes)
+    # Integer codes, as in many source datasets, incl. some that are not in the mapping
+    column = pd.Series(np.random.default_rng(0).integers(0, codes + 20, rows))
+    print(f"{rows} rows, {codes} codes")
+    for name, fn in {"dict + Series.map": map_dicts, "HCATLookup": map_compiled}.items():
+        start = time.perf_counter()
+        result = fn(mapping, column)
+        seconds = time.perf_counter() - start
+        memory = sum(c.memory_usage(deep=True, index=False) for c in result.values())
+        print(f"{name:>18}: {seconds:7.2f} s, {memory / 1024**2:9.1f} MiB")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
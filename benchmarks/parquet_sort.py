@@ -0,0 +1,84 @@
+"""
+Compares bbox-filtered reads of a GeoParquet file in random order (as written by
+`fiboa convert --stream`) with the same file sorted along a Hilbert curve (`--sort`).
+
+Reports the number of row groups that the bbox statistics can't skip and the read time
+for random query boxes, e.g. on the output of `fiboa convert nl` or `fiboa convert fr`.
+The file needs a bbox covering column (GeoParquet 1.1).
+
+Usage: python benchmarks/parquet_sort.py <file> [queries] [box size in 1/1000 of the extent]
+"""
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from vecorel_cli.encoding.geoparquet import GeoParquet
+
+from fiboa_cli.parquet.sort import hilbert_sort_file
+
+
+def bbox_statistics(pf: pq.ParquetFile) -> np.ndarray:
+    """Min/max of the bbox covering columns per row group"""
+    paths = {pf.metadata.schema.column(i).path: i for i in range(pf.metadata.num_columns)}
+    stats = []
+    for rg in range(pf.num_row_groups):
+        row_group = pf.metadata.row_group(rg)
+        get = lambda name: row_group.column(paths[f"bbox.{name}"]).statistics  # noqa: E731
+        stats.append([get("xmin").min, get("ymin").min, get("xmax").max, get("ymax").max])
+    return np.array(stats)
+
+
+def query(path, stats, box):
+    xmin, ymin, xmax, ymax = box
+    touched = (
+        (stats[:, 0] <= xmax)
+        & (stats[:, 2] >= xmin)
+        & (stats[:, 1] <= ymax)
+        & (stats[:, 3] >= ymin)
+    ).sum()
+    expr = (
+        (ds.field("bbox", "xmin") <= xmax)
+        & (ds.field("bbox", "xmax") >= xmin)
+        & (ds.field("bbox", "ymin") <= ymax)
+        & (ds.field("bbox", "ymax") >= ymin)
+    )
+    start = time.perf_counter()
+    rows = ds.dataset(path).to_table(filter=expr).num_rows
+    return touched, rows, time.perf_counter() - start
+
+
+def main(file, queries=50, size=20):
+    table = pq.read_table(file)
+    geo = json.loads(table.schema.metadata[b"geo"])
+    xmin, ymin, xmax, ymax = geo["columns"][geo["primary_column"]]["bbox"]
+    rng = np.random.default_rng(0)
+    w, h = (xmax - xmin) * size / 1000, (ymax - ymin) * size / 1000
+    x, y = rng.uniform(xmin, xmax - w, queries), rng.uniform(ymin, ymax - h, queries)
+    boxes = np.column_stack([x, y, x + w, y + h])
+
+    with tempfile.TemporaryDirectory() as folder:
+        unsorted = Path(folder) / "unsorted.parquet"
+        table = table.take(rng.permutation(table.num_rows))
+        pq.write_table(table, unsorted, row_group_size=GeoParquet.row_group_size)
+        del table
+        start = time.perf_counter()
+        sorted_file = hilbert_sort_file(unsorted, Path(folder) / "sorted.parquet")
+        print(f"Sorted in {time.perf_counter() - start:.1f}s")
+
+        for name, path in {"unsorted": unsorted, "hilbert": sorted_file}.items():
+            stats = bbox_statistics(pq.ParquetFile(path))
+            results = np.array([query(path, stats, box) for box in boxes])
+            print(
+                f"{name:>10}: {results[:, 0].mean():7.1f} of {len(stats)} row groups, "
+                f"{results[:, 1].mean():9.1f} rows, {results[:, 2].mean() * 1000:8.1f} ms per query"
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], *map(int, sys.argv[2:]))
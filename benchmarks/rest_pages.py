@@ -0,0 +1,58 @@
+"""
+Compares the time to parse Esri REST pages per 1,000 features:
+GeoJSON (GDAL), Esri JSON (vectorized decoder) and the Arrow IPC page cache.
+
+Usage: python benchmarks/rest_pages.py [features] [vertices]
+"""
+
+import json
+import sys
+import timeit
+from io import BytesIO
+
+import geopandas as gpd
+import numpy as np
+
+from fiboa_cli.conversion.esri_json import read_esri_json
+from fiboa_cli.conversion.rest_cache import page_from_ipc, page_to_ipc
+
+
+def make_pages(count, vertices):
+    rng = np.random.default_rng(0)
+    angles = np.linspace(2 * np.pi, 0, vertices, endpoint=False)
+    geojson, esri = [], []
+    for i in range(count):
+        x, y = rng.uniform(-5, 5), rng.uniform(40, 50)
+        radius = rng.uniform(0.001, 0.01, vertices)
+        ring = np.column_stack([x + radius * np.cos(angles), y + radius * np.sin(angles)])
+        ring = np.vstack([ring, ring[:1]]).round(7).tolist()
+        attributes = {"OBJECTID": i, "USO_SIGPAC": "TA", "SUPERFICIE": float(rng.uniform(1, 9))}
+        esri.append({"attributes": attributes, "geometry": {"rings": [ring]}})
+        geojson.append(
+            {
+                "type": "Feature",
+                "properties": attributes,
+                "geometry": {"type": "Polygon", "coordinates": [ring[::-1]]},
+            }
+        )
+    geojson = json.dumps({"type": "FeatureCollection", "features": geojson}).encode()
+    esri = json.dumps({"spatialReference": {"wkid": 4326}, "features": esri}).encode()
+    return geojson, esri
+
+
+def main(count=10000, vertices=20, repeat=5):
+    geojson, esri = make_pages(count, vertices)
+    ipc = page_to_ipc(read_esri_json(esri))
+    candidates = {
+        "geojson (GDAL)": lambda: gpd.read_file(BytesIO(geojson)),
+        "esri json (vectorized)": lambda: read_esri_json(esri),
+        "arrow ipc (cache)": lambda: page_from_ipc(ipc),
+    }
+    print(f"{count} features, {vertices} vertices per polygon")
+    for name, fn in candidates.items():
+        seconds = min(timeit.repeat(fn, number=1, repeat=repeat))
+        print(f"{name:>24}: {seconds / count * 1000 * 1000:8.2f} ms per 1,000 features")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
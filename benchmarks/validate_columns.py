@@ -0,0 +1,54 @@
+"""
+Compares the validation of the values of a GeoParquet file value by value (validate_column
+of vecorel_cli) with the column-wise checks that `fiboa validate -n -1` uses.
+
+Both validations get the same property schemas, e.g. of the output of `fiboa convert nl`.
+Reports the time per property and the number of offending values that were found.
+
+Usage: python benchmarks/validate_columns.py <file> [rows]
+"""
+
+import sys
+import time
+
+import pyarrow.parquet as pq
+from geopandas.io.arrow import _arrow_to_geopandas
+from vecorel_cli.encoding.geoparquet import GeoParquet
+from vecorel_cli.validation.data import validate_column
+
+from fiboa_cli.parquet.checks import check_column
+
+
+def main(file, rows=None):
+    encoding = GeoParquet(file)
+    geo = encoding.get_geoparquet_metadata()
+    properties = encoding.get_collection().merge_schemas().get("properties", {})
+    table = pq.read_table(file)
+    if rows is not None:
+        table = table.slice(0, rows)
+    data = _arrow_to_geopandas(table, geo)
+    print(f"{table.num_rows} rows")
+
+    total_rows, total_columns = 0.0, 0.0
+    for key in table.column_names:
+        rules = properties.get(key)
+        if not rules or "type" not in rules:
+            continue
+        t = time.perf_counter()
+        validate_column(data[key], rules)
+        t_rows = time.perf_counter() - t
+        t = time.perf_counter()
+        issues = check_column(table.column(key), rules)
+        t_columns = time.perf_counter() - t
+        if issues is None:
+            print(f"{key:30} {t_rows:8.3f}s  can't be checked column-wise")
+            continue
+        invalid = sum(len(rows) for _, rows in issues)
+        total_rows += t_rows
+        total_columns += t_columns
+        print(f"{key:30} {t_rows:8.3f}s {t_columns:8.3f}s  {invalid} invalid")
+    print(f"{'total':30} {total_rows:8.3f}s {total_columns:8.3f}s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -0,0 +1,54 @@
+from glob import glob
+
+import click
+from vecorel_cli.cli.path_url import PathOrURL
+from vecorel_cli.registry import Registry
+
+
+class PathOrGlob(PathOrURL):
+    """Like PathOrURL, but also expands glob patterns (e.g. 'data/**/*.parquet') to files."""
+
+    name = "path_or_glob"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, str) and "://" not in value and any(c in value for c in "*?["):
+            files = sorted(glob(value, recursive=True))
+            if len(files) == 0:
+                self.fail(f"No files found for pattern '{value}'", param, ctx)
+            converted = [super(PathOrGlob, self).convert(f, param, ctx) for f in files]
+            return tuple(PathOrURL.flatten_tuples(ctx, param, converted))
+        return super().convert(value, param, ctx)
+
+
+FILES_OR_GLOB_ARG = click.argument(
+    "source",
+    type=PathOrGlob(multiple=True, extensions=Registry.get_file_extensions()),
+    nargs=-1,
+    callback=PathOrURL.flatten_tuples,
+)
+
+TARGET_FILE_OR_FOLDER = click.option(
+    "--target",
+    "--out",  # for backward compatibility
+    "-o",
+    type=click.Path(exists=False, dir_okay=True, resolve_path=True),
+    help=f"File or folder to write the {Registry.project} file(s) to. If not provided, the source file(s) will be overwritten.",
+    default=None,
+)
+
+WORKERS = click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    help="Number of parallel processes. Defaults to FIBOA_WORKERS or the number of CPUs.",
+    default=None,
+)
+
+PARTITION_BY = click.option(
+    "--partition-by",
+    "partition_by",
+    type=click.STRING,
+    multiple=True,
+    help="Writes a hive-partitioned dataset to the target folder instead of a single file, e.g. `--partition-by admin:subdivision_code --partition-by year`. The year is derived from determination:datetime. Existing partitions that are not in the data are kept.",
+    default=None,
+)
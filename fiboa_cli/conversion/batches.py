@@ -0,0 +1,48 @@
+import json
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyogrio
+import shapely
+from geopandas import GeoDataFrame
+from geopandas.io.arrow import _arrow_to_geopandas
+
+
+def read_file_batches(
+    path, batch_size: int, layer=None, on_invalid="raise", **kwargs
+) -> Iterator[GeoDataFrame]:
+    """
+    Reads a file that GDAL supports in batches of at most batch_size features.
+
+    Uses the Arrow stream of pyogrio, so only a single batch is in memory at once.
+    The batches look like the result of geopandas.read_file, the index continues over
+    all batches so that it's the same as if the file was read at once.
+    """
+    offset = 0
+    with pyogrio.open_arrow(
+        path, layer=layer, batch_size=batch_size, use_pyarrow=True, **kwargs
+    ) as (meta, reader):
+        geometry_name = meta["geometry_name"] or "wkb_geometry"
+        for batch in reader:
+            wkb = batch.column(geometry_name)
+            if isinstance(wkb, pa.ExtensionArray):
+                wkb = wkb.storage
+            geometry = shapely.from_wkb(wkb.to_numpy(zero_copy_only=False), on_invalid=on_invalid)
+            data = batch.drop_columns([geometry_name]).to_pandas()
+            data.index = pd.RangeIndex(offset, offset + len(data))
+            offset += len(data)
+            yield GeoDataFrame(data, geometry=geometry, crs=meta["crs"])
+
+
+def read_parquet_batches(path, batch_size: int) -> Iterator[GeoDataFrame]:
+    """Reads a GeoParquet file in batches of at most batch_size rows"""
+    pf = pq.ParquetFile(path)
+    geo_metadata = json.loads(pf.schema_arrow.metadata[b"geo"])
+    offset = 0
+    for batch in pf.iter_batches(batch_size=batch_size):
+        data = _arrow_to_geopandas(pa.Table.from_batches([batch]), geo_metadata)
+        data.index = pd.RangeIndex(offset, offset + len(data))
+        offset += len(data)
+        yield data
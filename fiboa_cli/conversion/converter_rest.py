@@ -1,9 +1,15 @@
+import hashlib
+import json
 import os
+from io import BytesIO
 from urllib.parse import urlencode
 
 import geopandas as gpd
 import requests
-from vecorel_cli.vecorel.util import get_fs, stream_file
+
+from ..parallel import default_workers, ordered_map
+from .esri_json import read_esri_json
+from .rest_cache import RESTPageCache, page_from_ipc, page_to_ipc
 
 
 class EsriRESTConverterMixin:
@@ -11,6 +17,11 @@ class EsriRESTConverterMixin:
     rest_base_url = None
     rest_params = {}
     rest_attribute = "OBJECTID"  # orderable, filterable, indexed
+    # Number of pages to download in parallel, None uses all CPUs, 1 pages through the layer sequentially
+    rest_workers = None
+    # Format of the pages, "geojson" is parsed by GDAL. Esri JSON ("json") is decoded much faster,
+    # but the column types are derived from the values and only (non-curved) polygons are supported.
+    rest_format = "geojson"
 
     def rest_layer_filter(self, layers):
         return next(iter(layers))
@@ -32,47 +43,224 @@ class EsriRESTConverterMixin:
         # This happens when input_file param is used
         return super().download_files(uris, cache_folder)
 
+    def rest_where(self, condition):
+        # Combine the condition with the where-clause of the converter, if any
+        where = self.rest_params.get("where")
+        return f"({where}) AND {condition}" if where else condition
+
+    def rest_query_params(self, page_size, fmt="json"):
+        params = self.rest_params | {
+            "outFields": "*",
+            "returnGeometry": "true",
+            "f": fmt,
+            "sortBy": self.rest_attribute,
+            "resultRecordCount": page_size,
+        }
+        if fmt == "json":
+            # GeoJSON is always in WGS84, request the same for Esri JSON
+            params["outSR"] = 4326
+        return params
+
+    def rest_object_ids(self, session, layer_url):
+        """Get the sorted list of object IDs of the layer, None if not usable for paging"""
+        params = self.rest_params | {
+            "where": self.rest_where("1=1"),
+            "returnIdsOnly": "true",
+            "f": "json",
+        }
+        response = session.get(layer_url, params=params)
+        response.raise_for_status()
+        result = response.json()
+        if "error" in result or result.get("objectIdFieldName") != self.rest_attribute:
+            return None
+        return sorted(result.get("objectIds") or [])
+
+    def rest_fetch_page(self, session, url):
+        response = session.get(url)
+        response.raise_for_status()
+        content = response.content
+        if content.startswith(b'{"error"'):
+            raise Exception(f"REST service returned an error for {url}: {content.decode()}")
+        return content
+
+    def rest_parse_page(self, content, fmt="json"):
+        if fmt == "json":
+            return read_esri_json(content)
+        return gpd.read_file(BytesIO(content))
+
+    def rest_service_metadata_file(self, base_url, cache_folder):
+        digest = hashlib.sha256(base_url.encode()).hexdigest()[:12]
+        return os.path.join(cache_folder, f"{self.id}_{digest}.service.json")
+
+    def rest_check_service_metadata(self, service_metadata, base_url):
+        if not isinstance(service_metadata, dict):
+            raise Exception(f"REST service returned invalid metadata for {base_url}")
+        if "error" in service_metadata:
+            error = json.dumps(service_metadata["error"])
+            raise Exception(f"REST service returned an error for {base_url}: {error}")
+        for key in ("layers", "maxRecordCount"):
+            if key not in service_metadata:
+                raise Exception(f"REST service metadata for {base_url} has no {key}")
+
+    def rest_cached_service_metadata(self, base_url, cache_fs, cache_folder):
+        """Service metadata from the cache, None if it's not cached or not valid"""
+        cache_file = self.rest_service_metadata_file(base_url, cache_folder)
+        if not cache_fs.exists(cache_file):
+            return None
+        try:
+            with cache_fs.open(cache_file, mode="r") as file:
+                service_metadata = json.load(file)
+            self.rest_check_service_metadata(service_metadata, base_url)
+            return service_metadata
+        except Exception as e:
+            self.warning(f"Ignoring cached service metadata {cache_file}: {e}")
+            return None
+
+    def rest_service_metadata(self, base_url, cache_fs, cache_folder, refresh=False):
+        # The service metadata is cached so that a completely cached layer can be read offline
+        if not refresh:
+            service_metadata = self.rest_cached_service_metadata(base_url, cache_fs, cache_folder)
+            if service_metadata is not None:
+                return service_metadata
+
+        response = requests.get(base_url, {"f": "pjson"})
+        response.raise_for_status()
+        service_metadata = response.json()
+        # Errors must not be cached, they would be read again in the next run
+        self.rest_check_service_metadata(service_metadata, base_url)
+        cache_file = self.rest_service_metadata_file(base_url, cache_folder)
+        with cache_fs.open(cache_file, mode="w") as file:
+            json.dump(service_metadata, file)
+        return service_metadata
+
+    def rest_page_cache(self, base_url, service_metadata, cache_fs, cache_folder):
+        layer = self.rest_layer_filter(service_metadata["layers"])
+        page_size = service_metadata["maxRecordCount"]
+        layer_url = f"{base_url}/{layer['id']}/query"
+        params = self.rest_query_params(page_size, self.rest_format)
+        query = {"url": layer_url} | params
+        cache = RESTPageCache(cache_fs, cache_folder, f"{self.id}_{layer['id']}", query)
+        return layer, params, layer_url, cache
+
     def get_data(self, paths, **kwargs):
         if not paths[0].startswith("http"):
             # This happens when input_file param is used
             return super().get_data(paths, **kwargs)
 
-        base_url = paths[0]  # loop over paths to support more than 1 source
-        source_fs = get_fs(base_url)
+        return self.read_rest_layer(paths[0])
+
+    def read_rest_layer(self, base_url):
         cache_fs, cache_folder = self.get_cache(self.cache_folder)
 
-        service_metadata = requests.get(base_url, {"f": "pjson"}).json()
-        layer = self.rest_layer_filter(service_metadata["layers"])
-        page_size = service_metadata["maxRecordCount"]
-        layer_url = f"{base_url}/{layer['id']}/query"
-        get_dict = self.rest_params | {
-            "outFields": "*",
-            "returnGeometry": "true",
-            "f": "geojson",
-            "sortBy": self.rest_attribute,
-            "resultRecordCount": page_size,
-        }
-        gdfs = []
-        last_id = -1
-        while True:
-            get_dict["where"] = f"{self.rest_attribute}>{last_id}"
-            url = f"{layer_url}?{urlencode(get_dict)}"
-            if cache_fs is not None:
-                cache_file = os.path.join(
-                    cache_folder, f"{self.id}_{layer['id']}_{last_id}.geojson"
+        # A completely cached layer is read with the cached metadata, otherwise the metadata is
+        # fetched (once) to make sure that the pages are requested from the current service
+        service_metadata = self.rest_cached_service_metadata(base_url, cache_fs, cache_folder)
+        cache = None
+        if service_metadata is not None:
+            try:
+                layer, params, layer_url, cache = self.rest_page_cache(
+                    base_url, service_metadata, cache_fs, cache_folder
                 )
-                if not cache_fs.exists(cache_file):
-                    with cache_fs.open(cache_file, mode="wb") as file:
-                        stream_file(source_fs, url, file)
-                url = cache_file
-
-            data = gpd.read_file(url)
-            print(
-                f"Read {len(data)} features, page {len(gdfs)} from [{data.iloc[0, 0]} ... {data.iloc[-1, 0]}]"
+            except StopIteration:
+                cache = None
+        if cache is None or not cache.complete:
+            service_metadata = self.rest_service_metadata(
+                base_url, cache_fs, cache_folder, refresh=True
             )
-            last_id = data[self.rest_attribute].values[-1]
+            layer, params, layer_url, cache = self.rest_page_cache(
+                base_url, service_metadata, cache_fs, cache_folder
+            )
+
+        workers = default_workers() if self.rest_workers is None else self.rest_workers
+        with requests.Session() as session:
+            if cache.complete:
+                self.info(f"Reading {len(cache.pages)} cached pages")
+                pages = self.rest_pages_cached(cache, workers)
+            else:
+                ids = self.rest_object_ids(session, layer_url) if workers > 1 else None
+                if ids is None:
+                    pages = self.rest_pages_sequential(session, layer_url, params, cache, workers)
+                else:
+                    pages = self.rest_pages_concurrent(
+                        session, layer_url, params, ids, workers, cache
+                    )
+
+            for index, data in enumerate(pages):
+                if len(data) > 0:
+                    first, last = data[self.rest_attribute].values[[0, -1]]
+                    self.info(f"Read {len(data)} features, page {index} from [{first} ... {last}]")
+                yield data, base_url, base_url, layer["id"]
 
-            yield data, base_url, base_url, layer["id"]
+    def rest_read_cached_page(self, cache, page):
+        content = cache.read(page)
+        return None if content is None else page_from_ipc(content)
 
-            if not len(data) >= page_size:
+    def rest_pages_cached(self, cache, workers):
+        for data in ordered_map(
+            lambda p: self.rest_read_cached_page(cache, p), cache.pages, workers
+        ):
+            if data is None:
+                raise Exception(f"Cached page is corrupt, remove {cache.path} and try again")
+            yield data
+
+    def rest_pages_sequential(self, session, layer_url, params, cache, workers):
+        # Each page starts after the last id of the previous page, so pages are requested one by one.
+        # Pages from a previous run are re-used until the first missing or corrupt page or the
+        # first page that doesn't start right after the previous page. Pages from a concurrent
+        # run don't record the previous id, they may have been written with gaps in between.
+        last_id = -1
+        windows = []
+        cached = ordered_map(lambda p: self.rest_read_cached_page(cache, p), cache.pages, workers)
+        for page, data in zip(cache.pages, cached):
+            if data is None or page.get("after") != last_id:
+                break
+            yield data
+            windows.append(page["window"])
+            last_id = page["window"][1]
+        cached.close()
+
+        get_dict = dict(params)
+        page_size = params["resultRecordCount"]
+        while True:
+            get_dict["where"] = self.rest_where(f"{self.rest_attribute}>{last_id}")
+            url = f"{layer_url}?{urlencode(get_dict)}"
+            content = self.rest_fetch_page(session, url)
+            data = self.rest_parse_page(content, params["f"])
+            if len(data) > 0:
+                window = data[self.rest_attribute].values[[0, -1]].tolist()
+                cache.write(window, page_to_ipc(data), len(data), after=last_id)
+                windows.append(window)
+            yield data
+
+            if len(data) < page_size:
+                cache.finish(windows)
                 break
+            last_id = window[1]
+
+    def rest_pages_concurrent(self, session, layer_url, params, ids, workers, cache):
+        # Split the known IDs in windows of at most page_size features, fetch them in parallel
+        page_size = params["resultRecordCount"]
+        windows = [
+            (ids[i], ids[min(i + page_size, len(ids)) - 1]) for i in range(0, len(ids), page_size)
+        ]
+        self.info(f"Fetching {len(ids)} features in {len(windows)} pages with {workers} workers")
+        attribute = self.rest_attribute
+
+        def fetch(window):
+            page = cache.find(window)
+            if page is not None:
+                data = self.rest_read_cached_page(cache, page)
+                if data is not None:
+                    return data
+
+            low, high = window
+            where = self.rest_where(f"{attribute}>={low} AND {attribute}<={high}")
+            content = self.rest_fetch_page(
+                session, f"{layer_url}?{urlencode(params | {'where': where})}"
+            )
+            data = self.rest_parse_page(content, params["f"])
+            cache.write(window, page_to_ipc(data), len(data))
+            return data
+
+        yield from ordered_map(fetch, windows, workers=workers)
+        cache.finish(windows)
@@ -0,0 +1,214 @@
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from io import BytesIO
+from itertools import count
+from typing import Optional
+
+import geopandas as gpd
+
+from ..parallel import default_workers, ordered_map
+from .download import create_session
+
+HITS_PATTERN = re.compile(rb'number(?:Matched|OfFeatures)="(\d+)"')
+MEMBER_PATTERN = re.compile(rb"<(?:\w+:)?(?:member|featureMember|featureMembers)[\s>]")
+
+
+class WFSConverterMixin:
+    """
+    Reads all features of a WFS 2.0 feature type page by page.
+
+    The number of features is requested first (resultType=hits) to fetch exactly the pages
+    that are needed in parallel. If the service doesn't report the number of features,
+    pages are fetched until an empty page is returned.
+    The GML of each page is parsed in memory, nothing is written to the cache.
+    """
+
+    wfs_url = None
+    wfs_type_names = None
+    wfs_version = "2.0.0"
+    wfs_params = {}
+    # Must not be larger than the maximum number of features that the service returns at once
+    wfs_page_size = 1000
+    # Number of pages to download in parallel, None uses all CPUs
+    wfs_workers = None
+
+    def get_urls(self):
+        assert self.wfs_url and self.wfs_type_names, (
+            "Either define {c}.wfs_url and {c}.wfs_type_names or override {c}.get_urls()".format(
+                c=self.__class__.__name__
+            )
+        )
+        return {"WFS": self.wfs_url}
+
+    def download_files(self, uris, cache_folder=None):
+        # Read-data will stream all pages of the WFS
+        if next(iter(uris), "").startswith("WFS"):
+            return list(uris.values())
+
+        # This happens when input_file param is used
+        return super().download_files(uris, cache_folder)
+
+    def wfs_query_params(self, **kwargs):
+        return (
+            {
+                "service": "WFS",
+                "version": self.wfs_version,
+                "request": "GetFeature",
+                "typeNames": self.wfs_type_names,
+            }
+            | self.wfs_params
+            | kwargs
+        )
+
+    def wfs_fetch(self, session, url, params) -> bytes:
+        response = session.get(url, params=params)
+        response.raise_for_status()
+        content = response.content
+        if b"ExceptionReport" in content[:1000]:
+            raise Exception(f"WFS returned an error for {response.url}: {content.decode()}")
+        return content
+
+    def wfs_hits(self, session, url) -> Optional[int]:
+        """Number of features, None if the service doesn't report it"""
+        content = self.wfs_fetch(session, url, self.wfs_query_params(resultType="hits"))
+        match = HITS_PATTERN.search(content[:2000])
+        return int(match.group(1)) if match else None
+
+    def wfs_parse_page(self, content: bytes) -> gpd.GeoDataFrame:
+        # GDAL can't open a GML document without features
+        if not MEMBER_PATTERN.search(content):
+            return gpd.GeoDataFrame()
+        return gpd.read_file(BytesIO(content))
+
+    def wfs_fetch_page(self, session, url, start) -> gpd.GeoDataFrame:
+        params = self.wfs_query_params(count=self.wfs_page_size, startIndex=start)
+        return self.wfs_parse_page(self.wfs_fetch(session, url, params))
+
+    def get_data(self, paths, **kwargs):
+        if not isinstance(paths[0], str):
+            # This happens when input_file param is used
+            return super().get_data(paths, **kwargs)
+
+        return self.read_wfs(paths[0])
+
+    def read_wfs(self, url):
+        workers = default_workers() if self.wfs_workers is None else self.wfs_workers
+        size = self.wfs_page_size
+        with create_session(pool_size=max(workers, 1)) as session:
+            total = self.wfs_hits(session, url)
+            if total is None:
+                self.info(f"Fetching pages of {size} features with {workers} workers")
+                starts = count(0, size)
+            else:
+                starts = range(0, total, size)
+                self.info(
+                    f"Fetching {total} features in {len(starts)} pages with {workers} workers"
+                )
+
+            pages = ordered_map(
+                lambda start: self.wfs_fetch_page(session, url, start), starts, workers
+            )
+            try:
+                for index, data in enumerate(pages):
+                    if len(data) == 0:
+                        break
+                    start = index * size
+                    if total is not None and len(data) < size and start + len(data) < total:
+                        raise ValueError(
+                            f"WFS returned {len(data)} instead of {size} features, reduce wfs_page_size"
+                        )
+                    self.info(f"Read {len(data)} features, page {index}")
+                    yield data, url, url, None
+            finally:
+                pages.close()
+
+
+class TiledWFSConverterMixin(WFSConverterMixin):
+    """
+    Reads all features of a WFS feature type tile by tile, for services that don't page.
+
+    The extent is split into a grid of tiles which are requested in parallel. A tile that
+    hits the feature limit of the service is split into four tiles, which are requested
+    again. Features that intersect multiple tiles are only returned once.
+    """
+
+    # Extent to read, in the axis order and CRS that the BBOX parameter of the service expects
+    wfs_bbox = None
+    # Number of tiles per axis to start with
+    wfs_tiles = 2
+    # Number of times a tile can be split
+    wfs_max_depth = 8
+    # Unique identifier to remove duplicate features of neighbouring tiles
+    wfs_id_column = "gml_id"
+
+    def get_urls(self):
+        assert self.wfs_bbox and len(self.wfs_bbox) == 4, (
+            f"Define {self.__class__.__name__}.wfs_bbox as a bounding box with 4 numbers"
+        )
+        return super().get_urls()
+
+    def wfs_initial_tiles(self) -> list[tuple]:
+        x1, y1, x2, y2 = self.wfs_bbox
+        n = self.wfs_tiles
+        dx, dy = (x2 - x1) / n, (y2 - y1) / n
+        return [
+            (x1 + i * dx, y1 + j * dy, x1 + (i + 1) * dx, y1 + (j + 1) * dy)
+            for i in range(n)
+            for j in range(n)
+        ]
+
+    def wfs_fetch_tile(self, session, url, tile) -> tuple[gpd.GeoDataFrame, bool]:
+        """Returns the features of the tile and whether these are all features of the tile"""
+        params = self.wfs_query_params(count=self.wfs_page_size, bbox=",".join(map(str, tile)))
+        content = self.wfs_fetch(session, url, params)
+        data = self.wfs_parse_page(content)
+        match = HITS_PATTERN.search(content[:2000])
+        if match:
+            return data, int(match.group(1)) <= len(data)
+        return data, len(data) < self.wfs_page_size
+
+    def read_wfs(self, url):
+        workers = default_workers() if self.wfs_workers is None else self.wfs_workers
+        tiles = self.wfs_initial_tiles()
+        self.info(f"Fetching features in {len(tiles)} tiles with {workers} workers")
+        seen = set()
+        with (
+            create_session(pool_size=max(workers, 1)) as session,
+            ThreadPoolExecutor(max_workers=max(workers, 1)) as executor,
+        ):
+
+            def submit(tile, depth):
+                future = executor.submit(self.wfs_fetch_tile, session, url, tile)
+                pending[future] = (tile, depth)
+
+            pending = {}
+            for tile in tiles:
+                submit(tile, 0)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tile, depth = pending.pop(future)
+                    data, complete = future.result()
+                    if not complete:
+                        if depth >= self.wfs_max_depth:
+                            raise ValueError(f"Too many features in tile {tile}, can't split again")
+                        x1, y1, x2, y2 = tile
+                        xm, ym = (x1 + x2) / 2, (y1 + y2) / 2
+                        for sub in [
+                            (x1, y1, xm, ym),
+                            (xm, y1, x2, ym),
+                            (x1, ym, xm, y2),
+                            (xm, ym, x2, y2),
+                        ]:
+                            submit(sub, depth + 1)
+                        continue
+
+                    if len(data) == 0:
+                        continue
+                    ids = data[self.wfs_id_column]
+                    data = data[~ids.isin(seen) & ~ids.duplicated()]
+                    seen.update(data[self.wfs_id_column])
+                    if len(data) > 0:
+                        self.info(f"Read {len(data)} new features from tile {tile}")
+                        yield data, url, url, None
@@ -0,0 +1,52 @@
+import numpy as np
+import shapely
+
+
+def connected_components(geometries: np.ndarray) -> np.ndarray:
+    """
+    Labels the groups of geometries that intersect each other, directly or through others.
+
+    The union of the geometries of a group doesn't depend on any other group, so the groups
+    can be unioned separately instead of computing a single large union.
+    """
+    left, right = shapely.STRtree(geometries).query(geometries, predicate="intersects")
+    labels = np.arange(len(geometries))
+    while True:
+        previous = labels
+        labels = labels.copy()
+        # Every geometry takes the smallest label of the geometries it intersects
+        np.minimum.at(labels, left, labels[right])
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def union_components(geometries: np.ndarray) -> np.ndarray:
+    """Unions the intersecting geometries and returns the resulting polygons"""
+    labels = connected_components(geometries)
+    order = np.argsort(labels, kind="stable")
+    groups = np.split(order, np.flatnonzero(np.diff(labels[order])) + 1)
+
+    singles = np.array([group[0] for group in groups if len(group) == 1], dtype=int)
+    unions = shapely.union_all(geometries[singles, np.newaxis], axis=1)
+    merged = [shapely.union_all(geometries[group]) for group in groups if len(group) > 1]
+    return shapely.get_parts(np.concatenate([unions, np.array(merged, dtype=object)]))
+
+
+def dissolve_parts(codes: np.ndarray, wkb: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Merges the intersecting geometries with the same code, like GeoDataFrame.dissolve(by=...)
+    followed by explode().
+
+    Geometries are passed as WKB so that the function can run in a separate process.
+    Returns the codes (sorted) and the resulting polygons as WKB.
+    """
+    geometries = shapely.from_wkb(wkb)
+    result_codes, parts = [], []
+    for code in np.unique(codes):
+        polygons = union_components(geometries[codes == code])
+        result_codes.append(np.full(len(polygons), code))
+        parts.append(polygons)
+    if len(parts) == 0:
+        return codes[:0], wkb[:0]
+    return np.concatenate(result_codes), shapely.to_wkb(np.concatenate(parts))
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from vecorel_cli.vecorel.util import name_from_uri
+
+from ..parallel import ordered_map
+
+# Errors while streaming the response body, urllib3 only retries before the body is read
+STREAM_ERRORS = (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError)
+
+
+def create_session(pool_size: int = 10, retries: int = 3, verify: bool = True) -> requests.Session:
+    """HTTP session with a connection pool that retries failed connections and server errors"""
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.verify = verify
+    return session
+
+
+def is_http(uri) -> bool:
+    return isinstance(uri, str) and uri.startswith(("http://", "https://"))
+
+
+def get_cache_name(uri: str, target) -> str:
+    """File name of a source in the cache, the same as BaseConverter.download_files uses"""
+    if isinstance(target, list):
+        name = name_from_uri(uri)
+        # if there's no file extension, it's likely a folder, which may not be unique
+        if "." not in name:
+            name = hashlib.sha256(uri.encode()).hexdigest()
+        return name
+    return target
+
+
+def is_cached(cache_folder: str, name: str, is_archive: bool) -> bool:
+    if os.path.exists(os.path.join(cache_folder, name)):
+        return True
+    zip_folder = os.path.join(cache_folder, "extracted." + os.path.splitext(name)[0])
+    return is_archive and os.path.exists(zip_folder)
+
+
+def download_file(
+    session: requests.Session,
+    uri: str,
+    target: str,
+    retries: int = 3,
+    chunk_size: int = 1024 * 1024,
+    timeout: float = 60,
+) -> int:
+    """
+    Streams a file to the target path and returns the number of bytes.
+
+    The data is written to `<target>.part` and only renamed to the target once complete,
+    so an interrupted download never leaves a partial file behind.
+    """
+    part = f"{target}.part"
+    for attempt in range(retries + 1):
+        try:
+            size = 0
+            with session.get(uri, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                with open(part, "wb") as file:
+                    for chunk in response.iter_content(chunk_size):
+                        file.write(chunk)
+                        size += len(chunk)
+            os.replace(part, target)
+            return size
+        except STREAM_ERRORS:
+            if attempt >= retries:
+                raise
+            time.sleep(0.5 * 2**attempt)
+        finally:
+            if os.path.exists(part):
+                os.remove(part)
+
+
+def download_files(
+    downloads: dict[str, str],
+    workers: int = 4,
+    retries: int = 3,
+    verify: bool = True,
+) -> dict:
+    """
+    Downloads the files concurrently, `downloads` maps the URLs to the target paths.
+
+    All downloads share a pooled HTTP session. Returns a summary with the number of
+    files and bytes, the duration in seconds and the failed URLs with the error message.
+    """
+    start = time.perf_counter()
+    workers = max(1, min(workers, len(downloads)))
+
+    with create_session(pool_size=workers, retries=retries, verify=verify) as session:
+
+        def download(item):
+            uri, target = item
+            try:
+                return uri, download_file(session, uri, target, retries=retries), None
+            except Exception as e:
+                return uri, 0, str(e)
+
+        results = list(ordered_map(download, downloads.items(), workers=workers))
+
+    return {
+        "files": sum(1 for _, _, error in results if error is None),
+        "bytes": sum(size for _, size, _ in results),
+        "seconds": time.perf_counter() - start,
+        "failed": {uri: error for uri, _, error in results if error is not None},
+    }
+
+
+def format_throughput(summary: dict) -> str:
+    mb = summary["bytes"] / 1024 / 1024
+    seconds = max(summary["seconds"], 1e-6)
+    return f"{summary['files']} files ({mb:.1f} MB) in {seconds:.1f}s, {mb / seconds:.1f} MB/s"
+
+
+def get_downloads(uris: dict, cache_folder: str) -> dict[str, str]:
+    """The http(s) sources that are not in the cache yet, mapped to their path in the cache"""
+    downloads = {}
+    for uri, target in uris.items():
+        if not is_http(uri):
+            continue
+        name = get_cache_name(uri, target)
+        if not is_cached(cache_folder, name, isinstance(target, list)):
+            downloads[uri] = os.path.join(cache_folder, name)
+    return downloads
@@ -0,0 +1,106 @@
+import json
+from itertools import chain
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from shapely import GeometryType
+
+
+def read_esri_json(content) -> gpd.GeoDataFrame:
+    """
+    Reads an Esri JSON feature set (f=json) into a GeoDataFrame.
+
+    Much faster than reading the same page as GeoJSON through GDAL, as the rings of all
+    polygons are decoded at once into numpy arrays instead of feature by feature.
+    """
+    data = json.loads(content)
+    if "error" in data:
+        raise Exception(f"REST service returned an error: {data['error']}")
+
+    features = data.get("features", [])
+    columns = [field["name"] for field in data.get("fields", [])] or None
+    attributes = pd.DataFrame.from_records(
+        [feature.get("attributes") or {} for feature in features], columns=columns
+    )
+    geometries = [feature.get("geometry") or {} for feature in features]
+    for geometry in geometries:
+        if "curveRings" in geometry or "curvePaths" in geometry:
+            raise ValueError("Curved geometries are not supported in Esri JSON, use GeoJSON")
+        if "rings" not in geometry and any(k in geometry for k in ("x", "points", "paths")):
+            raise ValueError("Only polygons are supported in Esri JSON")
+    rings = [geometry.get("rings") or [] for geometry in geometries]
+
+    crs = None
+    if sr := data.get("spatialReference"):
+        crs = sr.get("latestWkid") or sr.get("wkid") or sr.get("wkt")
+    dims = 2 + bool(data.get("hasZ")) + bool(data.get("hasM"))
+    return gpd.GeoDataFrame(attributes, geometry=esri_polygons(rings, dims), crs=crs)
+
+
+def esri_polygons(rings, dims=2) -> np.ndarray:
+    """
+    Converts the rings of Esri polygons to shapely geometries, a list of rings per feature.
+    All points must have the given number of dimensions, only x and y are kept.
+
+    Esri polygons are a flat list of rings, exterior rings are clockwise and holes are
+    counter-clockwise. Holes are assigned to the preceding exterior ring, except for the
+    (rare) features that consist of multiple polygons with holes, which are resolved with
+    containment tests.
+    """
+    ring_counts = np.fromiter(map(len, rings), dtype=np.int64, count=len(rings))
+    flat_rings = [ring for feature in rings for ring in feature]
+    if len(flat_rings) == 0:
+        return np.full(len(rings), None, dtype=object)
+
+    ring_sizes = np.fromiter(map(len, flat_rings), dtype=np.int64, count=len(flat_rings))
+    points = chain.from_iterable(chain.from_iterable(flat_rings))
+    coords = np.fromiter(points, dtype=np.float64).reshape(-1, dims)[:, :2]
+    ring_offsets = np.concatenate([[0], np.cumsum(ring_sizes)])
+    feature_offsets = np.concatenate([[0], np.cumsum(ring_counts)])
+
+    # Twice the signed area of every ring (shoelace formula), negative if clockwise
+    x, y = coords[:, 0], coords[:, 1]
+    terms = np.concatenate([[0], np.cumsum(x[:-1] * y[1:] - x[1:] * y[:-1])])
+    ends = np.maximum(ring_offsets[1:] - 1, ring_offsets[:-1])
+    area = terms[ends] - terms[ring_offsets[:-1]]
+
+    # Every exterior ring starts a new polygon, the first ring of a feature always does
+    is_start = area < 0
+    is_start[feature_offsets[:-1][ring_counts > 0]] = True
+    polygon_offsets = np.concatenate([np.flatnonzero(is_start), [len(flat_rings)]])
+    starts = np.concatenate([[0], np.cumsum(is_start)])
+    polygon_counts = starts[feature_offsets[1:]] - starts[feature_offsets[:-1]]
+    geometry_offsets = np.concatenate([[0], np.cumsum(polygon_counts)])
+
+    geometries = shapely.from_ragged_array(
+        GeometryType.MULTIPOLYGON, coords, (ring_offsets, polygon_offsets, geometry_offsets)
+    )
+
+    holes = np.concatenate([[0], np.cumsum(~is_start)])
+    hole_counts = holes[feature_offsets[1:]] - holes[feature_offsets[:-1]]
+    for i in np.flatnonzero((polygon_counts > 1) & (hole_counts > 0)):
+        geometries[i] = _organize_rings(rings[i])
+
+    geometries = np.where(
+        polygon_counts == 1, shapely.get_geometry(geometries, 0), geometries
+    ).astype(object)
+    geometries[ring_counts == 0] = None
+    return geometries
+
+
+def _organize_rings(rings):
+    rings = [shapely.linearrings([point[:2] for point in ring]) for ring in rings]
+    exteriors = [ring for ring in rings if not ring.is_ccw]
+    holes = {i: [] for i in range(len(exteriors))}
+    for ring in rings:
+        if ring.is_ccw:
+            point = shapely.Point(ring.coords[0])
+            index = next(
+                (i for i, e in enumerate(exteriors) if shapely.Polygon(e).covers(point)), 0
+            )
+            holes[index].append(ring)
+    return shapely.MultiPolygon(
+        [shapely.Polygon(exterior, holes[i]) for i, exterior in enumerate(exteriors)]
+    )
@@ -1,42 +1,388 @@
+import re
+import shutil
+import tempfile
+from glob import glob
+from pathlib import Path
+from typing import Iterator, Optional
+from urllib.parse import quote
+
+import geopandas as gpd
 import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from fsspec.implementations.local import LocalFileSystem
+from geopandas import GeoDataFrame
 from vecorel_cli.conversion.base import BaseConverter
 
 from ..fiboa.version import get_fiboa_uri
+from ..metrics import fill_metrics
+from ..parallel import default_workers, ordered_map
+from ..parquet.partition import partition_file
+from ..parquet.sort import hilbert_sort_file
+from ..parquet.writer import GeoParquetStreamWriter
+from .batches import read_file_batches, read_parquet_batches
+from .download import download_files, format_throughput, get_downloads
 
 AREA_KEY = "metrics:area"
+PERIMETER_KEY = "metrics:perimeter"
 
 
 class FiboaBaseConverter(BaseConverter):
     area_is_in_ha = True
     area_calculate_missing = False
+    perimeter_calculate_missing = False
+    # Computes missing areas and perimeters on the ellipsoid instead of in a projected CRS
+    metrics_geodesic = False
     use_variant_as_determination = False
+    # Reads the source files and runs file_migration in parallel processes.
+    # Only enable it if file_migration doesn't depend on state that is set up at runtime,
+    # the processes create a new instance of the converter and only know the variant.
+    parallel_read = False
+    workers: Optional[int] = None
+    # Migrations need all data at once (e.g. to dissolve or de-duplicate), can't be streamed
+    requires_all_data = False
+    # Number of features that are read at once in stream mode, None reads files/layers at once
+    read_batch_size: Optional[int] = None
+    # Number of concurrent downloads if there are multiple sources
+    max_downloads = 4
+    verify_ssl = True
+    # Columns that are extracted from a text column with a regular expression, for example
+    # {"flik": ("description", r"flik: ([A-Z]{6}\d{10})")}. The pattern must have a single
+    # capture group, an optional third element is the dtype of the extracted values.
+    # Runs per file/layer after file_migration, vectorized with Arrow compute.
+    column_extractors: dict[str, tuple] = {}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.extensions.add(get_fiboa_uri())
 
-    def post_migrate(self, gdf):
-        gdf = super().post_migrate(gdf)
+    def convert(
+        self,
+        output_file,
+        *args,
+        stream=False,
+        workers=None,
+        batch_size=None,
+        sort=False,
+        partition_by: Optional[list[str]] = None,
+        **kwargs,
+    ):
+        if workers is not None:
+            self.workers = workers
+        if batch_size is not None:
+            self.read_batch_size = batch_size
+            stream = True
+        if partition_by:
+            return self.convert_partitioned(
+                output_file, partition_by, *args, stream=stream, sort=sort, **kwargs
+            )
+        if stream:
+            return self.convert_stream(output_file, *args, sort=sort, **kwargs)
+        # The data is always sorted spatially if it's converted at once
+        return super().convert(output_file, *args, **kwargs)
 
-        gdf_area_key = next((k for k, v in self.columns.items() if v == AREA_KEY), None)
-        if self.area_calculate_missing:
-            # If CRS is not in meters, reproject to an equal-area projection for area calculation
-            crs_is_in_meters = gdf.crs.axis_info[0].unit_name in ("m", "metre", "meter")
+    def convert_partitioned(self, folder, partition_by: list[str], *args, **kwargs):
+        """
+        Converts the data to a hive-partitioned dataset in the given folder,
+        e.g. `admin:subdivision_code=TH/year=2024/part-2024.parquet`.
+
+        The data is converted to a temporary file first, which is then split into the
+        partitions. Each variant writes its own files (`part-<variant>.parquet`), so variants
+        with data for the same partitions don't overwrite each other. Existing partitions that
+        are not part of the data and the files of other variants are kept.
+        """
+        folder = Path(folder)
+        folder.parent.mkdir(parents=True, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix=f".{folder.name}-", dir=folder.parent)
+        try:
+            temp_file = Path(temp_dir) / "data.parquet"
+            self.convert(temp_file, *args, **kwargs)
+            self.info(f"Writing partitions by {', '.join(partition_by)} to {folder}")
+            name = f"part-{quote(str(self.variant), safe='')}" if self.variant else "part-0"
+            partitions = partition_file(
+                temp_file,
+                folder,
+                partition_by,
+                name=name,
+                compression=kwargs.get("compression"),
+                compression_level=kwargs.get("compression_level"),
+                geoparquet_version=kwargs.get("geoparquet_version"),
+            )
+            self.info(f"Wrote {len(partitions)} partitions")
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return folder
+
+    def convert_stream(
+        self,
+        output_file,
+        cache=None,
+        input_files=None,
+        variant=None,
+        compression=None,
+        compression_level: Optional[int] = None,
+        geoparquet_version=None,
+        original_geometries=False,
+        sort=False,
+        **kwargs,
+    ) -> str:
+        """
+        Converts the data batch by batch (e.g. per file, layer or page) instead of all at once.
 
-            # Calculate geometry area; Use original geometries if crs_is_in_meters, else reproject to m-based projection
-            base = gdf if crs_is_in_meters else gdf["geometry"].to_crs("EPSG:6933")
+        Every batch that get_data yields runs through the migrations, filters and post_migrate
+        on its own and is appended to the GeoParquet file, so memory usage doesn't depend on the
+        size of the dataset. If read_batch_size is set, files are read in batches of at most
+        this number of features. Converters with migrations that need to see all data at once
+        (e.g. dissolving or de-duplicating) set requires_all_data and can't be streamed.
+        The rows are not sorted, unless sort is set: the file is then sorted along a Hilbert
+        curve afterwards, out of core.
+        """
+        if self.requires_all_data:
+            raise ValueError(
+                f"Converter '{self.id}' needs all data at once (e.g. to dissolve or de-duplicate), it can't be streamed"
+            )
+        self.variant = variant
+        cid = self.id.strip()
+        if self.bbox is not None and len(self.bbox) != 4:
+            raise ValueError("If provided, the bounding box must consist of 4 numbers")
 
-            if gdf_area_key in gdf.columns:
-                factor = 10_000 if self.area_is_in_ha else 1
-                gdf[gdf_area_key] = np.where(
-                    gdf[gdf_area_key] == 0, base.area * factor, gdf[gdf_area_key]
+        if input_files is not None and isinstance(input_files, dict) and len(input_files) > 0:
+            self.warning("Using user provided input file(s) instead of the pre-defined file(s)")
+            urls = input_files
+        else:
+            urls = self.get_urls()
+            if urls is None:
+                raise ValueError("No input files provided")
+
+        self.info("Getting file(s) if not cached yet")
+        paths = self.download_files(urls, cache)
+
+        self.info("Creating GeoParquet file: " + str(output_file))
+        writer = None
+        rows = 0
+        for data in self.read_files(paths, **self.open_options):
+            data, columns = self.migrate_batch(data, cid, original_geometries)
+            if writer is None:
+                constants = [*self.column_additions, "collection"]
+                writer = GeoParquetStreamWriter(
+                    output_file, properties=columns, constants=constants
                 )
-            else:
-                gdf[gdf_area_key] = base.area
-        elif self.area_is_in_ha and gdf_area_key in gdf.columns:
+                writer.set_collection(self.create_collection(cid))
+                writer.open(compression, compression_level, geoparquet_version)
+                self.info("First batch fully migrated:")
+                self.info(data.head().to_string())
+            writer.write_batch(data)
+            rows += len(data)
+
+        if writer is None:
+            raise ValueError("No data found in source(s)")
+        writer.close()
+        self.info(f"Wrote {rows} rows")
+        if sort:
+            self.info("Sorting rows spatially")
+            hilbert_sort_file(
+                output_file,
+                compression=writer.compression,
+                compression_level=writer.compression_level,
+            )
+        return output_file
+
+    def download_files(self, uris, cache_folder=None, **kwargs):
+        if isinstance(uris, dict) and len(uris) > 1:
+            cache_fs, cache_folder = self.get_cache(cache_folder)
+            if isinstance(cache_fs, LocalFileSystem):
+                self.prefetch_files(uris, cache_folder)
+        return super().download_files(uris, cache_folder, **kwargs)
+
+    def prefetch_files(self, uris: dict, cache_folder: str) -> dict[str, str]:
+        """
+        Downloads the http(s) sources that are not cached yet concurrently into the cache.
+
+        Returns the URLs that failed with the error message.
+        """
+        downloads = get_downloads(uris, cache_folder)
+        if len(downloads) == 0:
+            return {}
+
+        self.info(f"Downloading {len(downloads)} files, {self.max_downloads} at once")
+        summary = download_files(downloads, workers=self.max_downloads, verify=self.verify_ssl)
+        for uri, error in summary["failed"].items():
+            self.error(f"Download failed for {uri}: {error}")
+        self.info(f"Downloaded {format_throughput(summary)}")
+        return summary["failed"]
+
+    def get_data(self, paths, **kwargs):
+        if not self.read_batch_size:
+            return super().get_data(paths, **kwargs)
+        return self.get_data_batches(paths, **kwargs)
+
+    def get_data_batches(self, paths, **kwargs):
+        """Like get_data, but yields batches of at most read_batch_size features per file/layer"""
+        size = self.read_batch_size
+        for path, uri in paths:
+            if "*" in path:
+                lst = glob(path, recursive=True)
+                assert len(lst) == 1, f"Can not match {path} to a single file"
+                path = lst[0]
+            if path.endswith(".json") or path.endswith(".geojson"):
+                # GeoJSON is always read at once
+                yield from super().get_data([(path, uri)], **kwargs)
+                continue
+
+            self.info(f"Reading {path} in batches of {size} features")
+            if path.endswith(".parquet") or path.endswith(".geoparquet"):
+                for data in read_parquet_batches(path, size):
+                    yield data, path, uri, None
+                continue
+
+            all_layers = gpd.list_layers(path)
+            layers = [layer for layer in all_layers["name"] if self.layer_filter(str(layer), path)]
+            if len(layers) == 0:
+                self.warning("No layers left for layering after filtering")
+            for layer in layers:
+                self.info(f"Reading layer {layer} in batches", indent="- ")
+                for data in read_file_batches(path, size, layer=layer, **kwargs):
+                    yield data, path, uri, layer
+
+    def read_data(self, paths, **kwargs):
+        return pd.concat(list(self.read_files(paths, **kwargs)))
+
+    def read_files(self, paths, **kwargs) -> Iterator[GeoDataFrame]:
+        """
+        Yields the data per file/layer after the file migration, in the order of the paths.
+
+        If parallel_read is enabled, the files are read in a pool of processes.
+        """
+        # Batches are read one after another, to keep the memory usage low
+        parallel = self.parallel_read and not self.read_batch_size
+        workers = min(len(paths), self.workers or default_workers()) if parallel else 1
+        if workers <= 1:
+            for data, path, uri, layer in self.get_data(paths, **kwargs):
+                yield self.migrate_file(data, path, uri, layer)
+            return
+
+        self.info(f"Reading {len(paths)} files with {workers} processes")
+        jobs = [(type(self), self.variant, path, uri, kwargs) for path, uri in paths]
+        for gdfs in ordered_map(_read_file, jobs, workers=workers, processes=True):
+            yield from gdfs
+
+    def migrate_file(self, gdf, path, uri, layer=None) -> GeoDataFrame:
+        gdf = self.file_migration(gdf, path, uri, layer)
+        if not isinstance(gdf, GeoDataFrame):
+            raise ValueError("Per-file/layer migration function must return a GeoDataFrame")
+        return self.extract_columns(gdf)
+
+    def extract_columns(self, gdf) -> GeoDataFrame:
+        for key, (source, pattern, *dtype) in self.column_extractors.items():
+            if source not in gdf.columns:
+                self.warning(f"Column '{source}' not found in dataset, can't extract '{key}'")
+                continue
+            values = extract_regex(gdf[source], pattern)
+            gdf[key] = values.astype(dtype[0]) if dtype else values
+        return gdf
+
+    def migrate_batch(self, gdf, cid, original_geometries=False):
+        """Same steps as in BaseConverter.convert, except for sorting, applied to a single batch"""
+        if self.index_as_id:
+            gdf["id"] = gdf.index
+
+        gdf = self.migrate(gdf)
+        assert isinstance(gdf, GeoDataFrame), "Migration function must return a GeoDataFrame"
+        columns = self.get_columns(gdf)
+        gdf = self.filter_rows(gdf)
+
+        if self.column_additions:
+            for key, value in self.column_additions.items():
+                gdf[key] = value
+                columns[key] = key
+            columns["collection"] = "collection"
+            gdf["collection"] = cid
+
+        for key, fn in self.column_migrations.items():
+            if key in gdf.columns:
+                gdf[key] = fn(gdf[key])
+
+        gdf = self.post_migrate(gdf)
+
+        actual_columns = {}
+        for old_key, new_key in columns.items():
+            if old_key in gdf.columns:
+                if isinstance(new_key, (list, tuple)):
+                    for key in new_key:
+                        gdf[key] = gdf.loc[:, old_key]
+                        actual_columns[key] = key
+                else:
+                    actual_columns[old_key] = new_key
+
+        gdf = gdf.rename(columns=actual_columns)
+        if any(v == "geometry" and k != v for k, v in actual_columns.items()):
+            gdf = gdf.set_geometry("geometry")
+
+        if not original_geometries:
+            gdf.geometry = gdf.geometry.make_valid()
+            gdf = gdf.explode()
+            gdf = gdf[np.logical_and(gdf.geometry.type == "Polygon", gdf.geometry.is_valid)]
+            if gdf.geometry.array.has_z.any():
+                gdf.geometry = gdf.geometry.force_2d()
+
+        gdf = gdf.drop(columns=list(set(gdf.columns) - set(actual_columns.values())))
+        return gdf, list(actual_columns.values())
+
+    def get_columns(self, gdf) -> dict:
+        columns = super().get_columns(gdf)
+        # Keep the perimeter that post_migrate computes, even if the source doesn't have one
+        if self.perimeter_calculate_missing and PERIMETER_KEY not in columns.values():
+            columns[PERIMETER_KEY] = PERIMETER_KEY
+        return columns
+
+    def post_migrate(self, gdf):
+        gdf = super().post_migrate(gdf)
+
+        gdf_area_key = next((k for k, v in self.columns.items() if v == AREA_KEY), None)
+        if self.area_is_in_ha and gdf_area_key in gdf.columns:
             # convert area in ha to meters
             gdf[gdf_area_key] = gdf[gdf_area_key].astype(float) * 10_000
 
+        if self.area_calculate_missing or self.perimeter_calculate_missing:
+            # Only measures the rows that need it, i.e. the area or perimeter is missing or 0
+            gdf_perimeter_key = next(
+                (k for k, v in self.columns.items() if v == PERIMETER_KEY), PERIMETER_KEY
+            )
+            gdf = fill_metrics(
+                gdf,
+                area=gdf_area_key if self.area_calculate_missing else None,
+                perimeter=gdf_perimeter_key if self.perimeter_calculate_missing else None,
+                geodesic=self.metrics_geodesic,
+            )
+
         if self.use_variant_as_determination:
             gdf["determination:datetime"] = f"{self.variant}-01-01T00:00:00Z"
         return gdf
+
+
+def _read_file(job) -> list[GeoDataFrame]:
+    # Runs in a separate process
+    cls, variant, path, uri, kwargs = job
+    converter = cls()
+    converter.variant = variant
+    return [
+        converter.migrate_file(data, path, uri, layer)
+        for data, path, uri, layer in converter.get_data([(path, uri)], **kwargs)
+    ]
+
+
+def extract_regex(column: pd.Series, pattern: str) -> pd.Series:
+    """
+    Extracts the capture group of the pattern from every value, missing if it doesn't match.
+
+    Uses RE2 syntax, e.g. (?i) instead of re.IGNORECASE.
+    """
+    # Arrow can only extract named groups
+    named = re.sub(r"(?<!\\)\((?!\?)", "(?P<value>", pattern, count=1)
+    if named == pattern:
+        raise ValueError(f"Pattern must have a capture group: {pattern}")
+    array = pa.array(column, type=pa.string(), from_pandas=True)
+    result = pc.struct_field(pc.extract_regex(array, named), [0])
+    # Assign by position, the index of the column may not be 0..n-1
+    return pd.Series(result.to_numpy(zero_copy_only=False), index=column.index, name=column.name)
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import threading
+from uuid import uuid4
+
+import geopandas as gpd
+import pyarrow as pa
+
+
+def page_to_ipc(data: gpd.GeoDataFrame) -> bytes:
+    """Serializes a page to the Arrow IPC file format, geometries are stored as WKB"""
+    table = pa.table(data.to_arrow(index=False, geometry_encoding="WKB"))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def page_from_ipc(content: bytes) -> gpd.GeoDataFrame:
+    table = pa.ipc.open_file(pa.BufferReader(content)).read_all()
+    return gpd.GeoDataFrame.from_arrow(table)
+
+
+class RESTPageCache:
+    """
+    Cache for the pages of a single Esri REST layer, pages are stored in the Arrow IPC format.
+
+    A manifest records the ID window, feature count, byte size and checksum of every page.
+    Pages that were requested one by one also record the last ID before the page (`after`),
+    so that pages are only resumed if no IDs are missing in between.
+    Pages and manifest are written to a temporary file first and then moved into place,
+    so an interrupted download never leaves a partial file behind that is used later on.
+    """
+
+    version = 2
+
+    def __init__(self, fs, folder, name, query):
+        self.fs = fs
+        self.folder = folder
+        self.name = name
+        self.query = query
+        self.path = os.path.join(folder, f"{name}.manifest.json")
+        self.lock = threading.Lock()
+        self.manifest = self._load()
+
+    def _load(self):
+        manifest = None
+        if self.fs.exists(self.path):
+            try:
+                with self.fs.open(self.path, mode="r") as file:
+                    manifest = json.load(file)
+            except ValueError:
+                pass
+        # Start from scratch if the layer is requested with different parameters
+        if (
+            not manifest
+            or manifest.get("version") != self.version
+            or manifest.get("query") != self.query
+        ):
+            manifest = {
+                "version": self.version,
+                "query": self.query,
+                "complete": False,
+                "pages": [],
+            }
+        return manifest
+
+    @property
+    def complete(self) -> bool:
+        return self.manifest["complete"]
+
+    @property
+    def pages(self) -> list:
+        return list(self.manifest["pages"])
+
+    def find(self, window):
+        window = list(window)
+        return next((page for page in self.pages if page["window"] == window), None)
+
+    def read(self, page):
+        """Returns the content of a cached page, None if the file is missing or corrupt"""
+        file = os.path.join(self.folder, page["file"])
+        if not self.fs.exists(file):
+            return None
+        with self.fs.open(file, mode="rb") as f:
+            content = f.read()
+        if len(content) != page["size"] or hashlib.sha256(content).hexdigest() != page["sha256"]:
+            return None
+        return content
+
+    def write(self, window, content, count, after=None):
+        low, high = window
+        page = {
+            "window": [low, high],
+            "file": f"{self.name}_{low}_{high}.arrow",
+            "count": count,
+            "size": len(content),
+            "sha256": hashlib.sha256(content).hexdigest(),
+        }
+        if after is not None:
+            page["after"] = after
+        self._write_atomic(os.path.join(self.folder, page["file"]), content)
+        with self.lock:
+            pages = [p for p in self.manifest["pages"] if p["window"] != page["window"]]
+            pages.append(page)
+            self.manifest["pages"] = sorted(pages, key=lambda p: p["window"][0])
+            self._save()
+        return page
+
+    def finish(self, windows=None):
+        """Marks the layer as completely downloaded, optionally dropping pages outside the windows"""
+        with self.lock:
+            if windows is not None:
+                windows = [list(window) for window in windows]
+                self.manifest["pages"] = [
+                    p for p in self.manifest["pages"] if p["window"] in windows
+                ]
+            self.manifest["complete"] = True
+            self._save()
+
+    def _save(self):
+        self._write_atomic(self.path, json.dumps(self.manifest, indent=1).encode())
+
+    def _write_atomic(self, path, content):
+        tmp_path = f"{path}.{uuid4().hex}.part"
+        with self.fs.open(tmp_path, mode="wb") as file:
+            file.write(content)
+        self.fs.mv(tmp_path, path)
@@ -1,5 +1,215 @@
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import click
+from vecorel_cli.basecommand import runnable
 from vecorel_cli.convert import ConvertData as Base
+from vecorel_cli.registry import Registry
+from vecorel_cli.vecorel.util import name_from_uri
+
+from .cli.options import PARTITION_BY, WORKERS
+from .parallel import default_workers, ordered_map
+from .parquet.partition import YEAR
 
 
 class ConvertData(Base):
-    pass
+    # Maximum number of sources that are downloaded at once when converting multiple variants
+    max_downloads = 4
+
+    @staticmethod
+    def get_cli_args():
+        return {
+            **Base.get_cli_args(),
+            "variant": click.option(
+                "--variant",
+                type=click.STRING,
+                help="Choose a specific variant to read data from, e.g. a specific year. Use 'all' or a comma-separated list to convert multiple variants in parallel, each to its own file (the variant is appended to the file name or replaces {variant}).",
+            ),
+            "stream": click.option(
+                "--stream",
+                is_flag=True,
+                type=click.BOOL,
+                help="Converts and writes the data per file, layer or page instead of all at once. Keeps memory usage low for large datasets, but doesn't sort the rows.",
+                default=False,
+            ),
+            "batch_size": click.option(
+                "--batch-size",
+                type=click.IntRange(min=1),
+                help="Reads the sources in batches of the given number of features (implies --stream). Allows to convert datasets that are larger than the memory.",
+                default=None,
+            ),
+            "sort": click.option(
+                "--sort",
+                is_flag=True,
+                type=click.BOOL,
+                help="Sorts the rows spatially (Hilbert curve) after converting with --stream or --batch-size, without loading all data into memory. Without streaming the rows are always sorted.",
+                default=False,
+            ),
+            "partition_by": PARTITION_BY,
+            "workers": WORKERS,
+        }
+
+    @runnable
+    def convert(
+        self,
+        target,
+        input_files=None,
+        variant=None,
+        cache=None,
+        workers=None,
+        partition_by=None,
+        **kwargs,
+    ):
+        partition_by = list(partition_by or [])
+        variants = self.get_variants(variant)
+        if variants is None:
+            return super().convert(
+                target,
+                input_files=input_files,
+                variant=variant,
+                cache=cache,
+                workers=workers,
+                partition_by=partition_by,
+                **kwargs,
+            )
+        if input_files:
+            raise ValueError("Input files can't be used for multiple variants")
+        if len(self.converter.data_access) > 0 and not cache:
+            raise Exception("Data access is restricted, please provide the input data in a cache.")
+
+        if YEAR in partition_by:
+            # The variants are partitions of the same dataset
+            targets = {v: Path(target) for v in variants}
+        else:
+            targets = {v: get_variant_target(target, v) for v in variants}
+        results = self.convert_variants(
+            targets, cache=cache, workers=workers, partition_by=partition_by, **kwargs
+        )
+        failed = [r for r in results if r["status"] == "failed"]
+        if len(failed) > 0:
+            raise ValueError(f"Conversion failed for {len(failed)} of {len(variants)} variants")
+        return f"Converted {len(variants)} variants"
+
+    def get_variants(self, variant: Optional[str]) -> Optional[list[str]]:
+        """Parses 'all' or a comma-separated list of variants, returns None for a single variant"""
+        if variant is None:
+            return None
+        if variant == "all":
+            if not self.converter.variants:
+                raise ValueError(f"Converter '{self.dataset}' doesn't provide variants")
+            return list(self.converter.variants.keys())
+        if "," not in variant:
+            return None
+        variants = [v.strip() for v in variant.split(",") if v.strip()]
+        if self.converter.variants:
+            unknown = [v for v in variants if v not in self.converter.variants]
+            if unknown:
+                opts = ", ".join(self.converter.variants.keys())
+                raise ValueError(f"Unknown variants {', '.join(unknown)}, choose from {opts}")
+        return variants
+
+    def convert_variants(
+        self, targets: dict[str, Path], cache=None, workers: Optional[int] = None, **kwargs
+    ) -> list[dict]:
+        """
+        Converts multiple variants of the dataset in parallel processes.
+
+        The sources of all variants are downloaded first (at most `max_downloads` at once) into
+        a cache that all processes share, a temporary folder if no cache is given.
+        Then the variants are converted, each to its own file. The cores are split between the
+        processes (via FIBOA_WORKERS), so that the host is not oversubscribed.
+        """
+        variants = list(targets.keys())
+        workers = min(len(variants), workers or default_workers())
+        temp_cache = None
+        if cache is None:
+            cache = temp_cache = tempfile.mkdtemp(prefix="fiboa-")
+
+        try:
+            self.download_variants(variants, cache)
+
+            self.info(f"Converting {len(variants)} variants with {workers} processes")
+            jobs = [
+                (self.dataset, Registry.src_package, targets[v], v, cache, kwargs) for v in variants
+            ]
+            cores = max(1, default_workers() // workers)
+            results = []
+            for result in ordered_map(
+                _convert_variant,
+                jobs,
+                workers=workers,
+                processes=True,
+                initializer=_init_variant_worker,
+                initargs=(cores,),
+            ):
+                if result["status"] == "failed":
+                    self.error(f"Variant {result['variant']}: {result['error']}")
+                else:
+                    self.success(
+                        f"Variant {result['variant']}: {result['target']} ({result['seconds']:.1f}s)"
+                    )
+                results.append(result)
+            return results
+        finally:
+            if temp_cache is not None:
+                shutil.rmtree(temp_cache, ignore_errors=True)
+
+    def download_variants(self, variants: list[str], cache):
+        # Converters keep state (e.g. the variant and the paths), so every variant and every
+        # download thread uses its own instance instead of the shared converter
+        def create_converter(variant):
+            converter = type(self.converter)()
+            converter.variant = variant
+            return converter
+
+        # Every source is only downloaded once, even if multiple variants use it
+        sources = {}
+        for variant in variants:
+            urls = create_converter(variant).get_urls()
+            if isinstance(urls, str):
+                urls = {urls: name_from_uri(urls)}
+            for uri, target in (urls or {}).items():
+                sources.setdefault(uri, (variant, target))
+
+        self.info(f"Getting {len(sources)} file(s) if not cached yet")
+
+        def download(source):
+            uri, (variant, target) = source
+            create_converter(variant).download_files({uri: target}, cache)
+
+        for _ in ordered_map(download, sources.items(), workers=self.max_downloads):
+            pass
+
+
+def get_variant_target(target, variant: str) -> Path:
+    """Output file for a variant, replaces {variant} or appends the variant to the file name"""
+    target = str(target)
+    if "{variant}" in target:
+        return Path(target.replace("{variant}", variant))
+    path = Path(target)
+    return path.with_name(f"{path.stem}-{variant}{path.suffix}")
+
+
+def _init_variant_worker(cores: int):
+    # Nested pools (e.g. for the area calculation) share the cores of the host
+    os.environ["FIBOA_WORKERS"] = str(cores)
+
+
+def _convert_variant(job) -> dict:
+    # Runs in a separate process
+    dataset, py_package, target, variant, cache, kwargs = job
+    start = time.perf_counter()
+    result = {"variant": variant, "target": str(target)}
+    try:
+        converter = ConvertData(dataset, py_package).converter
+        converter.convert(target, variant=variant, cache=cache, **kwargs)
+        result["status"] = "converted"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
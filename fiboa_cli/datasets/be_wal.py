@@ -46,8 +46,10 @@ free-licensed version for this converter.
     def layer_filter(self, layer: str, uri: str) -> bool:
         return layer == "ExistingLandUseObject"
 
+    column_extractors = {
+        "crop_code": ("crop_code", r"\.(\d+)$"),
+    }
     column_migrations = {
-        "crop_code": lambda col: col.str.extract(r"\.(\d+)$", expand=False),
         "crop_name": lambda col: col.str.strip(),
     }
 
@@ -2,7 +2,7 @@ from geopandas import GeoDataFrame
 from vecorel_cli.conversion.admin import AdminConverterMixin
 
 from fiboa_cli.conversion.fiboa_converter import FiboaBaseConverter
-from fiboa_cli.datasets.commons.data import read_data_csv
+from fiboa_cli.datasets.commons.data import data_mapping
 
 
 class BGConverter(AdminConverterMixin, FiboaBaseConverter):
@@ -33,7 +33,6 @@ Categorized in Arable Land, Greenhouses, Mixed Land Use and Rice fields.
 
     def migrate(self, gdf) -> GeoDataFrame:
         gdf = super().migrate(gdf)
-        csv = read_data_csv("bg_arable.csv")
-        crop_to_code = {e["original_name"]: i + 1 for i, e in enumerate(csv)}
+        crop_to_code = data_mapping("bg_arable.csv", "original_name")
         gdf["crop:code"] = gdf["USAGEENG"].map(crop_to_code)
         return gdf
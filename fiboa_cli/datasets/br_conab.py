@@ -1,7 +1,7 @@
-import math
 from pathlib import Path
 
 import numpy as np
+import pandas as pd
 from vecorel_cli.conversion.admin import AdminConverterMixin
 
 from ..conversion.fiboa_converter import FiboaBaseConverter
@@ -62,6 +62,7 @@ Further information or suggestions can be sent to the email address conab.geote@
     )
     attribution = "CONAB - conab.gov.br"
     license = "CC-BY-NC-4.0"
+    parallel_read = True
     columns = {
         "geometry": "geometry",
         "id": "id",
@@ -91,7 +92,7 @@ Further information or suggestions can be sent to the email address conab.geote@
         gdf = gdf.reset_index(drop=True)
         gdf["area_ha"].combine_first(gdf["Hectares"]).replace(np.nan, None, inplace=True)
         gdf.loc[gdf["area_ha"] == 0, "area_ha"] = None
-        gdf["cd_mun"] = gdf["cd_mun"].combine_first(gdf["CD_MUN"]).apply(fformat)
+        gdf["cd_mun"] = fformat(gdf["cd_mun"].combine_first(gdf["CD_MUN"]))
         gdf["nm_mun"] = gdf["nm_mun"].combine_first(gdf["NM_MUN"]).combine_first(gdf["NM_MUNIC"])
         return super().migrate(gdf)
 
@@ -101,7 +102,13 @@ Further information or suggestions can be sent to the email address conab.geote@
         return super().get_data(paths, **kwargs)
 
 
-def fformat(x):
-    if isinstance(x, float) and not math.isnan(x):
-        return f"{x:.0f}"
-    return x or None
+def fformat(col):
+    # Some files store the codes as numbers, e.g. 5200050.0 -> "5200050"
+    if pd.api.types.is_numeric_dtype(col):
+        strings = pd.Series(False, index=col.index)
+    else:
+        strings = col.str.len() > 0
+    numbers = pd.to_numeric(col.where(~strings), errors="coerce").round().astype("Int64")
+    return (
+        col.where(strings, numbers.astype("string")).astype(object).where(lambda c: c.notna(), None)
+    )
@@ -0,0 +1,101 @@
+import csv
+import hashlib
+import json
+import os
+import pickle
+import time
+from io import StringIO
+from pathlib import Path
+
+from loguru import logger
+from vecorel_cli.vecorel.util import load_file
+
+# Parsed files per URL, for repeated lookups within a single run
+_memory_cache = {}
+
+
+def get_cache_folder() -> Path:
+    """
+    Folder for persistent caches, can be set with the FIBOA_CACHE_DIR environment variable.
+    Defaults to fiboa in the user's cache folder (XDG_CACHE_HOME or ~/.cache).
+    """
+    folder = os.getenv("FIBOA_CACHE_DIR")
+    if not folder:
+        folder = os.path.join(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache", "fiboa")
+    return Path(folder)
+
+
+def get_cache_ttl() -> float:
+    """Time in seconds after which cached files are fetched again (FIBOA_CACHE_TTL), 7 days by default"""
+    return float(os.getenv("FIBOA_CACHE_TTL", 7 * 24 * 60 * 60))
+
+
+def is_offline() -> bool:
+    """If FIBOA_OFFLINE is set, cached files are used no matter how old they are"""
+    return os.getenv("FIBOA_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+def parse_csv(content: bytes) -> list[dict]:
+    return list(csv.DictReader(StringIO(content.decode("utf-8"))))
+
+
+def load_cached_csv(url: str) -> list[dict]:
+    """
+    Loads and parses a remote CSV file, e.g. a mapping file, through a persistent cache.
+
+    The parsed rows are stored content-addressed (by the checksum of the file), an index entry
+    per URL records which content was fetched when. Local files are always read directly.
+    """
+    if "://" not in url:
+        return parse_csv(load_file(url))
+    if url in _memory_cache:
+        return _copy_rows(_memory_cache[url])
+
+    folder = get_cache_folder() / "mappings"
+    index_file = folder / "index" / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+    entry = None
+    if index_file.exists():
+        try:
+            entry = json.loads(index_file.read_text())
+        except ValueError:
+            pass
+
+    object_file = folder / "objects" / f"{entry['sha256']}.pickle" if entry else None
+    cached = object_file is not None and object_file.exists()
+    if cached and (is_offline() or time.time() - entry["fetched"] < get_cache_ttl()):
+        with open(object_file, "rb") as f:
+            rows = pickle.load(f)
+    elif is_offline():
+        raise Exception(f"{url} is not cached, can't load it in offline mode (FIBOA_OFFLINE)")
+    else:
+        try:
+            content = load_file(url)
+        except Exception as e:
+            if not cached:
+                raise e
+            logger.warning(f"Can't load {url}, using cached file from {entry['fetched']}: {e}")
+            with open(object_file, "rb") as f:
+                rows = pickle.load(f)
+        else:
+            rows = parse_csv(content)
+            checksum = hashlib.sha256(content).hexdigest()
+            object_file = folder / "objects" / f"{checksum}.pickle"
+            if not object_file.exists():
+                _write_atomic(object_file, pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL))
+            entry = {"url": url, "sha256": checksum, "fetched": time.time()}
+            _write_atomic(index_file, json.dumps(entry).encode())
+
+    _memory_cache[url] = rows
+    return _copy_rows(rows)
+
+
+def _copy_rows(rows: list[dict]) -> list[dict]:
+    # Every caller gets its own rows, changes must not reach the cache and the other callers
+    return [dict(row) for row in rows]
+
+
+def _write_atomic(path: Path, content: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.part")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
@@ -1,8 +1,35 @@
 from csv import DictReader
+from functools import lru_cache
 from os.path import dirname, join
+from typing import Optional
+
+import pandas as pd
 
 
 def read_data_csv(name, **kwargs):
+    rows = _read_data_csv(name, **kwargs)
+    # Copy, so that callers can't modify the cached rows
+    return [dict(row) for row in rows]
+
+
+@lru_cache(maxsize=32)
+def _read_data_csv(name, **kwargs) -> tuple[dict]:
     path = join(dirname(dirname(__file__)), "data-files", name)
     with open(path, "r", encoding="utf-8") as f:
-        return list(DictReader(f, **kwargs))
+        return tuple(DictReader(f, **kwargs))
+
+
+@lru_cache(maxsize=64)
+def data_mapping(name: str, key: str, value: Optional[str] = None) -> pd.Series:
+    """
+    Lookup table from the column `key` to the column `value` of a bundled CSV file.
+
+    If no value column is given, maps to the (1-based) row number, e.g. to generate codes.
+    For duplicate keys the last row wins, as it would in a dict.
+    The Series is cached and shared, pass it to Series.map, but don't modify it.
+    """
+    rows = _read_data_csv(name)
+    keys = [row[key] for row in rows]
+    values = [row[value] for row in rows] if value else range(1, len(rows) + 1)
+    mapping = pd.Series(values, index=keys)
+    return mapping[~mapping.index.duplicated(keep="last")]
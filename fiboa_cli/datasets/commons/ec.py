@@ -1,8 +1,4 @@
-import csv
-from io import StringIO
-
-from vecorel_cli.vecorel.util import load_file
-
+from fiboa_cli.datasets.commons import hcat
 from fiboa_cli.datasets.commons.hcat import AddHCATMixin
 
 
@@ -41,9 +37,4 @@ def ec_url(csv_file):
 
 
 def load_ec_mapping(csv_file=None, url=None):
-    if not (csv_file or url):
-        raise ValueError("Either csv_file or url must be specified")
-    if not url:
-        url = ec_url(csv_file)
-    content = load_file(url)
-    return list(csv.DictReader(StringIO(content.decode("utf-8"))))
+    return hcat.load_ec_mapping(csv_file, url=url)
@@ -1,15 +1,17 @@
-import csv
-from io import StringIO
 from typing import Optional
 
 import geopandas as gpd
 import numpy as np
 import pandas as pd
-from vecorel_cli.vecorel.util import load_file
+
+from .cache import load_cached_csv
 
 HCAT_EXTENSION = "https://fiboa.org/hcat-extension/v0.3.0/schema.yaml"
 CROP_EXTENSION = "https://fiboa.org/crop-extension/v0.2.0/schema.yaml"
 
+# Columns in the mapping files for hcat:name_en, hcat:name and hcat:code
+HCAT_ATTRIBUTES = ("translated_name", "HCAT3_name", "HCAT3_code")
+
 
 class AddHCATMixin:
     """
@@ -27,10 +29,15 @@ class AddHCATMixin:
         "hcat:code": "hcat:code",
     }
 
+    # If the data is mapped batch by batch, whether crops have been mapped is only checked
+    # for all batches together, see start_hcat_batches and finish_hcat_batches
+    hcat_batches = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.columns |= self.hcat_columns | {"crop:code_list": "crop:code_list"}
         self.extensions = getattr(self, "extensions", set()) | {CROP_EXTENSION, HCAT_EXTENSION}
+        self._hcat_mapped = {}
 
     def convert(self, *args, **kwargs):
         self.mapping_file = kwargs.get("mapping_file")
@@ -40,14 +47,43 @@ class AddHCATMixin:
             )
         return super().convert(*args, **kwargs)
 
+    def convert_stream(self, *args, **kwargs):
+        # post_migrate maps every batch on its own
+        self.start_hcat_batches()
+        try:
+            output_file = super().convert_stream(*args, **kwargs)
+        finally:
+            self.hcat_batches = False
+        self.finish_hcat_batches()
+        return output_file
+
+    def start_hcat_batches(self):
+        self.hcat_batches = True
+        self._hcat_mapped = {}
+
+    def finish_hcat_batches(self):
+        self.hcat_batches = False
+        self.check_hcat_mapped()
+
+    def check_hcat_mapped(self):
+        for values in self._hcat_mapped.values():
+            assert len(values) > 1, "No HCAT crops mapped"
+
     def get_code_column(self, gdf, code="crop:code"):
         try:
             attribute = next(k for k, v in self.columns.items() if v == code)
         except StopIteration:
             raise Exception(f"Misssing {code} column in converter {self.__class__.__name__}")
-        col = gdf[attribute]
-        # Should be corrected in original parser
-        return col if col.dtype == "object" else col.astype(str)
+        return gdf[attribute]
+
+    def get_hcat_lookup(self, from_code):
+        # Compile the mapping only once, unless it has been replaced in the meantime
+        lookup = getattr(self, "_hcat_lookup", None)
+        if lookup is None or lookup.mapping is not self.ec_mapping or lookup.from_code != from_code:
+            attributes = [a for a in HCAT_ATTRIBUTES if a in self.ec_mapping[0]]
+            lookup = HCATLookup(self.ec_mapping, from_code, attributes)
+            self._hcat_lookup = lookup
+        return lookup
 
     def add_hcat(self, gdf):
         # Lookup column that will be renamed after the migration to hcat:code
@@ -67,17 +103,20 @@ class AddHCATMixin:
             else:
                 crop_code_col = self.get_code_column(gdf)
 
-            def map_to(attribute):
-                return {e[from_code]: e[attribute] or None for e in self.ec_mapping}
-
+            mapped = self.get_hcat_lookup(from_code).lookup(crop_code_col)
+            if not self.hcat_batches:
+                self._hcat_mapped = {}
             col = None
-            for k, v in zip(
-                self.hcat_columns.keys(), ("translated_name", "HCAT3_name", "HCAT3_code")
-            ):
-                if v in self.ec_mapping[0]:
-                    col = crop_code_col.map(map_to(v))
+            for k, v in zip(self.hcat_columns.keys(), HCAT_ATTRIBUTES):
+                if v in mapped:
+                    col = mapped[v]
                     gdf[k] = col
-                    assert np.unique(col[~col.isna()]).size > 1, "No HCAT crops mapped"
+                    # Two distinct values are enough for the check
+                    values = self._hcat_mapped.setdefault(k, set())
+                    if len(values) < 2:
+                        values.update(col.dropna().unique()[:2])
+            if not self.hcat_batches:
+                self.check_hcat_mapped()
 
             if col is not None and col.isna().any():
                 index = [
@@ -106,6 +145,41 @@ class AddHCATMixin:
         return self.add_hcat(gdf)
 
 
+class HCATLookup:
+    """
+    HCAT mapping compiled for fast lookups.
+
+    The mapping is parsed once into categorical columns. A code column is factorized, only the
+    unique codes are looked up and all HCAT columns are gathered with the same row indexer.
+    """
+
+    def __init__(self, mapping: list[dict], from_code: str, attributes: list[str]):
+        self.mapping = mapping
+        self.from_code = from_code
+        frame = pd.DataFrame.from_records(mapping, columns=[from_code, *attributes])
+        # Later entries win, as in a dict
+        frame = frame.drop_duplicates(from_code, keep="last")
+        self.keys = pd.Index(frame[from_code].astype(str))
+        self.columns = {
+            attribute: pd.Categorical(frame[attribute].mask(frame[attribute] == ""))
+            for attribute in attributes
+        }
+
+    def lookup(self, codes: pd.Series) -> dict[str, pd.Series]:
+        factors, uniques = pd.factorize(codes)
+        if uniques.dtype != "object":
+            # Should be corrected in original parser
+            uniques = uniques.astype(str)
+        # Missing values are factorized to -1, which picks the appended -1 (not found)
+        rows = np.append(self.keys.get_indexer(uniques), -1)[factors]
+        result = {}
+        for attribute, column in self.columns.items():
+            values = np.where(rows >= 0, column.codes[rows], -1)
+            categorical = pd.Categorical.from_codes(values, dtype=column.dtype)
+            result[attribute] = pd.Series(categorical, index=codes.index)
+        return result
+
+
 def ec_url(csv_file):
     if csv_file.startswith("https://"):
         return csv_file
@@ -117,5 +191,4 @@ def load_ec_mapping(csv_file=None, url=None):
         raise ValueError("Either csv_file or url must be specified")
     if not url:
         url = ec_url(csv_file)
-    content = load_file(url)
-    return list(csv.DictReader(StringIO(content.decode("utf-8"))))
+    return load_cached_csv(url)
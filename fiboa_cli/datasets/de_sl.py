@@ -1,37 +1,18 @@
-import re
-
 from vecorel_cli.conversion.admin import AdminConverterMixin
 
+from ..conversion.converter_wfs import TiledWFSConverterMixin
 from ..conversion.fiboa_converter import FiboaBaseConverter
 
 
-def parse_flik(x):
-    match = re.search(r"flik:\s*([A-Z]{6}\d{10})", x, re.I)
-    return match.group(1) if match else None
-
-
-def parse_size(x):
-    match = re.search(r"Size in ha: (\d+(\.\d+)?)+", x, re.I)
-    return float(match.group(1)) if match else None
-
-
-url = "https://geoportal.saarland.de/gdi-sl/inspirewfs_Existierende_Bodennutzung_Antragsschlaege?SERVICE=WFS&REQUEST=GetFeature&VERSION=2.0.0&typeNames=elu:ExistingLandUseObject&outputFormat=application/gml%2Bxml;%20version=3.2&EPSG=4258&BBOX={bbox}"
-bboxes = [
-    [49.1, 6.5423790007724, 49.332379000772, 6.7747580015449],
-    [49.1, 6.7747580015449, 49.332379000772, 7.0071370023173],
-    [49.1, 7.0071370023173, 49.216189500386, 7.2395160030898],
-    [49.216189500386, 7.0071370023173, 49.332379000772, 7.2395160030898],
-    [49.1, 7.2395160030898, 49.332379000772, 7.4718950038622],
-    [49.332379000772, 6.31, 49.564758001545, 6.5423790007724],
-    # Add more bboxes if needed
-]
-
-
-class Converter(AdminConverterMixin, FiboaBaseConverter):
-    sources = {
-        url.format(bbox=",".join(map(str, bbox))): f"{i}.gml"
-        for i, bbox in enumerate(bboxes, start=1)
-    }
+class Converter(TiledWFSConverterMixin, AdminConverterMixin, FiboaBaseConverter):
+    wfs_url = (
+        "https://geoportal.saarland.de/gdi-sl/inspirewfs_Existierende_Bodennutzung_Antragsschlaege"
+    )
+    wfs_type_names = "elu:ExistingLandUseObject"
+    wfs_params = {"outputFormat": "application/gml+xml; version=3.2", "EPSG": "4258"}
+    # Latitude first, as expected by WFS 2.0 for EPSG:4258
+    wfs_bbox = (49.1, 6.3, 49.65, 7.45)
+    wfs_id_column = "identifier"
 
     id = "de_sl"
     admin_subdivision_code = "SL"
@@ -49,9 +30,8 @@ class Converter(AdminConverterMixin, FiboaBaseConverter):
         "area": "metrics:area",
         "name": "name",
     }
+    column_extractors = {
+        "flik": ("description", r"(?i)flik:\s*([A-Z]{6}\d{10})"),
+        "area": ("description", r"(?i)Size in ha: (\d+(?:\.\d+)?)", "float"),
+    }
     missing_schemas = {"properties": {"name": {"type": "string"}}}
-
-    def migrate(self, gdf):
-        gdf["flik"] = gdf["description"].apply(parse_flik)
-        gdf["area"] = gdf["description"].apply(parse_size)
-        return super().migrate(gdf)
@@ -1,7 +1,7 @@
 from vecorel_cli.vecorel.extensions import ADMIN_DIVISION
 
 from fiboa_cli.conversion.fiboa_converter import FiboaBaseConverter
-from fiboa_cli.datasets.commons.data import read_data_csv
+from fiboa_cli.datasets.commons.data import data_mapping
 
 
 class ESBaseConverter(FiboaBaseConverter):
@@ -42,9 +42,8 @@ class ESBaseConverter(FiboaBaseConverter):
 
     def migrate(self, gdf):
         # This actually is a land use code. Not sure if we should put this in crop:code
-        rows = read_data_csv("es_coda_uso.csv")
-        mapping = {row["original_code"]: row["original_name"] for row in rows}
-        mapping_en = {row["original_code"]: row["name_en"] for row in rows}
+        mapping = data_mapping("es_coda_uso.csv", "original_code", "original_name")
+        mapping_en = data_mapping("es_coda_uso.csv", "original_code", "name_en")
         gdf["crop:name"] = gdf[self.use_code_attribute].map(mapping)
         gdf["crop:name_en"] = gdf[self.use_code_attribute].map(mapping_en)
         return super().migrate(gdf)
@@ -1,7 +1,7 @@
 import pandas as pd
 
 from ..conversion.fiboa_converter import FiboaBaseConverter
-from .commons.data import read_data_csv
+from .commons.data import data_mapping
 
 
 class ESCatConverter(FiboaBaseConverter):
@@ -70,10 +70,9 @@ This map allows you to locate the crops declared in the Agrarian Declaration - D
         if to_lower:
             gdf.rename(columns=to_lower, inplace=True)
 
-        rows = read_data_csv("es_cat.csv")
-        mapping = {row["original_name"]: row["original_code"] for row in rows}
-        mapping_en = {row["original_name"]: row["translated_name"] for row in rows}
-        missing = {k for k in gdf["cultiu"].unique() if k not in mapping}
+        mapping = data_mapping("es_cat.csv", "original_name", "original_code")
+        mapping_en = data_mapping("es_cat.csv", "original_name", "translated_name")
+        missing = set(gdf["cultiu"].unique()) - set(mapping.index)
         assert len(missing) == 0, f"Can not map crops {missing}"
         gdf["crop:code"] = gdf["cultiu"].map(mapping)
         gdf["crop:name_en"] = gdf["cultiu"].map(mapping_en)
@@ -24,6 +24,7 @@ Free use of the data is permitted, but commercial exploitation is prohibited.
     """
     provider = "Junta de Castilla y León <https://datos.jcyl.es/web/jcyl/set/es/sector-publico/sigpac/1284212629849>"
     license = "CC-NC: Free use of the data is permitted, but commercial exploitation is prohibited <http://ftp.itacyl.es/cartografia/LICENCIA-IGCYL-NC-2012.pdf>"
+    parallel_read = True
 
     columns = {
         "DN_OID": "id",
@@ -1,10 +1,8 @@
 import re
-from os import makedirs, path
 
 import pandas as pd
 import requests
 from loguru import logger
-from vecorel_cli.vecorel.util import name_from_uri
 
 from .es import ESBaseConverter
 
@@ -31,6 +29,8 @@ class NCConverter(ESBaseConverter):
     }
     use_code_attribute = "IDUSO24"
     index_as_id = True
+    # Hostname has invalid SSL, avoid ssl-errors
+    verify_ssl = False
 
     def get_urls(self):
         # scrape HTML page for sources
@@ -42,27 +42,12 @@ class NCConverter(ESBaseConverter):
             for src in re.findall(r'value:"(\d+)"', content)
         }
 
-    def prefill_cache(self, uris, cache_folder=None):
-        if cache_folder is None:
-            logger.warning("Use -c <cache_dir> to prefill the cache dir, working around SSL errors")
-            return
-
-        makedirs(cache_folder, exist_ok=True)
+    def download_files(self, uris, cache_folder=None):
+        _, cache_folder = self.get_cache(cache_folder)
         logger.warning("Suppressing SSL-errors, filling cache with unverified SSL requests")
         requests.packages.urllib3.disable_warnings()  # Suppress InsecureRequestWarning
-        for uri in list(uris):
-            target = path.join(cache_folder, name_from_uri(uri))
-            if not path.exists(target):
-                r = requests.get(uri, verify=False)
-                if r.status_code == 200:
-                    with open(target, "wb") as f:
-                        f.write(r.content)
-                else:
-                    logger.error(f"Skipping url {uri}, status_code={r.status_code}")
-                    uris.pop(uri)
-
-    def download_files(self, uris, cache_folder=None):
-        # Hostname has invalid SSL, prefill cache and avoid ssl-errors
-        self.prefill_cache(uris, cache_folder)
+        for uri in self.prefetch_files(uris, cache_folder):
+            logger.error(f"Skipping url {uri}")
+            uris.pop(uri)
 
         return super().download_files(uris, cache_folder=cache_folder)
@@ -3,7 +3,7 @@ from vecorel_cli.conversion.admin import AdminConverterMixin
 
 from ..conversion.convert_gml import gml_assure_columns
 from ..conversion.fiboa_converter import FiboaBaseConverter
-from .commons.data import read_data_csv
+from .commons.data import data_mapping
 from .commons.hcat import AddHCATMixin
 
 
@@ -43,8 +43,7 @@ class IEConverter(AdminConverterMixin, AddHCATMixin, FiboaBaseConverter):
         gdf["crop_name"] = gdf["crop_name"].str.split(", ").str.get(0)
         gdf = gdf[gdf["crop_name"] != "Void"]  # Exclude non-agriculture fields
 
-        rows = read_data_csv("ie_2023.csv")
-        mapping = {row["original_name"]: index + 1 for index, row in enumerate(rows)}
+        mapping = data_mapping("ie_2023.csv", "original_name")
         gdf["crop_code"] = gdf["crop_name"].map(mapping)
 
         return super().migrate(gdf)
@@ -2,7 +2,7 @@ import geopandas as gpd
 from vecorel_cli.vecorel.extensions import ADMIN_DIVISION
 
 from fiboa_cli.conversion.fiboa_converter import FiboaBaseConverter
-from fiboa_cli.datasets.commons.data import read_data_csv
+from fiboa_cli.datasets.commons.data import data_mapping
 from fiboa_cli.datasets.commons.hcat import CROP_EXTENSION
 
 CODE_LIST = "https://fiboa.org/code/jecam/crop.csv"
@@ -60,12 +60,10 @@ https://doi.org/10.18167/DVN1/P7OLAP, CIRAD Dataverse, V4
 
     def migrate(self, gdf) -> gpd.GeoDataFrame:
         gdf = super().migrate(gdf)
-        rows = read_data_csv("country_codes.csv")
-        mapping = {row["name"]: row["alpha-2"] for row in rows}
+        mapping = data_mapping("country_codes.csv", "name", "alpha-2")
         gdf["admin:country_code"] = gdf["Country"].map(mapping)
 
-        rows = read_data_csv("jecam_crop.csv")
-        mapping = {row["crop_name"]: index + 1 for index, row in enumerate(rows)}
+        mapping = data_mapping("jecam_crop.csv", "crop_name")
         # todo: The dataset has null values for crop code, but the crop extension
         # requires a string. We set them to empty strings for now,
         # but it should be reconsidered in the future
@@ -1,19 +1,14 @@
 from vecorel_cli.conversion.admin import AdminConverterMixin
 
+from ..conversion.converter_wfs import WFSConverterMixin
 from ..conversion.fiboa_converter import FiboaBaseConverter
 from .commons.ec import AddHCATMixin
 
-count = 3000
 
-
-class Converter(AdminConverterMixin, AddHCATMixin, FiboaBaseConverter):
-    sources = {
-        "https://karte.lad.gov.lv/arcgis/services/lauki/MapServer/WFSServer"
-        f"?request=GetFeature&service=wfs&version=2.0.0&typeNames=Lauki&count={count}&startindex={count * i}": f"lv_{i}_{count}.xml"
-        for i in range(
-            500000 // count
-        )  # TODO number should be dynamic, stop reading with 0 results
-    }
+class Converter(WFSConverterMixin, AdminConverterMixin, AddHCATMixin, FiboaBaseConverter):
+    wfs_url = "https://karte.lad.gov.lv/arcgis/services/lauki/MapServer/WFSServer"
+    wfs_type_names = "Lauki"
+    wfs_page_size = 3000
 
     id = "lv"
     short_name = "Latvia"
@@ -2,7 +2,7 @@ import pandas as pd
 from vecorel_cli.vecorel.extensions import ADMIN_DIVISION
 
 from ..conversion.fiboa_converter import FiboaBaseConverter
-from .commons.data import read_data_csv
+from .commons.data import data_mapping
 
 
 class NZCropConverter(FiboaBaseConverter):
@@ -46,7 +46,6 @@ created in 2017. The current update has incorporated data from the 2019 – 2020
 
     def migrate(self, gdf):
         # MAP back; https://www.iso.org/obp/ui/#iso:code:3166:NZ
-        rows = read_data_csv("nz_region_codes.csv")
-        mapping = {row["Subdivision name"]: row["3166-2 code"][len("NZ-") :] for row in rows}
-        gdf["Region"] = gdf["Region"].map(mapping)
+        mapping = data_mapping("nz_region_codes.csv", "Subdivision name", "3166-2 code")
+        gdf["Region"] = gdf["Region"].map(mapping.str[len("NZ-") :])
         return super().migrate(gdf)
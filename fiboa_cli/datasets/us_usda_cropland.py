@@ -1,8 +1,12 @@
 import pandas as pd
+import shapely
+from geopandas import GeoDataFrame
 from loguru import logger
 from vecorel_cli.conversion.admin import AdminConverterMixin
 
+from ..conversion.dissolve import dissolve_parts
 from ..conversion.fiboa_converter import FiboaBaseConverter
+from ..parallel import default_workers, ordered_map
 from .commons.ec import load_ec_mapping
 from .commons.hcat import AddHCATMixin
 
@@ -49,6 +53,7 @@ CSB represents non-confidential single crop field boundaries over a set time fra
         }
     }
     ec_mapping_csv = "https://fiboa.org/code/us/usda/cropland.csv"
+    requires_all_data = True
 
     def migrate(self, gdf):
         """
@@ -57,20 +62,34 @@ CSB represents non-confidential single crop field boundaries over a set time fra
 
         "dissolve": merge adjacent polygons with the same crop
         geodataframe.Dissolve(method="unary") is **slow** for large datasets
-        So we're handling this huge dataset in blocks, states are a natural grouping-method
+        So we're handling this huge dataset in blocks, states are a natural grouping-method.
+        The states are dissolved in parallel processes and within a state only the groups of
+        polygons that touch each other are unioned.
         """
         assert self.variant, "Variant must be set"
         crop_key = f"CDL{self.variant}"
         self.columns[crop_key] = "crop:code"
 
         gdf = super().migrate(gdf)
+        gdf = gdf[gdf[crop_key].notna()]
         states = list(gdf["STATEFIPS"].unique())
+        workers = min(len(states), self.workers or default_workers())
+        logger.info(f"Dissolving {len(states)} states with {workers} processes")
+
+        def jobs():
+            for state in states:
+                df = gdf[gdf["STATEFIPS"] == state]
+                yield df[crop_key].to_numpy(), shapely.to_wkb(df.geometry.to_numpy())
+
         gdfs = []
-        for state in states:
-            logger.info(f"Handling State {state}")
-            df = gdf[gdf["STATEFIPS"] == state].explode()
-            df = df.dissolve(by=[crop_key], aggfunc="first", as_index=False).explode()
-            gdfs.append(df)
+        results = ordered_map(_dissolve_state, jobs(), workers=workers, processes=True)
+        for state, (codes, wkb) in zip(states, results):
+            logger.info(f"Dissolved State {state}")
+            df = gdf[gdf["STATEFIPS"] == state]
+            # Same as dissolve(aggfunc="first"), every polygon gets the first values of its crop
+            first = df.drop(columns=[df.geometry.name]).groupby(crop_key).first()
+            data = first.loc[codes].reset_index()
+            gdfs.append(GeoDataFrame(data, geometry=shapely.from_wkb(wkb), crs=gdf.crs))
         gdf = pd.concat(gdfs)
         del gdfs
         if self.ec_mapping is None:
@@ -80,3 +99,9 @@ CSB represents non-confidential single crop field boundaries over a set time fra
         }
         gdf["crop:name"] = gdf[crop_key].map(original_name_mapping)
         return gdf
+
+
+def _dissolve_state(job):
+    # Runs in a separate process
+    codes, wkb = job
+    return dissolve_parts(codes, wkb)
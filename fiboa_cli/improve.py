@@ -1,22 +1,44 @@
 import json
+import os
+import time
+from copy import deepcopy
+from pathlib import Path
+from typing import Optional
 
 import click
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import spdx_license_list
 from geopandas import GeoDataFrame
-from vecorel_cli.basecommand import runnable
+from geopandas.io.arrow import _arrow_to_geopandas
+from vecorel_cli.basecommand import BaseCommand, runnable
 from vecorel_cli.encoding.auto import create_encoding
+from vecorel_cli.encoding.geojson import VecorelJSONEncoder
+from vecorel_cli.encoding.geoparquet import GeoParquet
 from vecorel_cli.improve import ImproveData as Base
+from vecorel_cli.parquet.types import get_pyarrow_field
 from vecorel_cli.vecorel.collection import Collection
-from vecorel_cli.vecorel.extensions import ADMIN_DIVISION
+from vecorel_cli.vecorel.extensions import ADMIN_DIVISION, GEOMETRY_METRICS
 from vecorel_cli.vecorel.version import sdl_uri
 
-from fiboa_cli.conversion.fiboa_converter import FiboaBaseConverter
+from fiboa_cli.cli.options import FILES_OR_GLOB_ARG, TARGET_FILE_OR_FOLDER, WORKERS
+from fiboa_cli.conversion.fiboa_converter import AREA_KEY, PERIMETER_KEY, FiboaBaseConverter
 from fiboa_cli.datasets.commons.ec import AddHCATMixin
 from fiboa_cli.datasets.commons.hcat import CROP_EXTENSION, HCAT_EXTENSION
+from fiboa_cli.metrics import fill_metrics
+from fiboa_cli.parallel import ordered_map
+from fiboa_cli.parquet.writer import GeoParquetStreamWriter, get_constant_columns
 from fiboa_cli.registry import Registry
 
 
 class ImproveData(Base):
+    _quiet = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._hcat_converters = {}
+
     @staticmethod
     def get_cli_args():
         return {
@@ -27,26 +49,127 @@ class ImproveData(Base):
                 type=str,
                 help="Adds hcat-extension and columns to the collection, based on the crop:code column and a mapping file. Requires a mapping file as argument, e.g. 'at_2021.csv', find them at https://github.com/maja601/EuroCrops/tree/main/csvs/country_mappings",
             ),
+            "geodesic": click.option(
+                "--geodesic",
+                is_flag=True,
+                type=click.BOOL,
+                help="Computes the sizes (see --add-sizes) on the ellipsoid instead of in a projected CRS",
+                default=False,
+            ),
+            "stream": click.option(
+                "--stream",
+                is_flag=True,
+                type=click.BOOL,
+                help="Improves GeoParquet files row group by row group instead of all at once. Keeps memory usage low for large files.",
+                default=False,
+            ),
         }
 
+    def improve_files(
+        self, sources: list, target_folder=None, workers: Optional[int] = None, **kwargs
+    ) -> dict:
+        """
+        Improves many files in parallel processes, e.g. to migrate a whole archive of files.
+
+        The files are written to the target folder or, if not given, replaced.
+        If only a migration is requested, files that are migrated already (i.e. that have
+        collection metadata) are skipped. This only reads the metadata from the file footer.
+        Failures don't stop the other files, the returned summary lists the status, the time
+        spent and the error (if any) per file.
+        """
+        start = time.perf_counter()
+        output_options = ("compression", "geoparquet_version", "indent", "stream")
+        migrate_only = not any(v for k, v in kwargs.items() if k not in output_options)
+        # The files keep their paths relative to the common folder of all files in the target
+        # folder, so that files with the same name in different folders don't overwrite each other
+        root = None
+        if target_folder and len(sources) > 0:
+            root = os.path.commonpath([Path(source).resolve().parent for source in sources])
+        files = []
+        jobs = []
+        for source in sources:
+            if migrate_only and self.is_migrated(source):
+                files.append(
+                    {"source": str(source), "target": None, "status": "skipped", "seconds": 0}
+                )
+            elif target_folder:
+                target = Path(target_folder) / Path(source).resolve().relative_to(root)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                jobs.append((len(files), (source, target, kwargs)))
+                files.append(None)
+            else:
+                jobs.append((len(files), (source, source, kwargs)))
+                files.append(None)
+
+        self.info(f"Improving {len(jobs)} files, skipping {len(sources) - len(jobs)} files")
+        results = ordered_map(
+            _improve_file, [job for _, job in jobs], workers=workers, processes=True
+        )
+        for (i, _), result in zip(jobs, results):
+            files[i] = result
+            if result["status"] == "failed":
+                self.error(f"{result['source']}: {result['error']}")
+            else:
+                self.info(f"{result['source']}: {result['seconds']:.1f}s")
+
+        summary = {status: 0 for status in ("improved", "skipped", "failed")}
+        for file in files:
+            summary[file["status"]] += 1
+        summary["seconds"] = time.perf_counter() - start
+        summary["files"] = files
+        return summary
+
+    def is_migrated(self, source) -> bool:
+        """Whether a GeoParquet file has collection metadata, i.e. is not a legacy fiboa file"""
+        encoding = create_encoding(source)
+        if not isinstance(encoding, GeoParquet):
+            return False
+        try:
+            return b"collection" in (encoding.get_metadata() or {})
+        except Exception:
+            # Broken files are reported when they are improved
+            return False
+
     @runnable
     def improve_file(
-        self, source, target=None, compression=None, geoparquet_version=None, indent=None, **kwargs
+        self,
+        source,
+        target=None,
+        compression=None,
+        geoparquet_version=None,
+        indent=None,
+        stream=False,
+        **kwargs,
     ):
         # Override method to be able to convert input from fiboa-0.2.0 to fiboa-0.3.0
         if not target:
             target = source
 
         input_encoding = create_encoding(source)
+        is_parquet = isinstance(input_encoding, GeoParquet) and isinstance(
+            create_encoding(target), GeoParquet
+        )
+        if is_parquet and not any(kwargs.values()):
+            # Files that only need to be migrated don't need to be decoded
+            fiboa_2 = None
+            if geoparquet_version in (None, input_encoding.get_geoparquet_version()):
+                fiboa_2 = self.get_fiboa_2_metadata(input_encoding)
+            if fiboa_2 is not None and fiboa_2.get("fiboa_version") == "0.2.0":
+                return self.migrate_fiboa_2_file(input_encoding, target, fiboa_2, compression)
+        if stream:
+            if is_parquet:
+                return self.improve_file_stream(
+                    input_encoding, target, compression, geoparquet_version, **kwargs
+                )
+            self.warning("Streaming is only supported for GeoParquet files, reading all data")
+
         geodata = input_encoding.read()
         collection = input_encoding.get_collection()
 
-        if not collection:
-            # Try to migrate from fiboa-0.2.0 to fiboa-0.3.0
-            metadata = input_encoding.get_metadata()
-            if b"fiboa" in metadata:
-                fiboa_2 = json.loads(metadata[b"fiboa"].decode("utf-8"))
-                geodata, collection = self.migrate_fiboa_2(geodata, fiboa_2, source.name)
+        # Try to migrate from fiboa-0.2.0 to fiboa-0.3.0
+        fiboa_2 = self.get_fiboa_2_metadata(input_encoding)
+        if fiboa_2 is not None:
+            geodata, collection = self.migrate_fiboa_2(geodata, fiboa_2, source.name)
 
         geodata, collection = self.improve(geodata, collection=collection, **kwargs)
 
@@ -60,20 +183,224 @@ class ImproveData(Base):
         )
         return target
 
+    def improve_file_stream(
+        self,
+        input_encoding: GeoParquet,
+        target,
+        compression=None,
+        geoparquet_version=None,
+        **kwargs,
+    ):
+        """
+        Improves a GeoParquet file row group by row group.
+
+        All improvements only depend on the row itself, so every batch is improved on its own and
+        appended to the target file. Memory usage is bounded by the row group size.
+        """
+        collection = input_encoding.get_collection()
+        geo_metadata = input_encoding.get_geoparquet_metadata()
+        # Try to migrate from fiboa-0.2.0 to fiboa-0.3.0
+        fiboa_2 = self.get_fiboa_2_metadata(input_encoding)
+
+        # Constant columns are moved to the collection as in GeoParquet.write, but as only
+        # one batch is available at a time, they are determined from the row group statistics
+        pf = input_encoding._get_pg_file()
+        renames = {**FIBOA_2_RENAME, "area": "metrics:area"} if fiboa_2 is not None else {}
+        renames.update(kwargs.get("rename") or {})
+        constants = []
+        for column in get_constant_columns(pf.metadata, exclude=geo_metadata["columns"]):
+            constants.extend(dict.fromkeys([column, renames.get(column, column)]))
+
+        output_file = self.get_output_file(input_encoding, target)
+
+        # Every batch is mapped on its own, the mapping is checked once for all batches
+        hcat = self.get_hcat_converter(kwargs["add_hcat"]) if kwargs.get("add_hcat") else None
+        if hcat is not None:
+            hcat.start_hcat_batches()
+
+        writer = None
+        try:
+            for batch in pf.iter_batches(batch_size=GeoParquet.row_group_size):
+                geodata = _arrow_to_geopandas(pa.Table.from_batches([batch]), geo_metadata)
+                if "bbox" in geodata.columns:
+                    del geodata["bbox"]
+
+                # Every batch starts with the original collection, the first result is written
+                batch_collection = deepcopy(collection)
+                if fiboa_2 is not None:
+                    geodata, batch_collection = self.migrate_fiboa_2(
+                        geodata, fiboa_2, input_encoding.uri.name
+                    )
+                geodata, batch_collection = self.improve(
+                    geodata, collection=batch_collection, **kwargs
+                )
+
+                if writer is None:
+                    writer = GeoParquetStreamWriter(output_file, constants=constants)
+                    writer.set_collection(batch_collection)
+                    writer.open(compression, geoparquet_version=geoparquet_version)
+                    self._quiet = True
+                writer.write_batch(geodata)
+        finally:
+            self._quiet = False
+            if hcat is not None:
+                hcat.hcat_batches = False
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            raise ValueError("No data found in source")
+        if hcat is not None:
+            hcat.finish_hcat_batches()
+        if output_file != Path(target):
+            os.replace(output_file, target)
+        return target
+
+    def migrate_fiboa_2_file(
+        self, input_encoding: GeoParquet, target, original: Collection, compression=None
+    ):
+        """
+        Migrates a fiboa 0.2.0 GeoParquet file without decoding it.
+
+        Only the schema and metadata change: columns are renamed on the Arrow schema and the area
+        is converted from ha to m2 with a compute kernel. All other columns, incl. the geometries
+        (WKB) and the covering bbox, are copied through row group by row group.
+        """
+        self.info(f"Migrating file from fiboa version {original['fiboa_version']}")
+        collection = self.migrate_fiboa_2_collection(original, input_encoding.uri.name)
+        pf = input_encoding._get_pg_file()
+        schema = pf.schema_arrow
+        geo_metadata = input_encoding.get_geoparquet_metadata()
+        rename = self.migrate_fiboa_2_renames(original, schema.names)
+
+        def migrate(table: pa.Table) -> pa.Table:
+            if "area" in rename and "area" in table.column_names:
+                i = table.schema.get_field_index("area")
+                area = table.column(i)
+                factor = pa.scalar(10000, area.type if pa.types.is_floating(area.type) else None)
+                table = table.set_column(i, "area", pc.multiply(area, factor))
+            return table.rename_columns([rename.get(name, name) for name in table.column_names])
+
+        # Move constant columns to the collection, as GeoParquet.write does
+        context = collection.get_collection_context()
+        exclude = [*geo_metadata["columns"], "bbox"]
+        constants = [
+            name
+            for name in get_constant_columns(pf.metadata, exclude=exclude)
+            if context.get(rename.get(name, name)) is None
+        ]
+        if len(constants) > 0:
+            values = migrate(pf.read_row_group(0, columns=constants).slice(0, 1)).to_pandas()
+            for column in values.columns:
+                collection[column] = values[column].iloc[0]
+
+        # Apply the data types from the schemas of the new collection, as GeoParquet.write does
+        drop = [rename.get(name, name) for name in constants]
+        schema = migrate(schema.empty_table()).drop_columns(drop).schema
+        schemas = collection.merge_schemas({})
+        props = schemas.get("properties", {})
+        required = schemas.get("required", [])
+        for i, name in enumerate(schema.names):
+            dtype = props.get(name, {}).get("type")
+            if name in exclude or dtype is None:
+                continue
+            try:
+                field = get_pyarrow_field(name, schema=props[name], required=name in required)
+            except Exception as e:
+                self.warning(f"{name}: Keeping data type - {e}")
+                continue
+            if field is not None:
+                schema = schema.set(i, field)
+        schema = schema.with_metadata(
+            {
+                "geo": json.dumps(geo_metadata),
+                "collection": json.dumps(collection, cls=VecorelJSONEncoder),
+            }
+        )
+
+        if compression == "zstd":
+            compression_level = 15
+        else:
+            compression_level = None
+        output_file = self.get_output_file(input_encoding, target)
+        with pq.ParquetWriter(
+            str(output_file), schema, compression=compression, compression_level=compression_level
+        ) as writer:
+            # Keep the row groups of the source file
+            for i in range(pf.num_row_groups):
+                table = migrate(pf.read_row_group(i)).drop_columns(drop)
+                writer.write_table(table.cast(schema))
+
+        if output_file != Path(target):
+            os.replace(output_file, target)
+        return target
+
+    def get_output_file(self, input_encoding, target) -> Path:
+        # Don't overwrite the file that is being read, replace it once all data is written
+        target = Path(target)
+        if target.resolve() == Path(str(input_encoding.uri)).resolve():
+            return target.with_name(f"{target.name}.part")
+        return target
+
+    def get_fiboa_2_metadata(self, input_encoding) -> Optional[dict]:
+        if input_encoding.get_collection():
+            return None
+        metadata = input_encoding.get_metadata()
+        if not metadata or b"fiboa" not in metadata:
+            return None
+        return json.loads(metadata[b"fiboa"].decode("utf-8"))
+
+    def info(self, message: str, **kwargs):
+        # While streaming, only the improvements of the first batch are reported
+        if self._quiet:
+            self.debug(message, **kwargs)
+        else:
+            super().info(message, **kwargs)
+
     def improve(
-        self, gdf: GeoDataFrame, collection: Collection, add_hcat: str = None, **kwargs
+        self,
+        gdf: GeoDataFrame,
+        collection: Collection,
+        add_hcat: str = None,
+        add_sizes: bool = False,
+        geodesic: bool = False,
+        **kwargs,
     ) -> tuple[GeoDataFrame, Collection]:
         gdf, collection = super().improve(gdf, collection, **kwargs)
+        # Add sizes, overrides the base implementation to compute area and perimeter in one pass
+        if add_sizes:
+            gdf, collection = self.add_sizes(gdf, collection, geodesic=geodesic)
+            self.info("Computed sizes")
         # Add HCAT
         if add_hcat:
             gdf, collection = self.add_hcat(gdf, collection, add_hcat)
             self.info("Added HCAT columns and extension")
         return gdf, collection
 
+    def add_sizes(
+        self, gdf: GeoDataFrame, collection: Collection, geodesic: bool = False
+    ) -> tuple[GeoDataFrame, Collection]:
+        gdf = fill_metrics(gdf, area=AREA_KEY, perimeter=PERIMETER_KEY, geodesic=geodesic)
+        collection.add_schema(GEOMETRY_METRICS)
+        return gdf, collection
+
     def add_hcat(self, gdf, collection, mapping_file):
         if "crop:code" not in gdf.columns:
             raise Exception("Missing crop:code column in dataset")
 
+        for schemas in collection["schemas"].values():
+            if HCAT_EXTENSION not in schemas:
+                schemas.append(HCAT_EXTENSION)
+
+        return self.get_hcat_converter(mapping_file).add_hcat(gdf), collection
+
+    def get_hcat_converter(self, mapping_file):
+        # Reuse the converter, so that the mapping is loaded and compiled only once per file
+        if mapping_file not in self._hcat_converters:
+            self._hcat_converters[mapping_file] = self.create_hcat_converter(mapping_file)
+        return self._hcat_converters[mapping_file]
+
+    def create_hcat_converter(self, mapping_file):
         is_url = "/" in mapping_file
         _mapping_file = mapping_file
 
@@ -83,11 +410,7 @@ class ImproveData(Base):
             ec_mapping_csv = None if is_url else _mapping_file
             mapping_file = _mapping_file if is_url else None
 
-        for schemas in collection["schemas"].values():
-            if HCAT_EXTENSION not in schemas:
-                schemas.append(HCAT_EXTENSION)
-
-        return HCAT().add_hcat(gdf), collection
+        return HCAT()
 
     def migrate_fiboa_2(
         self, geodata, original: Collection, file_name: str
@@ -99,6 +422,17 @@ class ImproveData(Base):
             return geodata, original
 
         self.info(f"Migrating data from fiboa version {original['fiboa_version']}")
+        collection = self.migrate_fiboa_2_collection(original, file_name)
+        rename = self.migrate_fiboa_2_renames(original, geodata.columns)
+
+        # Transform area from ha to m2
+        if "area" in rename:
+            geodata["area"] *= 10000
+
+        geodata.rename(rename, axis=1, inplace=True)
+        return geodata, collection
+
+    def migrate_fiboa_2_collection(self, original: Collection, file_name: str) -> Collection:
         schemas = set()
         for e in original.get("fiboa_extensions", []):
             if e in EXTENSION_MAPPING:
@@ -132,25 +466,77 @@ class ImproveData(Base):
             if _licenses:
                 collection["license"] = f"{_licenses[0]['title']} <{_licenses[0]['href']}>"
 
-        # Rename columns
-        rename = {
-            k: v
-            for k, v in (
-                ("determination_datetime", "determination:datetime"),
-                ("determination_method", "determination:method"),
-                ("perimeter", "metrics:perimeter"),
-            )
-            if k in original
-        }
+        return collection
 
-        # Transform area from ha to m2
-        if "area" in geodata.columns:
-            geodata["area"] *= 10000
+    def migrate_fiboa_2_renames(self, original: Collection, columns) -> dict[str, str]:
+        rename = {k: v for k, v in FIBOA_2_RENAME.items() if k in original}
+        # The area is also transformed from ha to m2
+        if "area" in columns:
             rename["area"] = "metrics:area"
+        return rename
 
-        geodata.rename(rename, axis=1, inplace=True)
-        return geodata, collection
 
+class ImproveFiles(BaseCommand):
+    cmd_name = "improve-files"
+    cmd_title = "Improve multiple datasets"
+    cmd_help = f"'Improves' multiple {Registry.project} files (e.g. a folder or glob pattern) in parallel processes, see the improve command for the parameters."
+    cmd_final_report = True
+
+    @staticmethod
+    def get_cli_args():
+        return {
+            **ImproveData.get_cli_args(),
+            "source": FILES_OR_GLOB_ARG,
+            "target": TARGET_FILE_OR_FOLDER,
+            "workers": WORKERS,
+            "report": click.option(
+                "--report",
+                type=click.Path(exists=False, dir_okay=False, resolve_path=True),
+                help="Writes a JSON report with the status and timing of each file.",
+                default=None,
+            ),
+        }
+
+    @runnable
+    def improve_cli(self, source: list, target=None, workers=None, report=None, **kwargs):
+        if len(source) == 0:
+            raise ValueError("No source files provided")
+        improve = ImproveData()
+        if len(source) == 1 and not (target and Path(target).is_dir()) and not report:
+            return improve.improve_file(source[0], target=target, **kwargs)
+
+        summary = improve.improve_files(source, target, workers=workers, **kwargs)
+        if report:
+            self._json_dump_cli(summary, report, indent=2)
+        failed = summary["failed"]
+        if failed > 0:
+            raise ValueError(f"Improving failed for {failed} of {len(source)} files")
+        return (
+            f"Improved {summary['improved']} and skipped {summary['skipped']} files "
+            f"in {summary['seconds']:.1f} seconds"
+        )
+
+
+def _improve_file(job) -> dict:
+    # Runs in a separate process
+    source, target, kwargs = job
+    start = time.perf_counter()
+    result = {"source": str(source), "target": str(target)}
+    try:
+        ImproveData().improve_file(source, target=target, **kwargs)
+        result["status"] = "improved"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+FIBOA_2_RENAME = {
+    "determination_datetime": "determination:datetime",
+    "determination_method": "determination:method",
+    "perimeter": "metrics:perimeter",
+}
 
 EXTENSION_MAPPING = {
     "https://fiboa.github.io/hcat-extension/v0.2.0/schema.yaml": HCAT_EXTENSION,
@@ -1,5 +1,102 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+import click
+from vecorel_cli.basecommand import runnable
+from vecorel_cli.encoding.auto import create_encoding
 from vecorel_cli.merge import MergeDatasets as Base
+from vecorel_cli.registry import Registry
+
+from .cli.options import PARTITION_BY
+from .parquet.merge import StreamMerger
+from .parquet.partition import partition_file
+from .parquet.sort import hilbert_sort_file
 
 
 class MergeDatasets(Base):
-    pass
+    @staticmethod
+    def get_cli_args():
+        return {
+            **Base.get_cli_args(),
+            "stream": click.option(
+                "--stream",
+                is_flag=True,
+                type=click.BOOL,
+                help="Merges GeoParquet files row group by row group instead of loading all data into memory. The schema is unified from the file footers.",
+                default=False,
+            ),
+            "sort": click.option(
+                "--sort",
+                is_flag=True,
+                type=click.BOOL,
+                help="Sorts the rows of the merged file spatially (Hilbert curve), without loading all data into memory.",
+                default=False,
+            ),
+            "partition_by": PARTITION_BY,
+        }
+
+    @runnable
+    def merge(
+        self,
+        source,
+        target,
+        crs=None,
+        includes=[],
+        excludes=[],
+        stream=False,
+        sort=False,
+        partition_by=None,
+    ):
+        if partition_by:
+            return self.merge_partitioned(
+                source, target, list(partition_by), crs, includes, excludes, stream, sort
+            )
+
+        if stream:
+            target = self.merge_stream(
+                source, target, crs=crs, includes=includes, excludes=excludes
+            )
+        else:
+            target = super().merge(source, target, crs=crs, includes=includes, excludes=excludes)
+        if sort:
+            self.info("Sorting rows spatially")
+            hilbert_sort_file(target.uri)
+        return target
+
+    def merge_stream(self, source, target, crs=None, includes=[], excludes=[]):
+        """
+        Merges GeoParquet files without loading them into memory.
+
+        The schema of the merged file is determined from the footers (and collections) of all
+        files first, then the row groups of the files are converted and written one by one.
+        """
+        if not isinstance(source, list):
+            raise ValueError("Source must be a list.")
+        if len(source) == 0:
+            raise ValueError("No source files provided")
+
+        properties = Registry.core_properties.copy()
+        properties.extend(includes)
+        properties = [p for p in dict.fromkeys(properties) if p not in excludes]
+
+        merger = StreamMerger(source, properties, crs=crs or self.default_crs)
+        self.info(f"Merging {len(source)} files with {len(merger.schema)} columns")
+        rows = merger.write(target)
+        self.info(f"Wrote {rows} rows")
+        return create_encoding(target)
+
+    def merge_partitioned(self, source, target, partition_by, *args):
+        # Merge into a temporary file first, which is then split into the partitions
+        folder = Path(target)
+        folder.parent.mkdir(parents=True, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix=f".{folder.name}-", dir=folder.parent)
+        try:
+            temp_file = Path(temp_dir) / "data.parquet"
+            self.merge(source, temp_file, *args)
+            self.info(f"Writing partitions by {', '.join(partition_by)} to {folder}")
+            partitions = partition_file(temp_file, folder, partition_by)
+            self.info(f"Wrote {len(partitions)} partitions")
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return folder
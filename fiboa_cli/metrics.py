@@ -0,0 +1,186 @@
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import shapely
+from geopandas import GeoDataFrame, GeoSeries
+from pyproj import CRS, Transformer
+
+from .parallel import ordered_map
+
+# Equal-area projection that is used if the data is not in a metric CRS
+EQUAL_AREA_CRS = "EPSG:6933"
+
+
+@lru_cache(maxsize=32)
+def is_metric_crs(crs) -> bool:
+    """Whether the coordinates of the CRS are in meters, cached per CRS"""
+    if crs is None:
+        return True
+    return CRS.from_user_input(crs).axis_info[0].unit_name in ("m", "metre", "meter")
+
+
+@lru_cache(maxsize=32)
+def _equal_area_transformer(crs: str) -> Transformer:
+    return Transformer.from_crs(crs, EQUAL_AREA_CRS, always_xy=True)
+
+
+@lru_cache(maxsize=32)
+def _geographic(crs: str) -> tuple[Optional[Transformer], object]:
+    # Transformer to longitude/latitude (if needed) and the ellipsoid of the CRS
+    crs = CRS.from_user_input(crs)
+    geographic = crs.geodetic_crs
+    transformer = None
+    if not crs.is_geographic:
+        transformer = Transformer.from_crs(crs, geographic, always_xy=True)
+    return transformer, geographic.get_geod()
+
+
+def _planar(geometries: np.ndarray, crs: Optional[str], perimeter: bool = True) -> np.ndarray:
+    if crs is not None:
+        transformer = _equal_area_transformer(crs)
+        geometries = shapely.transform(geometries, transformer.transform, interleaved=False)
+    if not perimeter:
+        return shapely.area(geometries)
+    return np.stack([shapely.area(geometries), shapely.length(geometries)])
+
+
+def _geodesic(geometries: np.ndarray, crs: str) -> np.ndarray:
+    # Geometries in a geographic CRS are always in longitude/latitude order
+    transformer, geod = _geographic(crs)
+    if transformer is not None:
+        geometries = shapely.transform(geometries, transformer.transform, interleaved=False)
+
+    # Flatten to rings: the first ring of each polygon is the exterior, the others are holes
+    polygons, geometry_index = shapely.get_parts(geometries, return_index=True)
+    rings, polygon_index = shapely.get_rings(polygons, return_index=True)
+    coords, ring_index = shapely.get_coordinates(rings, return_index=True)
+    offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ring_index, minlength=len(rings)), out=offsets[1:])
+    is_exterior = np.ones(len(rings), dtype=bool)
+    is_exterior[1:] = polygon_index[1:] != polygon_index[:-1]
+
+    # Geod has no batch API for polygons, but one call per ring stays in C for all its vertices
+    lons, lats = np.ascontiguousarray(coords[:, 0]), np.ascontiguousarray(coords[:, 1])
+    area = np.empty(len(rings))
+    length = np.empty(len(rings))
+    for i in range(len(rings)):
+        start, end = offsets[i], offsets[i + 1]
+        area[i], length[i] = geod.polygon_area_perimeter(lons[start:end], lats[start:end])
+    area = np.where(is_exterior, 1, -1) * np.abs(area)
+
+    owner = geometry_index[polygon_index]
+    result = np.stack(
+        [
+            np.bincount(owner, weights=area, minlength=len(geometries)),
+            np.bincount(owner, weights=length, minlength=len(geometries)),
+        ]
+    ).astype(float)
+    result[:, shapely.is_missing(geometries)] = np.nan
+    return result
+
+
+def _measure(geometries: np.ndarray, crs: Optional[str], mode: str) -> np.ndarray:
+    if mode == "geodesic":
+        return _geodesic(geometries, crs)
+    return _planar(geometries, crs, perimeter=mode == "planar")
+
+
+def _measure_wkb(args) -> np.ndarray:
+    wkb, crs, mode = args
+    return _measure(shapely.from_wkb(wkb), crs, mode)
+
+
+def _measure_chunked(
+    geometries: GeoSeries, crs: Optional[str], mode: str, workers: Optional[int], chunk_size: int
+) -> np.ndarray:
+    values = np.asarray(geometries.values)
+    if len(values) <= chunk_size or workers == 1:
+        return _measure(values, crs, mode)
+
+    chunks = (
+        (shapely.to_wkb(values[i : i + chunk_size]), crs, mode)
+        for i in range(0, len(values), chunk_size)
+    )
+    results = ordered_map(_measure_wkb, chunks, workers=workers, processes=True)
+    return np.concatenate(list(results), axis=-1)
+
+
+def calculate_area(
+    geometries: GeoSeries, workers: Optional[int] = None, chunk_size: int = 50_000
+) -> np.ndarray:
+    """
+    Calculates the area of the geometries in square meters.
+
+    If the CRS is not metric, the geometries are reprojected to an equal-area projection first.
+    Large inputs are split into chunks that are reprojected in parallel processes.
+    """
+    if is_metric_crs(geometries.crs):
+        return geometries.area.to_numpy()
+    return _measure_chunked(geometries, geometries.crs.to_wkt(), "area", workers, chunk_size)
+
+
+def calculate_metrics(
+    geometries: GeoSeries,
+    geodesic: bool = False,
+    workers: Optional[int] = None,
+    chunk_size: int = 50_000,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calculates the area (in square meters) and the perimeter (in meters) of the geometries.
+
+    Both are computed in a single pass over the geometries. Planar metrics are computed in the
+    CRS of the data or, if it is not metric, in an equal-area projection. Geodesic metrics are
+    computed on the ellipsoid of the CRS. Large inputs are processed in parallel chunks.
+    """
+    crs = geometries.crs.to_wkt() if geometries.crs is not None else None
+    if geodesic:
+        if crs is None:
+            raise ValueError("Geodesic metrics require geometries with a CRS")
+        mode = "geodesic"
+    else:
+        mode = "planar"
+        if is_metric_crs(geometries.crs):
+            crs = None
+    area, perimeter = _measure_chunked(geometries, crs, mode, workers, chunk_size)
+    return area, perimeter
+
+
+def fill_metrics(
+    gdf: GeoDataFrame,
+    area: Optional[str] = None,
+    perimeter: Optional[str] = None,
+    geodesic: bool = False,
+    workers: Optional[int] = None,
+) -> GeoDataFrame:
+    """
+    Fills missing values (NaN or 0) in the given area and perimeter columns.
+
+    The columns are created if they don't exist. Only the rows that miss at least one of the
+    values are measured, both metrics are computed in the same pass.
+    """
+    columns = {}
+    for column in (area, perimeter):
+        if column:
+            if column in gdf.columns:
+                columns[column] = gdf[column].astype(float)
+            else:
+                columns[column] = pd.Series(np.nan, index=gdf.index, dtype=float)
+    missing = {column: (values == 0) | values.isna() for column, values in columns.items()}
+    if not columns or not any(m.any() for m in missing.values()):
+        return gdf
+
+    rows = np.logical_or.reduce([m.to_numpy() for m in missing.values()])
+    geometries = gdf.geometry[rows]
+    if perimeter or geodesic:
+        computed = calculate_metrics(geometries, geodesic=geodesic, workers=workers)
+        computed = dict(zip((area, perimeter), computed))
+    else:
+        computed = {area: calculate_area(geometries, workers=workers)}
+
+    for column, values in columns.items():
+        mask = missing[column].to_numpy()
+        values[mask] = computed[column][mask[rows]]
+        gdf[column] = values
+    return gdf
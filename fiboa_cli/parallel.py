@@ -0,0 +1,58 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def default_workers() -> int:
+    """
+    Number of parallel workers, defaults to the number of CPUs.
+    Can be overridden with the FIBOA_WORKERS environment variable.
+    """
+    workers = os.getenv("FIBOA_WORKERS")
+    if workers:
+        return max(1, int(workers))
+    return os.cpu_count() or 1
+
+
+def ordered_map(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    workers: Optional[int] = None,
+    processes: bool = False,
+    prefetch: Optional[int] = None,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+) -> Iterator[R]:
+    """
+    Like map(), but runs fn in a bounded pool of threads (or processes).
+
+    Results are yielded in the order of the items, no matter in which order they finish.
+    At most `prefetch` items (default: twice the number of workers) are in flight at once,
+    so results don't pile up in memory if the consumer is slower than the workers.
+    The initializer is called with initargs in every worker before the first item.
+    """
+    if workers is None:
+        workers = default_workers()
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        yield from map(fn, items)
+        return
+
+    prefetch = max(prefetch or workers * 2, workers)
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    executor = executor_class(max_workers=workers, initializer=initializer, initargs=initargs)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
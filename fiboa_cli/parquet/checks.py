@@ -0,0 +1,298 @@
+from typing import Callable, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.types as pat
+import shapely
+from vecorel_cli.parquet.types import is_numerical_type, is_scalar_type
+from vecorel_cli.validation.data import REGEX_EMAIL, REGEX_UUID
+
+# Number of row indices that are listed per issue
+MAX_ROWS = 10
+
+# Geometry type ids by name, e.g. multipolygon => 6
+GEOMETRY_TYPES = {t.name.lower(): t.value for t in shapely.GeometryType}
+
+# A check returns a mask of the invalid values and the issue for an invalid value
+Check = tuple[Callable[[object], np.ndarray], Callable[[object], str]]
+
+
+def compile_checks(rules: dict) -> Optional[list[Check]]:
+    """
+    Compiles a property schema into checks that work on whole columns (Arrow compute or NumPy).
+
+    The checks are the same as in the per-value validation of vecorel_cli (validate_column).
+    Returns None if the schema can't be checked column-wise, e.g. for objects, unique array
+    items or regular expressions that are not supported by Arrow (RE2), the values must be
+    validated one by one then. The data type of the column is not checked.
+    """
+    dtype = rules.get("type")
+    if dtype == "string":
+        return compile_string(rules)
+    elif dtype is not None and is_numerical_type(dtype):
+        return compile_numerical(rules)
+    elif dtype == "array":
+        return compile_array(rules)
+    elif dtype == "geometry":
+        return compile_geometry(rules)
+    elif dtype == "bounding-box":
+        return compile_bbox(rules)
+    elif dtype is not None and is_scalar_type(dtype):
+        # Nothing to check for booleans, binary and temporal values
+        return []
+    return None
+
+
+def compile_string(rules: dict) -> Optional[list[Check]]:
+    checks = []
+    if "minLength" in rules:
+        min_length = rules["minLength"]
+        checks.append(
+            (
+                lambda a: pc.less(pc.utf8_length(a), min_length),
+                lambda v: f"String '{v}' is shorter than the minimum length of {min_length}.",
+            )
+        )
+    if "maxLength" in rules:
+        max_length = rules["maxLength"]
+        checks.append(
+            (
+                lambda a: pc.greater(pc.utf8_length(a), max_length),
+                lambda v: f"String '{v}' is longer than the maximum length of {max_length}.",
+            )
+        )
+    if "pattern" in rules:
+        pattern = rules["pattern"]
+        # The values must match from the beginning like with re.match
+        check = compile_regex(
+            f"^(?:{pattern})",
+            lambda v: f"String '{v}' does not match the required pattern: {pattern}.",
+        )
+        if check is None:
+            return None
+        checks.append(check)
+    if "enum" in rules:
+        allowed = ", ".join(rules["enum"])
+        checks.append(
+            compile_enum(
+                rules["enum"],
+                lambda v: f"String '{v}' is not one of the allowed values in the enumeration: {allowed}",
+            )
+        )
+    if "format" in rules:
+        if rules["format"] == "email":
+            checks.append(
+                compile_regex(
+                    REGEX_EMAIL.pattern, lambda v: f"String '{v}' is not a valid email address."
+                )
+            )
+        elif rules["format"] == "uuid":
+            checks.append(
+                compile_regex(REGEX_UUID.pattern, lambda v: f"String '{v}' is not a valid UUID.")
+            )
+        elif rules["format"] == "uri":
+            # URIs are parsed with urllib
+            return None
+    return checks
+
+
+def compile_regex(pattern: str, message: Callable[[object], str]) -> Optional[Check]:
+    try:
+        pc.match_substring_regex(pa.array([""]), pattern)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+    return (lambda a: pc.invert(pc.match_substring_regex(a, pattern)), message)
+
+
+def compile_enum(enum: list, message: Callable[[object], str]) -> Check:
+    def check(a):
+        try:
+            value_set = pa.array(enum).cast(a.type)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            value_set = pa.array(enum)
+        return pc.invert(pc.is_in(a, value_set=value_set))
+
+    return (check, message)
+
+
+def compile_numerical(rules: dict) -> list[Check]:
+    checks = []
+    if "minimum" in rules:
+        minimum = rules["minimum"]
+        checks.append(
+            (
+                lambda a: pc.less(a, minimum),
+                lambda v: f"Value {v} is less than the minimum allowed value of {minimum}.",
+            )
+        )
+    if "maximum" in rules:
+        maximum = rules["maximum"]
+        checks.append(
+            (
+                lambda a: pc.greater(a, maximum),
+                lambda v: f"Value {v} is greater than the maximum allowed value of {maximum}.",
+            )
+        )
+    if "exclusiveMinimum" in rules:
+        exclusive_minimum = rules["exclusiveMinimum"]
+        checks.append(
+            (
+                lambda a: pc.less_equal(a, exclusive_minimum),
+                lambda v: f"Value {v} is less than or equal to the exclusive minimum value of {exclusive_minimum}.",
+            )
+        )
+    if "exclusiveMaximum" in rules:
+        exclusive_maximum = rules["exclusiveMaximum"]
+        checks.append(
+            (
+                lambda a: pc.greater_equal(a, exclusive_maximum),
+                lambda v: f"Value {v} is greater than or equal to the exclusive maximum value of {exclusive_maximum}.",
+            )
+        )
+    if "enum" in rules:
+        allowed = ", ".join(map(str, rules["enum"]))
+        checks.append(
+            compile_enum(
+                rules["enum"],
+                lambda v: f"Integer '{v}' is not one of the allowed values in the enumeration: {allowed}",
+            )
+        )
+    return checks
+
+
+def compile_array(rules: dict) -> Optional[list[Check]]:
+    if rules.get("uniqueItems", False):
+        return None
+    checks = []
+    if "minItems" in rules:
+        min_items = rules["minItems"]
+        checks.append(
+            (
+                lambda a: pc.less(pc.list_value_length(a), min_items),
+                lambda v: f"Array has fewer items than the minimum of {min_items}.",
+            )
+        )
+    if "maxItems" in rules:
+        max_items = rules["maxItems"]
+        checks.append(
+            (
+                lambda a: pc.greater(pc.list_value_length(a), max_items),
+                lambda v: f"Array has more items than the maximum of {max_items}.",
+            )
+        )
+    return checks
+
+
+def compile_geometry(rules: dict) -> list[Check]:
+    # The checks get the shapely geometries, see get_values
+    checks = []
+    geom_types = rules.get("geometryTypes", [])
+    if len(geom_types) > 0:
+        allowed = ", ".join(geom_types)
+        # -2 is not a geometry type, not even for missing geometries
+        type_ids = [GEOMETRY_TYPES.get(t.lower(), -2) for t in geom_types]
+        checks.append(
+            (
+                lambda g: ~np.isin(shapely.get_type_id(g), type_ids),
+                lambda v: f"Geometry type '{v.geom_type}' is not one of the allowed types: {allowed}",
+            )
+        )
+    checks.append(
+        (
+            lambda g: ~shapely.is_valid(g),
+            lambda v: f"Geometry {v} is not valid: {shapely.is_valid_reason(v)}",
+        )
+    )
+    return checks
+
+
+def compile_bbox(rules: dict) -> list[Check]:
+    return [
+        (
+            lambda a: pc.greater(pc.struct_field(a, "xmin"), pc.struct_field(a, "xmax")),
+            lambda v: f"Bounding box has xmin value greater than xmax value: {v['xmin']} > {v['xmax']}",
+        ),
+        (
+            lambda a: pc.greater(pc.struct_field(a, "ymin"), pc.struct_field(a, "ymax")),
+            lambda v: f"Bounding box has ymin value greater than ymax value: {v['ymin']} > {v['ymax']}",
+        ),
+    ]
+
+
+def get_values(column, rules: dict):
+    """Converts a column to the values that the checks work on"""
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    if pat.is_dictionary(column.type):
+        column = column.dictionary_decode()
+    if rules.get("type") == "geometry":
+        return shapely.from_wkb(column.to_numpy(zero_copy_only=False))
+    return column
+
+
+def get_mask(values, check: Check) -> np.ndarray:
+    invalid, _ = check
+    if isinstance(values, np.ndarray):
+        # Geometries, empty values are skipped
+        return np.asarray(invalid(values)) & ~shapely.is_missing(values)
+    # Nulls are skipped
+    mask = pc.and_(pc.fill_null(invalid(values), False), pc.is_valid(values))
+    return mask.to_numpy(zero_copy_only=False)
+
+
+def get_value(values, index: int):
+    if isinstance(values, np.ndarray):
+        return values[index]
+    return values[index].as_py()
+
+
+def format_rows(rows: np.ndarray) -> str:
+    """Lists the first MAX_ROWS row indices, e.g. `row 5` or `3 rows: 5, 7, 10`"""
+    if len(rows) == 1:
+        return f"row {rows[0]}"
+    listed = ", ".join(str(r) for r in rows[:MAX_ROWS])
+    if len(rows) > MAX_ROWS:
+        listed += ", ..."
+    return f"{len(rows)} rows: {listed}"
+
+
+def check_column(
+    column, rules: dict, rows: Optional[np.ndarray] = None
+) -> Optional[list[tuple[str, np.ndarray]]]:
+    """
+    Validates all values of an Arrow column against a property schema at once.
+
+    Returns the issues with the indices of the offending rows (`rows` maps the positions
+    in the column to row indices) or None if the schema can't be checked column-wise.
+    The issue describes the first offending value.
+    Empty values are not checked, see check_required.
+    """
+    checks = compile_checks(rules)
+    if checks is None:
+        return None
+    if rows is None:
+        rows = np.arange(len(column))
+
+    values = get_values(column, rules)
+    issues = []
+    for check in checks:
+        mask = get_mask(values, check)
+        if not mask.any():
+            continue
+        invalid = np.flatnonzero(mask)
+        _, message = check
+        issues.append((message(get_value(values, invalid[0])), rows[invalid]))
+    return issues
+
+
+def check_required(column, rows: Optional[np.ndarray] = None) -> list[tuple[str, np.ndarray]]:
+    """Checks that a column of a required property has no empty values"""
+    if column.null_count == 0:
+        return []
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    if rows is None:
+        rows = np.arange(len(column))
+    mask = pc.is_null(column).to_numpy(zero_copy_only=False)
+    return [("Required value is missing", rows[mask])]
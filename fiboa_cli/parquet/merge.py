@@ -0,0 +1,241 @@
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import shapely
+from pyproj import CRS, Transformer
+from vecorel_cli.const import GEOPARQUET_DEFAULT_VERSION, GEOPARQUET_VERSIONS
+from vecorel_cli.encoding.geojson import VecorelJSONEncoder
+from vecorel_cli.encoding.geoparquet import GeoParquet
+from vecorel_cli.parquet.types import get_pyarrow_field
+from vecorel_cli.vecorel.collection import Collection
+from vecorel_cli.vecorel.ops import merge_collections
+
+GEOMETRY = "geometry"
+BBOX_FIELD = pa.field(
+    "bbox", pa.struct([pa.field(k, pa.float64()) for k in ("xmin", "ymin", "xmax", "ymax")])
+)
+
+
+class MergeSource:
+    """A GeoParquet file to merge, only the footer is read up front"""
+
+    def __init__(self, file):
+        self.file = Path(file)
+        self.pf = pq.ParquetFile(file)
+        metadata = self.pf.schema_arrow.metadata or {}
+        if b"geo" not in metadata:
+            raise ValueError(f"{file} is not a GeoParquet file")
+        self.geo = json.loads(metadata[b"geo"])
+        self.geometry = self.geo["primary_column"]
+        self.collection = Collection(json.loads(metadata.get(b"collection", b"{}")))
+        column = self.geo["columns"][self.geometry]
+        # A missing CRS means OGC:CRS84 in GeoParquet
+        crs = column.get("crs", "OGC:CRS84")
+        if isinstance(crs, dict):
+            self.crs = CRS.from_json_dict(crs)
+        else:
+            self.crs = CRS.from_user_input(crs) if crs else None
+        self.geometry_types = column.get("geometry_types", [])
+
+    @property
+    def columns(self) -> dict[str, pa.Field]:
+        """Columns of the file, with the primary geometry column renamed to `geometry`"""
+        fields = {}
+        for field in self.pf.schema_arrow:
+            if field.name == "bbox":
+                continue
+            if field.name == self.geometry:
+                field = field.with_name(GEOMETRY)
+            fields[field.name] = field
+        return fields
+
+    def constants(self, properties: list[str]) -> dict:
+        """Properties that have been moved to the collection, as they are the same for all rows"""
+        columns = self.columns
+        return {k: v for k, v in self.collection.items() if k in properties and k not in columns}
+
+
+def get_merge_schema(
+    sources: list[MergeSource], properties: list[str], collection: Collection
+) -> pa.Schema:
+    """
+    Unified schema of all files, based on the footers.
+
+    The types from the schemas of the collections take precedence, otherwise the types of the
+    files are promoted to a common type (e.g. int32 and int64 to int64). Columns that are
+    only in the collection of a file (constants) get the type of their values.
+    """
+    schemas = collection.merge_schemas()
+    props = schemas.get("properties", {})
+    required_props = schemas.get("required", [])
+    has_multiple_collections = len(collection.get_schemas()) > 1
+
+    found = {}
+    for source in sources:
+        for name, field in source.columns.items():
+            if name in properties:
+                found.setdefault(name, []).append(field)
+        for name, value in source.constants(properties).items():
+            found.setdefault(name, []).append(pa.field(name, pa.array([value]).type))
+
+    fields = []
+    for name in properties:
+        if name not in found:
+            continue
+        required = name in required_props and not has_multiple_collections
+        field = None
+        if name != GEOMETRY and props.get(name, {}).get("type") is not None:
+            try:
+                field = get_pyarrow_field(name, schema=props[name], required=required)
+            except Exception:
+                field = None
+        if field is None:
+            try:
+                field = pa.unify_schemas(
+                    [pa.schema([f]) for f in found[name]], promote_options="permissive"
+                ).field(name)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise ValueError(f"{name}: Incompatible types in the files: {e}") from e
+            # Not all files may have the column
+            nullable = not required or len(found[name]) < len(sources)
+            field = field.with_nullable(nullable)
+        fields.append(field)
+    return pa.schema(fields)
+
+
+class StreamMerger:
+    """
+    Merges GeoParquet files row group by row group, the data is never loaded at once.
+
+    The columns are converted to the unified schema on the fly, missing columns are filled
+    with nulls and constants from the collections are added as columns again.
+    Geometries are reprojected to the target CRS and the bbox covering is recomputed.
+    """
+
+    def __init__(
+        self,
+        sources: list,
+        properties: list[str],
+        crs="EPSG:4326",
+        compression: Optional[str] = "zstd",
+        compression_level: Optional[int] = None,
+        geoparquet_version: Optional[str] = None,
+    ):
+        if compression == "zstd" and compression_level is None:
+            compression_level = 15
+        if geoparquet_version not in GEOPARQUET_VERSIONS:
+            geoparquet_version = GEOPARQUET_DEFAULT_VERSION
+        self.sources = [MergeSource(s) for s in sources]
+        self.properties = properties
+        self.crs = CRS.from_user_input(crs)
+        self.compression = compression
+        self.compression_level = compression_level
+        self.geoparquet_version = geoparquet_version
+        self.write_covering_bbox = geoparquet_version != "1.0.0"
+        self.collection = merge_collections(
+            [s.collection for s in self.sources], properties=properties
+        )
+        self.schema = get_merge_schema(self.sources, properties, self.collection)
+        if GEOMETRY not in self.schema.names:
+            raise ValueError("No geometry column found")
+        self.bounds = np.array([np.inf, np.inf, -np.inf, -np.inf])
+
+    def convert(self, source: MergeSource, batch: pa.RecordBatch) -> pa.Table:
+        table = pa.Table.from_batches([batch])
+        if source.geometry != GEOMETRY:
+            table = table.rename_columns(
+                [GEOMETRY if c == source.geometry else c for c in table.column_names]
+            )
+
+        geometries = shapely.from_wkb(table.column(GEOMETRY).to_numpy(zero_copy_only=False))
+        if source.crs is not None and not source.crs.equals(self.crs):
+            transformer = Transformer.from_crs(source.crs, self.crs, always_xy=True)
+            geometries = shapely.transform(geometries, transformer.transform, interleaved=False)
+            index = table.column_names.index(GEOMETRY)
+            table = table.set_column(index, GEOMETRY, pa.array(shapely.to_wkb(geometries)))
+        bounds = shapely.bounds(geometries)
+        if not np.isnan(bounds).all():
+            self.bounds[:2] = np.fmin(self.bounds[:2], np.nanmin(bounds[:, :2], axis=0))
+            self.bounds[2:] = np.fmax(self.bounds[2:], np.nanmax(bounds[:, 2:], axis=0))
+
+        constants = source.constants(self.properties)
+        columns = []
+        for field in self.schema:
+            if field.name in table.column_names:
+                column = table.column(field.name)
+            elif field.name in constants:
+                column = pa.array([constants[field.name]] * table.num_rows)
+            else:
+                column = pa.nulls(table.num_rows, field.type)
+            try:
+                columns.append(pc.cast(column, field.type))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                raise ValueError(f"{field.name}: Can't convert values of {source.file}: {e}") from e
+        if self.write_covering_bbox:
+            columns.append(
+                pa.StructArray.from_arrays(
+                    [bounds[:, i] for i in range(4)], fields=list(BBOX_FIELD.type)
+                )
+            )
+        return pa.Table.from_arrays(columns, schema=self.output_schema)
+
+    @property
+    def output_schema(self) -> pa.Schema:
+        if self.write_covering_bbox:
+            return self.schema.append(BBOX_FIELD)
+        return self.schema
+
+    def get_geo_metadata(self) -> dict:
+        types = set()
+        for source in self.sources:
+            if len(source.geometry_types) == 0:
+                # Unknown geometry types in one of the files
+                types = set()
+                break
+            types.update(source.geometry_types)
+        column = {
+            "encoding": "WKB",
+            "geometry_types": sorted(types),
+            "crs": self.crs.to_json_dict(),
+        }
+        if np.isfinite(self.bounds).all():
+            column["bbox"] = [float(v) for v in self.bounds]
+        if self.write_covering_bbox:
+            column["covering"] = {
+                "bbox": {k: ["bbox", k] for k in ("xmin", "ymin", "xmax", "ymax")}
+            }
+        return {
+            "version": self.geoparquet_version,
+            "primary_column": GEOMETRY,
+            "columns": {GEOMETRY: column},
+        }
+
+    def write(self, target) -> int:
+        """Writes the merged file and returns the number of rows"""
+        target = Path(target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        rows = 0
+        with pq.ParquetWriter(
+            str(target),
+            self.output_schema,
+            compression=self.compression,
+            compression_level=self.compression_level,
+            coerce_timestamps="ms",
+            # Otherwise the metadata that is added on close is hidden by the stored schema
+            store_schema=False,
+        ) as writer:
+            for source in self.sources:
+                for batch in source.pf.iter_batches(batch_size=GeoParquet.row_group_size):
+                    table = self.convert(source, batch)
+                    writer.write_table(table, row_group_size=GeoParquet.row_group_size)
+                    rows += table.num_rows
+            collection = json.dumps(self.collection, cls=VecorelJSONEncoder)
+            writer.add_key_value_metadata(
+                {"geo": json.dumps(self.get_geo_metadata()), "collection": collection}
+            )
+        return rows
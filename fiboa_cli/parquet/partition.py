@@ -0,0 +1,196 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+import pandas as pd
+from geopandas import GeoDataFrame
+from vecorel_cli.encoding.geojson import VecorelJSONEncoder
+from vecorel_cli.encoding.geoparquet import GeoParquet
+from vecorel_cli.vecorel.collection import Collection
+
+from ..conversion.batches import read_parquet_batches
+from .writer import GeoParquetStreamWriter
+
+# Readers of hive-partitioned datasets (e.g. pyarrow) ignore files that start with an underscore
+COLLECTION_FILE = "_collection.json"
+# Partition key that is derived from determination:datetime if there's no such column
+YEAR = "year"
+# Seconds after which a lock file is considered to be left over from a crashed process
+LOCK_TIMEOUT = 60
+
+
+def partition_path(keys: list[str], values: tuple) -> Path:
+    """Hive-style folder for the given partition values, e.g. admin:subdivision_code=TH/year=2024"""
+    return Path(*[f"{key}={quote(str(value), safe='')}" for key, value in zip(keys, values)])
+
+
+def get_years(values: pd.Series) -> pd.Series:
+    """Year of timestamps or date(-time) strings, e.g. 2024-01-01T00:00:00Z or 01.01.2024"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.year.astype("Int64")
+    return values.astype("string").str.extract(r"(\d{4})", expand=False).astype("Int64")
+
+
+class FileLock:
+    """
+    Lock across processes (and threads) that is based on the exclusive creation of a file.
+
+    Only meant for short critical sections, e.g. to update a small file.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def __enter__(self):
+        while True:
+            try:
+                os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except FileExistsError:
+                pass
+            try:
+                if time.time() - os.path.getmtime(self.path) > LOCK_TIMEOUT:
+                    os.remove(self.path)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(0.01)
+
+    def __exit__(self, *args):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class PartitionedWriter:
+    """
+    Writes a hive-partitioned GeoParquet dataset, e.g. `admin:subdivision_code=TH/year=2024/part-0.parquet`.
+
+    Every writer writes its own file (`name`) to the partitions, e.g. one file per variant, so
+    that writers can add data to the same partitions (also in parallel processes).
+
+    The partition columns are only encoded in the folder names, readers (e.g. pyarrow.dataset
+    with partitioning="hive") add them back and can skip the folders that don't match a filter.
+    The partition `year` is derived from determination:datetime if there's no such column.
+    Properties that are constant in the collection are written to every file, so that all
+    files have the same schema. The collection is written once to `_collection.json`.
+
+    Only the files of the writer in the partitions that occur in the data are (over)written,
+    all other files are kept, so e.g. a new year can be added without rewriting the whole dataset.
+    """
+
+    def __init__(
+        self,
+        folder,
+        partition_by: list[str],
+        collection: Collection,
+        compression: Optional[str] = "zstd",
+        compression_level: Optional[int] = None,
+        geoparquet_version: Optional[str] = None,
+        name: str = "part-0",
+    ):
+        if len(partition_by) == 0:
+            raise ValueError("No partition columns provided")
+        self.folder = Path(folder)
+        self.partition_by = list(partition_by)
+        self.collection = Collection(collection)
+        self.compression = compression
+        self.compression_level = compression_level
+        self.geoparquet_version = geoparquet_version
+        self.name = name
+        self.constants = {}
+        self.writers = {}
+        self.buffers = {}
+        self.rows = 0
+
+    def hydrate(self):
+        """Moves the properties that are constant for all rows from the collection to the data"""
+        properties = self.collection.merge_schemas().get("properties", {})
+        collection_only = self.collection.get_collection_only_properties()
+        for key in list(self.collection.keys()):
+            if key in properties and key not in collection_only:
+                self.constants[key] = self.collection.pop(key)
+
+    def write_batch(self, data: GeoDataFrame):
+        if self.rows == 0:
+            self.hydrate()
+        for key, value in self.constants.items():
+            if key not in data.columns:
+                data[key] = value
+        if YEAR in self.partition_by and YEAR not in data.columns:
+            if "determination:datetime" not in data.columns:
+                raise ValueError("Partitioning by year requires determination:datetime")
+            data[YEAR] = get_years(data["determination:datetime"])
+        missing = [key for key in self.partition_by if key not in data.columns]
+        if missing:
+            raise ValueError(f"Partition columns not found: {', '.join(missing)}")
+        if data[self.partition_by].isna().any().any():
+            raise ValueError(f"Partition columns must not be empty: {', '.join(self.partition_by)}")
+
+        for values, group in data.groupby(self.partition_by, sort=False):
+            # The bounding boxes are computed again by the writer
+            group = group.drop(columns=[*self.partition_by, "bbox"], errors="ignore")
+            buffer = self.buffers.setdefault(values, [])
+            buffer.append(group)
+            if sum(len(b) for b in buffer) >= GeoParquet.row_group_size:
+                self.flush(values)
+        self.rows += len(data)
+
+    def flush(self, values: tuple):
+        buffer = self.buffers.pop(values, [])
+        if len(buffer) == 0:
+            return
+        writer = self.writers.get(values)
+        if writer is None:
+            # Replaces the file of this writer if it exists already, the files of others are kept
+            file = self.folder / partition_path(self.partition_by, values) / f"{self.name}.parquet"
+            writer = GeoParquetStreamWriter(file)
+            writer.set_collection(self.collection)
+            writer.open(self.compression, self.compression_level, self.geoparquet_version)
+            self.writers[values] = writer
+        writer.write_batch(GeoDataFrame(pd.concat(buffer), crs=buffer[0].crs))
+
+    def close(self) -> list[Path]:
+        """Writes all remaining rows and the collection, returns the partition folders"""
+        for values in list(self.buffers.keys()):
+            self.flush(values)
+        for writer in self.writers.values():
+            writer.close()
+        self.write_collection()
+        return [Path(w.uri).parent for w in self.writers.values()]
+
+    def write_collection(self):
+        file = self.folder / COLLECTION_FILE
+        self.folder.mkdir(parents=True, exist_ok=True)
+        # Variants may be converted into the same folder in parallel, the schemas that the
+        # others have added must not get lost between reading and writing the file
+        with FileLock(file.with_name(f"{file.name}.lock")):
+            collection = dict(self.collection)
+            if file.exists():
+                # Keep the schemas of the partitions that have been written before
+                with open(file, "r", encoding="utf-8") as f:
+                    existing = json.load(f)
+                schemas = existing.get("schemas", {})
+                collection["schemas"] = schemas | collection.get("schemas", {})
+            part = file.with_name(f"{file.name}.{os.getpid()}.part")
+            with open(part, "w", encoding="utf-8") as f:
+                json.dump(collection, f, cls=VecorelJSONEncoder, indent=2)
+            os.replace(part, file)
+
+
+def partition_file(source, folder, partition_by: list[str], **kwargs) -> list[Path]:
+    """
+    Splits a GeoParquet file into a hive-partitioned dataset, row group by row group.
+
+    The order of the rows is kept within every partition. kwargs are passed to the
+    PartitionedWriter, e.g. the compression.
+    """
+    collection = GeoParquet(source).get_collection()
+    writer = PartitionedWriter(folder, partition_by, collection, **kwargs)
+    for data in read_parquet_batches(source, GeoParquet.row_group_size):
+        writer.write_batch(data)
+    return writer.close()
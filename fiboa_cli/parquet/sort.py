@@ -0,0 +1,121 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import shapely
+from geopandas.tools.hilbert_curve import _continuous_to_discrete_coords, _encode
+from vecorel_cli.encoding.geoparquet import GeoParquet
+
+HILBERT_LEVEL = 16
+SORT_KEY = "__hilbert"
+
+
+def get_bounds(pf: pq.ParquetFile, row_group: int, geometry: str, covering: Optional[dict]):
+    """Bounding boxes of the rows of a row group, from the bbox covering column if available"""
+    if covering is not None:
+        columns = [".".join(covering[k]) for k in ("xmin", "ymin", "xmax", "ymax")]
+        table = pf.read_row_group(row_group, columns=columns)
+        bbox = table.column(covering["xmin"][0]).combine_chunks()
+        parts = [pc.struct_field(bbox, covering[k][1]) for k in ("xmin", "ymin", "xmax", "ymax")]
+        return np.column_stack([part.to_numpy(zero_copy_only=False) for part in parts])
+
+    wkb = pf.read_row_group(row_group, columns=[geometry]).column(0)
+    return shapely.bounds(shapely.from_wkb(wkb.to_numpy(zero_copy_only=False)))
+
+
+def hilbert_keys(pf: pq.ParquetFile) -> np.ndarray:
+    """
+    Distances along a Hilbert curve of the bounding box centers of all rows.
+
+    Only the bbox covering column (or the geometries) is read, one row group at a time.
+    Rows without geometry are sorted last.
+    """
+    geo = json.loads(pf.schema_arrow.metadata[b"geo"])
+    geometry = geo["primary_column"]
+    covering = geo["columns"][geometry].get("covering", {}).get("bbox")
+
+    bounds = np.concatenate(
+        [get_bounds(pf, i, geometry, covering) for i in range(pf.num_row_groups)]
+    )
+    missing = np.isnan(bounds).any(axis=1)
+    keys = np.full(len(bounds), np.iinfo(np.uint32).max, dtype=np.uint32)
+    if not missing.all():
+        valid = bounds[~missing]
+        x, y = _continuous_to_discrete_coords(valid, HILBERT_LEVEL, None)
+        keys[~missing] = _encode(HILBERT_LEVEL, x, y)
+    return keys
+
+
+def hilbert_sort_file(
+    source,
+    target=None,
+    row_group_size: Optional[int] = None,
+    bucket_rows: int = 1_000_000,
+    compression: Optional[str] = "zstd",
+    compression_level: Optional[int] = 15,
+) -> Path:
+    """
+    Sorts the rows of a GeoParquet file along a Hilbert curve, so that every row group covers
+    a compact area and spatial filters can skip most row groups (e.g. with the bbox covering).
+
+    Works out of core: the rows are distributed to buckets of at most about `bucket_rows`
+    rows by their Hilbert distance first, then every bucket is sorted on its own.
+    Metadata (geo, collection) is kept. Overwrites the source if no target is given.
+    """
+    source = Path(source)
+    target = Path(target) if target else source
+    row_group_size = row_group_size or GeoParquet.row_group_size
+
+    pf = pq.ParquetFile(source)
+    schema = pf.schema_arrow
+    keys = hilbert_keys(pf)
+    # Bucket boundaries are quantiles of the keys, so that all buckets have about the same size
+    num_buckets = max(1, -(-len(keys) // bucket_rows))
+    bounds = np.quantile(keys, np.linspace(0, 1, num_buckets + 1)[1:-1], method="lower")
+
+    part = target.with_name(target.name + ".part")
+    temp_dir = Path(tempfile.mkdtemp(prefix="fiboa-sort-", dir=target.parent))
+    try:
+        key_schema = schema.append(pa.field(SORT_KEY, pa.uint32()))
+        buckets = [temp_dir / f"{i}.arrow" for i in range(num_buckets)]
+        writers = [ipc.new_file(str(b), key_schema) for b in buckets]
+        offset = 0
+        for i in range(pf.num_row_groups):
+            table = pf.read_row_group(i)
+            table_keys = keys[offset : offset + table.num_rows]
+            offset += table.num_rows
+            table = table.append_column(SORT_KEY, pa.array(table_keys))
+            bucket_ids = np.searchsorted(bounds, table_keys, side="right")
+            for b in np.unique(bucket_ids):
+                writers[b].write_table(table.filter(pa.array(bucket_ids == b)))
+        for writer in writers:
+            writer.close()
+        del pf
+
+        with pq.ParquetWriter(
+            str(part),
+            schema,
+            compression=compression,
+            compression_level=compression_level,
+        ) as writer:
+            for bucket in buckets:
+                with pa.memory_map(str(bucket)) as file:
+                    table = ipc.open_file(file).read_all()
+                    table = table.sort_by(SORT_KEY).drop_columns([SORT_KEY])
+                    writer.write_table(table, row_group_size=row_group_size)
+                del table
+                os.remove(bucket)
+        os.replace(part, target)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        if part.exists():
+            os.remove(part)
+    return target
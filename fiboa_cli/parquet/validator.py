@@ -0,0 +1,221 @@
+import os
+from typing import Optional
+
+import numpy as np
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pyarrow.types as pat
+from geopandas.io.arrow import _arrow_to_geopandas
+from vecorel_cli.encoding.geoparquet import GeoParquet
+from vecorel_cli.parquet.types import PA_TYPE_CHECK
+from vecorel_cli.validation.data import validate_column
+from vecorel_cli.validation.geoparquet import GeoParquetValidator
+from vecorel_cli.vecorel.typing import SchemaMapping
+
+from ..parallel import default_workers, ordered_map
+from .checks import check_column, check_required, format_rows
+
+
+class RowGroupValidator(GeoParquetValidator):
+    """
+    Validates all rows of a GeoParquet file, row group by row group in parallel processes.
+
+    The structure (metadata, schemas, column types) is checked once like in the
+    GeoParquetValidator. The property schemas are resolved once and sent to the processes,
+    which validate the rows of a single row group each. The issues of all row groups are
+    reported in the order of the row groups. Validation stops after max_errors errors.
+    """
+
+    def __init__(
+        self, encoding: GeoParquet, workers: Optional[int] = None, max_errors: Optional[int] = None
+    ):
+        super().__init__(encoding)
+        self.workers = workers
+        self.max_errors = max_errors
+
+    def _validate(self, num: Optional[int] = None, schema_map: SchemaMapping = {}):
+        # Remote files are validated at once
+        if (num is not None and num >= 0) or not os.path.exists(self.encoding.uri):
+            return super()._validate(num=num, schema_map=schema_map)
+
+        # Validate GeoParquet metadata
+        if not self.validate_geoparquet_schema(self.encoding):
+            return
+
+        # Check collection metadata that should be in the Parquet header
+        collection = self.encoding.get_collection()
+        if collection.is_empty():
+            return self.error("Collection metadata is missing in Parquet header")
+
+        # Validate schema lists
+        schemas = collection.get_schemas()
+        self.validate_schemas(schemas)
+        has_multiple_collections = len(schemas) > 1
+
+        # Resolve schemas
+        schema = collection.merge_schemas(schema_map=schema_map, validator=self)
+
+        # Check that all required fields are present, constants are stored in the collection
+        properties = self.encoding.get_properties()
+        columns = set(properties) | set(collection.keys())
+        required_props = schema.get("required", [])
+        collection_props = schema.get("collection", {})
+        for key in required_props:
+            if key not in columns and not collection_props.get(key, False):
+                self.error(f"{key}: Required field is missing")
+
+        geo = self.encoding.get_geoparquet_metadata()
+        property_schemas = schema.get("properties", {})
+        parquet_schema = self.encoding.get_parquet_schema().to_arrow_schema()
+        checks = []
+        for key in properties:
+            if key not in property_schemas:
+                self.warning(f"{key}: No schema defined")
+                continue
+            if self.validate_field(
+                key, property_schemas[key], schema, parquet_schema, geo, has_multiple_collections
+            ):
+                checks.append(key)
+
+        # Property schemas per collection, the rows are validated against the schema of their collection
+        if has_multiple_collections and "collection" in properties:
+            rules = {}
+            required = {}
+            for cid, cschema in schemas.items():
+                rules[cid], required[cid] = self.get_collection_rules(
+                    cschema, collection, schema_map, checks
+                )
+        elif has_multiple_collections:
+            # All rows belong to the same collection if the collection is stored as a constant
+            cid = collection.get("collection")
+            if cid not in schemas:
+                return self.error(
+                    "collection: Required field is missing, the rows can't be assigned to one of the collections"
+                )
+            rules, required = self.get_collection_rules(
+                schemas[cid], collection, schema_map, checks
+            )
+            rules, required = {None: rules}, {None: required}
+        else:
+            rules = {None: {key: property_schemas[key] for key in checks}}
+            required = {None: [key for key in required_props if key in checks]}
+
+        self.validate_row_groups(rules, required, geo)
+
+    def get_collection_rules(self, cschema, collection, schema_map, checks) -> tuple[dict, list]:
+        """Returns the property schemas and the required properties of a single collection"""
+        vecorel_schema = cschema.merge_schemas(
+            schema_map=schema_map,
+            custom_schemas=collection.get_custom_schemas(),
+            validator=self,
+        )
+        props = vecorel_schema.get("properties", {})
+        rules = {key: props.get(key, {}) for key in checks}
+        required = [key for key in vecorel_schema.get("required", []) if key in checks]
+        return rules, required
+
+    def validate_field(
+        self, key, prop_schema, schema, parquet_schema, geo, has_multiple_collections
+    ) -> bool:
+        """Checks the Parquet field of a property, returns whether the data can be validated"""
+        # Make sure the schema has a data type assigned
+        dtype = prop_schema.get("type")
+        if dtype is None:
+            self.warning(f"{key}: No type specified")
+            return False
+
+        pq_field = parquet_schema.field(key)
+        pq_type = pq_field.type
+
+        # Does the field (dis)allow null?
+        nullable = key not in schema.get("required", [])
+        if not has_multiple_collections and nullable != pq_field.nullable:
+            self.error(f"{key}: Nullability differs, is {pq_field.nullable} but must be {nullable}")
+
+        # Is the data type of the field correct?
+        pa_check = PA_TYPE_CHECK.get(dtype)
+        if pa_check is None:
+            self.warning(f"{key}: Validating {dtype} is not supported yet")
+            return False
+        elif not pa_check(pq_type):
+            self.error(f"{key}: Data type invalid, is {pq_type} but must be {dtype}")
+            return False
+
+        # Check specifics of some types
+        if dtype == "date-time":
+            if pq_type.unit != "ms":
+                self.warning(f"{key}: Timestamp unit differs, should be ms")
+            if pq_type.tz != "UTC":
+                self.error(f"{key}: Timestamp timezone invalid, must be UTC")
+        elif dtype == "object":
+            if pat.is_map(pq_type) and not pat.is_string(pq_field.key_type):
+                self.error(f"{key}: Map keys must be strings")
+        elif dtype == "geometry":
+            self.validate_geometry_column(key, prop_schema, geo)
+        return True
+
+    def validate_row_groups(self, rules: dict, required: dict, geo: dict):
+        file = str(self.encoding.uri)
+        metadata = self.encoding.get_parquet_metadata()
+        num_row_groups = metadata.num_row_groups
+        workers = self.workers or default_workers()
+        workers = max(1, min(workers, num_row_groups))
+        # Index of the first row of each row group
+        offsets = np.cumsum([0] + [metadata.row_group(i).num_rows for i in range(num_row_groups)])
+        jobs = ((file, i, offsets[i], rules, required, geo) for i in range(num_row_groups))
+
+        results = ordered_map(_validate_row_group, jobs, workers=workers, processes=True)
+        try:
+            for row_group, issues in enumerate(results):
+                for key, issue, rows in issues:
+                    where = f"row group {row_group}, {rows}" if rows else f"row group {row_group}"
+                    self.error(f"{key}: {issue} ({where})")
+                    if self.max_errors is not None and len(self.errors) >= self.max_errors:
+                        if row_group < num_row_groups - 1:
+                            self.warning(
+                                f"Validation stopped after {len(self.errors)} errors, only {row_group + 1} of {num_row_groups} row groups were checked"
+                            )
+                        return
+        finally:
+            results.close()
+
+
+def _validate_row_group(job) -> list[tuple[str, str, Optional[str]]]:
+    # Runs in a separate process
+    file, row_group, offset, rules, required, geo = job
+    pf = pq.ParquetFile(file)
+    columns = {key for props in rules.values() for key in props}
+    # geopandas needs a geometry column
+    columns.add(geo["primary_column"])
+    if None not in rules:
+        columns.add("collection")
+    table = pf.read_row_group(row_group, columns=[c for c in pf.schema_arrow.names if c in columns])
+    rows = np.arange(offset, offset + table.num_rows)
+    data = None
+
+    issues = []
+    for cid, props in rules.items():
+        if cid is None:
+            cid_table, cid_rows = table, rows
+        else:
+            mask = pc.equal(table.column("collection"), cid)
+            cid_table = table.filter(mask)
+            cid_rows = rows[pc.fill_null(mask, False).to_numpy(zero_copy_only=False)]
+        for key in required[cid]:
+            issues.extend(
+                (key, issue, format_rows(invalid))
+                for issue, invalid in check_required(cid_table.column(key), cid_rows)
+            )
+        for key, prop_schema in props.items():
+            column_issues = check_column(cid_table.column(key), prop_schema, cid_rows)
+            if column_issues is not None:
+                issues.extend(
+                    (key, issue, format_rows(invalid)) for issue, invalid in column_issues
+                )
+                continue
+            # Fall back to the validation value by value
+            if data is None:
+                data = _arrow_to_geopandas(table, geo)
+            values = data if cid is None else data[data["collection"] == cid]
+            issues.extend((key, issue, None) for issue in validate_column(values[key], prop_schema))
+    return issues
@@ -0,0 +1,246 @@
+import json
+from typing import Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from geopandas import GeoDataFrame
+from geopandas.io.arrow import _create_metadata, _encode_metadata
+from vecorel_cli.const import GEOPARQUET_DEFAULT_VERSION, GEOPARQUET_VERSIONS
+from vecorel_cli.encoding.geojson import VecorelJSONEncoder
+from vecorel_cli.encoding.geoparquet import GeoParquet
+from vecorel_cli.parquet.types import (
+    get_geopandas_dtype,
+    get_pyarrow_field,
+    get_pyarrow_type_for_geopandas,
+)
+from vecorel_cli.vecorel.typing import SchemaMapping
+
+
+def get_constant_columns(metadata: pq.FileMetaData, exclude=()) -> list[str]:
+    """
+    Columns that have the same value (or are null) in all rows of a Parquet file.
+
+    Only the row group statistics in the footer are used, so no data needs to be read.
+    Columns without statistics and nested columns are never considered constant.
+    """
+    if metadata.num_rows <= 1:
+        return []
+
+    columns = []
+    for i in range(metadata.num_columns):
+        path = metadata.schema.column(i).path
+        if "." in path or path in exclude:
+            continue
+        values = set()
+        for rg in range(metadata.num_row_groups):
+            stats = metadata.row_group(rg).column(i).statistics
+            if stats is None or not stats.has_null_count:
+                break
+            if stats.num_values == 0:
+                values.add(None)
+            elif stats.null_count == 0 and stats.has_min_max and stats.min == stats.max:
+                values.add(stats.min)
+            else:
+                break
+            if len(values) > 1:
+                break
+        else:
+            if len(values) == 1:
+                columns.append(path)
+    return columns
+
+
+class GeoParquetStreamWriter(GeoParquet):
+    """
+    Writes a GeoParquet file batch by batch, so that the data never needs to be in memory at once.
+
+    The Parquet schema is derived from the collection and the first batch, all following batches
+    are converted to the same schema. Every batch is appended as one or more row groups.
+    The geo and collection metadata are added to the file footer when the file is closed.
+
+    In contrast to GeoParquet.write, only the columns listed in `constants` are moved to the
+    collection, as other constant columns can only be detected once all data has been seen.
+    """
+
+    def __init__(
+        self,
+        file,
+        properties: Optional[list[str]] = None,
+        schema_map: SchemaMapping = {},
+        constants: list[str] = [],
+    ):
+        super().__init__(file)
+        self.properties = properties
+        self.schema_map = schema_map
+        self.constants = constants
+        self.compression = "zstd"
+        self.compression_level = None
+        self.geoparquet_version = GEOPARQUET_DEFAULT_VERSION
+        self.writer = None
+        self.arrow_schema = None
+        self.conversions = {}
+        self.geo = None
+        self.rows = 0
+
+    def open(
+        self,
+        compression: Optional[str] = "zstd",
+        compression_level: Optional[int] = None,
+        geoparquet_version: Optional[str] = None,
+    ):
+        if compression == "zstd" and compression_level is None:
+            compression_level = 15
+        if geoparquet_version not in GEOPARQUET_VERSIONS:
+            geoparquet_version = GEOPARQUET_DEFAULT_VERSION
+        self.compression = compression
+        self.compression_level = compression_level
+        self.geoparquet_version = geoparquet_version
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def write_covering_bbox(self) -> bool:
+        return self.geoparquet_version != "1.0.0"
+
+    def write_batch(self, data: GeoDataFrame):
+        if self.writer is None:
+            self._create_schema(data)
+            self.uri.parent.mkdir(parents=True, exist_ok=True)
+            self.writer = pq.ParquetWriter(
+                str(self.uri),
+                self.arrow_schema,
+                compression=self.compression,
+                compression_level=self.compression_level,
+                coerce_timestamps="ms",
+                # Otherwise the metadata that is added on close is hidden by the stored schema
+                store_schema=False,
+            )
+        if len(data) == 0 and self.rows > 0:
+            return
+
+        table = self._to_arrow(data)
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows += len(data)
+
+    def close(self):
+        if self.writer is None:
+            return
+        collection = json.dumps(self.get_collection(), cls=VecorelJSONEncoder)
+        self.writer.add_key_value_metadata(
+            {"geo": _encode_metadata(self.geo), "collection": collection}
+        )
+        self.writer.close()
+        self.writer = None
+
+    def _create_schema(self, data: GeoDataFrame):
+        properties = [c for c in self.properties or data.columns if c in data.columns]
+        if "bbox" in properties:
+            properties.remove("bbox")
+
+        collection = self.get_collection()
+        if len(data) > 0:
+            context = collection.get_collection_context(schema_map=self.schema_map)
+            for key in self.constants:
+                if key in properties and context.get(key) is None:
+                    collection[key] = data[key].iloc[0]
+                    if key != "collection":
+                        properties.remove(key)
+
+        has_multiple_collections = len(collection.get_schemas()) > 1
+        schemas = collection.merge_schemas(self.schema_map)
+        props = schemas.get("properties", {})
+        required_props = schemas.get("required", [])
+
+        fields = []
+        for column in properties:
+            required = column in required_props and not has_multiple_collections
+            schema = props.get(column, {})
+            dtype = schema.get("type")
+            try:
+                if dtype is not None:
+                    gp_type = get_geopandas_dtype(dtype, required, schema)
+                    if gp_type is None:
+                        self.warning(f"{column}: No type conversion available for {dtype}")
+                    else:
+                        self.conversions[column] = gp_type
+                    field = get_pyarrow_field(column, schema=schema, required=required)
+                else:
+                    pd_type = str(data[column].dtype)
+                    pa_type = get_pyarrow_type_for_geopandas(pd_type)
+                    if pa_type is None:
+                        self.warning(f"{column}: Skipped - pandas type can't be converted")
+                        continue
+                    self.warning(
+                        f"{column}: No schema defined, converting {pd_type} to nullable {pa_type}"
+                    )
+                    field = get_pyarrow_field(column, pa_type=pa_type)
+            except Exception as e:
+                self.warning(f"{column}: Skipped - {e}")
+                continue
+            if field is None:
+                self.warning(f"{column}: Skipped - invalid data type")
+                continue
+            fields.append(field)
+
+        if self.write_covering_bbox:
+            coords = [pa.field(k, pa.float64()) for k in ("xmin", "ymin", "xmax", "ymax")]
+            fields.append(pa.field("bbox", pa.struct(coords)))
+        self.arrow_schema = pa.schema(fields)
+
+    def _to_arrow(self, data: GeoDataFrame) -> pa.Table:
+        if data.geometry.array.has_z.any():
+            raise ValueError("Cannot write 3D geometries")
+
+        data = data.copy()
+        for column, gp_type in self.conversions.items():
+            try:
+                if callable(gp_type):
+                    data[column] = gp_type(data[column])
+                else:
+                    data[column] = data[column].astype(gp_type)
+            except Exception as e:
+                self.warning(f"{column}: Can't convert: {e}")
+
+        self._update_geo_metadata(data)
+
+        schema = self.arrow_schema
+        if self.write_covering_bbox:
+            schema = schema.remove(schema.get_field_index("bbox"))
+        bounds = data.bounds
+        table = pa.Table.from_pandas(data.to_wkb(), schema=schema, preserve_index=False)
+        if self.write_covering_bbox:
+            bbox = pa.StructArray.from_arrays(
+                [bounds[k].to_numpy() for k in ("minx", "miny", "maxx", "maxy")],
+                names=["xmin", "ymin", "xmax", "ymax"],
+            )
+            table = table.append_column(self.arrow_schema.field("bbox"), bbox)
+        return table.replace_schema_metadata(None)
+
+    def _update_geo_metadata(self, data: GeoDataFrame):
+        geometry_encoding = {col: "WKB" for col in data.columns[data.dtypes == "geometry"]}
+        geo = _create_metadata(
+            data,
+            schema_version=self.geoparquet_version,
+            geometry_encoding=geometry_encoding,
+            write_covering_bbox=self.write_covering_bbox,
+        )
+        if self.geo is None:
+            self.geo = geo
+            return
+
+        # Merge the bounding boxes and geometry types of all batches
+        for name, column in geo["columns"].items():
+            merged = self.geo["columns"][name]
+            types = set(merged["geometry_types"]) | set(column["geometry_types"])
+            merged["geometry_types"] = sorted(types)
+            if "bbox" in column:
+                if "bbox" in merged:
+                    bbox = np.array([merged["bbox"], column["bbox"]])
+                    column["bbox"] = [*bbox[:, :2].min(axis=0), *bbox[:, 2:].max(axis=0)]
+                merged["bbox"] = [float(v) for v in column["bbox"]]
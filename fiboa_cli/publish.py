@@ -48,8 +48,11 @@ class Publish(BaseCommand):
 
     @staticmethod
     def get_cli_args():
+        convert_args = ConvertData.get_cli_args()
+        # Datasets are published as single files
+        convert_args.pop("partition_by")
         return {
-            **ConvertData.get_cli_args(),
+            **convert_args,
             "target": VECOREL_TARGET(folder=True),
             "generate_meta": click.option(
                 "--generate-meta",
@@ -301,6 +304,29 @@ It has been converted to a fiboa GeoParquet file from data obtained from {data["
         """
         Path(target).mkdir(parents=True, exist_ok=True)
 
+        convert = ConvertData(self.dataset)
+        variants = convert.get_variants(kwargs["variant"])
+        if variants is not None:
+            # Convert all variants in parallel first, then publish them one after another
+            targets = {v: Path(target) / f"{self.dataset}-{v}.parquet" for v in variants}
+            missing = {v: t for v, t in targets.items() if not t.exists()}
+            if missing:
+                convert_kwargs = {
+                    k: v for k, v in kwargs.items() if k not in ("variant", "input_files")
+                }
+                convert.convert_variants(missing, **convert_kwargs)
+            for variant in variants:
+                self.publish(
+                    target,
+                    generate_meta=generate_meta,
+                    yes=yes,
+                    data_survey_url=data_survey_url,
+                    editor=editor,
+                    converted_by=converted_by,
+                    **{**kwargs, "variant": variant},
+                )
+            return
+
         file_name = self.dataset
         if not kwargs["variant"] and self.converter.variants:
             kwargs["variant"] = next(iter(self.converter.variants))
@@ -324,7 +350,11 @@ It has been converted to a fiboa GeoParquet file from data obtained from {data["
 
         ## Validate parquet file, we only want to publish valid files
         self.info(f"Validating {parquet_file}")
-        ValidateData().validate(parquet_file, num=-1)
+        result = ValidateData().validate(parquet_file, num=-1, max_errors=100)
+        if not result.is_valid():
+            for error in result.errors:
+                self.error(error, indent=" - ")
+            raise ValueError(f"{parquet_file} is not valid, can't publish it")
         self.log("\n  => VALID\n", "success")
 
         ## Create STAC collection.json
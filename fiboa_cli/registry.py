@@ -32,7 +32,7 @@ class FiboaRegistry(VecorelRegistry):
         from .create_jsonschema import CreateJsonSchema
         from .create_stac import CreateStacCollection
         from .describe import DescribeFile
-        from .improve import ImproveData
+        from .improve import ImproveData, ImproveFiles
         from .merge import MergeDatasets
         from .publish import Publish
         from .rename_extension import RenameExtension
@@ -48,6 +48,7 @@ class FiboaRegistry(VecorelRegistry):
             CreateStacCollection,
             DescribeFile,
             ImproveData,
+            ImproveFiles,
             MergeDatasets,
             Publish,
             RenameExtension,
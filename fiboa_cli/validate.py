@@ -1,5 +1,73 @@
+from pathlib import Path
+from typing import Optional, Union
+
+import click
+from vecorel_cli.basecommand import runnable
+from vecorel_cli.encoding.auto import create_encoding
+from vecorel_cli.encoding.geoparquet import GeoParquet
+from vecorel_cli.registry import Registry
 from vecorel_cli.validate import ValidateData as Base
+from vecorel_cli.validation.base import Validator
+from vecorel_cli.vecorel.typing import SchemaMapping
+
+from .cli.options import WORKERS
+from .parquet.validator import RowGroupValidator
 
 
 class ValidateData(Base):
-    pass
+    workers: Optional[int] = None
+    max_errors: Optional[int] = None
+
+    @staticmethod
+    def get_cli_args():
+        return {
+            **Base.get_cli_args(),
+            "workers": WORKERS,
+            "max_errors": click.option(
+                "--max-errors",
+                type=click.IntRange(min=1),
+                help="Stops validating the data of a file after the given number of errors.",
+                default=None,
+            ),
+        }
+
+    @runnable
+    def validate_cli(
+        self,
+        source: list[Union[str, Path]],
+        num: Optional[int] = 100,
+        schema_map: SchemaMapping = {},
+        workers: Optional[int] = None,
+        max_errors: Optional[int] = None,
+    ):
+        self.workers = workers
+        self.max_errors = max_errors
+        return super().validate_cli(source, num=num, schema_map=schema_map)
+
+    def validate(
+        self,
+        file: Union[str, Path],
+        num: Optional[int] = None,
+        schema_map: SchemaMapping = {},
+        workers: Optional[int] = None,
+        max_errors: Optional[int] = None,
+    ) -> Validator:
+        """
+        Validates a file, all rows if num is None or negative.
+
+        All rows of GeoParquet files are validated row group by row group in parallel processes.
+        """
+        if num is not None and num < 0:
+            num = None
+        encoding = create_encoding(file)
+        if num is not None or not isinstance(encoding, GeoParquet):
+            return super().validate(file, num=num, schema_map=schema_map)
+
+        validator = RowGroupValidator(
+            encoding,
+            workers=workers or self.workers,
+            max_errors=max_errors or self.max_errors,
+        )
+        validator.set_required_schemas(Registry.required_extensions)
+        validator.validate(num=num, schema_map=schema_map)
+        return validator
@@ -1,9 +1,23 @@
 import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from urllib.parse import parse_qs, urlparse
 
 import vecorel_cli.vecorel.util as util
 from pytest import fixture
 
+from fiboa_cli.datasets.commons import cache
+
+
+@fixture(autouse=True)
+def fiboa_cache_dir(tmp_path_factory, monkeypatch):
+    # Persistent caches (e.g. of mapping files) must not be written to the user's cache folder
+    folder = tmp_path_factory.mktemp("fiboa-cache")
+    monkeypatch.setenv("FIBOA_CACHE_DIR", str(folder))
+    monkeypatch.setattr(cache, "_memory_cache", {})
+    return folder
+
 
 @fixture
 def tmp_parquet_file():
@@ -49,3 +63,46 @@ def block_stream_file():
 
     yield
     util.stream_file, util.load_file = stream_file, load_file
+
+
+@fixture
+def http_server():
+    """
+    Local HTTP server to test code that downloads data.
+
+    Register responses in `server.routes`, mapping a path to either bytes or a callable
+    that receives the parsed query parameters and returns bytes (or an HTTP error code).
+    All requested urls are recorded in `server.requests`.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            server.requests.append(self.path)
+            response = server.routes.get(url.path)
+            if response is None:
+                self.send_error(404)
+                return
+            if callable(response):
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                response = response(query)
+            if isinstance(response, int):
+                self.send_error(response)
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.routes = {}
+    server.requests = []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
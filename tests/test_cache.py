@@ -0,0 +1,73 @@
+import pytest
+
+from fiboa_cli.datasets.commons import cache
+
+URL = "https://example.com/mapping.csv"
+
+
+@pytest.fixture
+def remote(monkeypatch, tmp_path):
+    monkeypatch.setenv("FIBOA_CACHE_DIR", str(tmp_path))
+    monkeypatch.delenv("FIBOA_OFFLINE", raising=False)
+    monkeypatch.delenv("FIBOA_CACHE_TTL", raising=False)
+    monkeypatch.setattr(cache, "_memory_cache", {})
+    requests = []
+
+    def load_file(url):
+        requests.append(url)
+        return b"original_code,HCAT3_code\n1,3301010100\n2,3301010600\n"
+
+    monkeypatch.setattr(cache, "load_file", load_file)
+    return requests
+
+
+def test_load_cached_csv(remote, monkeypatch):
+    rows = cache.load_cached_csv(URL)
+    assert rows == [
+        {"original_code": "1", "HCAT3_code": "3301010100"},
+        {"original_code": "2", "HCAT3_code": "3301010600"},
+    ]
+    assert cache.load_cached_csv(URL) == rows
+
+    # Changes of a caller don't reach the cache or other callers
+    rows[0]["HCAT3_code"] = "changed"
+    rows.append({})
+    assert cache.load_cached_csv(URL)[0]["HCAT3_code"] == "3301010100"
+    assert len(cache.load_cached_csv(URL)) == 2
+    rows = cache.load_cached_csv(URL)
+
+    # A new run reads from disk
+    monkeypatch.setattr(cache, "_memory_cache", {})
+    assert cache.load_cached_csv(URL) == rows
+    assert remote == [URL]
+
+    # Expired
+    monkeypatch.setattr(cache, "_memory_cache", {})
+    monkeypatch.setenv("FIBOA_CACHE_TTL", "0")
+    assert cache.load_cached_csv(URL) == rows
+    assert remote == [URL, URL]
+
+    # Offline mode ignores the TTL
+    monkeypatch.setattr(cache, "_memory_cache", {})
+    monkeypatch.setenv("FIBOA_OFFLINE", "1")
+    assert cache.load_cached_csv(URL) == rows
+    assert remote == [URL, URL]
+
+
+def test_load_cached_csv_offline(remote, monkeypatch):
+    monkeypatch.setenv("FIBOA_OFFLINE", "1")
+    with pytest.raises(Exception, match="offline"):
+        cache.load_cached_csv(URL)
+    assert remote == []
+
+
+def test_load_cached_csv_stale(remote, monkeypatch):
+    rows = cache.load_cached_csv(URL)
+    monkeypatch.setattr(cache, "_memory_cache", {})
+    monkeypatch.setenv("FIBOA_CACHE_TTL", "0")
+
+    def fail(url):
+        raise OSError("No network")
+
+    monkeypatch.setattr(cache, "load_file", fail)
+    assert cache.load_cached_csv(URL) == rows
@@ -1,11 +1,14 @@
 import re
 import sys
 from csv import DictReader
+from pathlib import Path
 from unittest.mock import patch
 
 import pyarrow.parquet as pq
+from geopandas import GeoDataFrame, read_parquet
+from geopandas.testing import assert_geodataframe_equal
 from loguru import logger
-from pytest import mark
+from pytest import mark, raises
 
 from fiboa_cli.convert import ConvertData
 from fiboa_cli.validate import ValidateData
@@ -106,3 +109,155 @@ def test_converter(load_ec_mock, capsys, tmp_parquet_file, converter):
     if "metrics:area" in df.columns and converter not in ("de_bb",):
         # Check for accidental hectare conversion; fields should be more than 10 square meters
         assert (df["metrics:area"] > 10).all()
+
+
+@mark.parametrize(
+    "converter,batch_size",
+    # The last batch of dk has a single row, i.e. a single crop for the HCAT mapping
+    [("ai4sf", None), ("de_sh", None), ("ec_lv", None), ("de_sh", 30), ("dk", 33)],
+)
+@patch("fiboa_cli.datasets.commons.ec.load_ec_mapping")
+def test_converter_stream(load_ec_mock, tmp_path, converter, batch_size):
+    from fiboa_cli import Registry  # noqa
+
+    load_ec_mock.side_effect = lambda csv_file=None, url=None: list(
+        DictReader(open(f"{test_path}/{converter}/{csv_file}", "r", encoding="utf-8"))
+    )
+    path = f"{test_path}/{converter}"
+    kwargs = extra_convert_parameters.get(converter, {})
+
+    ConvertData(converter).convert(target=tmp_path / "full.parquet", cache=path, **kwargs)
+    ConvertData(converter).convert(
+        target=tmp_path / "stream.parquet", cache=path, stream=True, batch_size=batch_size, **kwargs
+    )
+    ValidateData().validate(tmp_path / "stream.parquet")
+
+    # Constant columns are only moved to the collection in the full conversion
+    full = pq.read_table(tmp_path / "full.parquet")
+    stream = pq.read_table(tmp_path / "stream.parquet").select(full.column_names)
+    assert stream.num_rows > 0
+    assert stream.schema.remove_metadata() == full.schema.remove_metadata()
+    assert stream.sort_by("geometry").equals(full.sort_by("geometry"))
+
+
+def test_converter_variants(tmp_path):
+    from fiboa_cli import Registry  # noqa
+
+    # Pretend that both years are cached already
+    cache = tmp_path / "cache"
+    cache.mkdir()
+    source = Path(f"{test_path}/jp/jp_field_polygons_2024.parquet").read_bytes()
+    for year in ("2023", "2024"):
+        (cache / f"jp_field_polygons_{year}.parquet").write_bytes(source)
+
+    converter = ConvertData("jp")
+    assert converter.get_variants("2024") is None
+    assert converter.get_variants("all") == list(converter.converter.variants.keys())
+    with raises(ValueError):
+        converter.get_variants("2024,1999")
+
+    converter.convert(target=tmp_path / "jp.parquet", cache=cache, variant="2023, 2024", workers=2)
+    for year in ("2023", "2024"):
+        target = tmp_path / f"jp-{year}.parquet"
+        ValidateData().validate(target)
+        assert pq.read_metadata(target).num_rows > 0
+
+
+def test_converter_parallel_read():
+    from fiboa_cli import Registry  # noqa
+
+    converter = ConvertData("ai4sf").converter
+    assert converter.parallel_read
+    paths = [(path, path) for path in extra_convert_parameters["ai4sf"]["input_files"]]
+
+    converter.workers = 1
+    sequential = converter.read_data(paths)
+    converter.workers = 2
+    parallel = converter.read_data(paths)
+    assert len(parallel) > 0
+    assert_geodataframe_equal(parallel, sequential)
+
+
+@mark.parametrize("index", [None, [10, 11, 12, 13], [2, 0, 3, 1]])
+def test_column_extractors(index):
+    from fiboa_cli import Registry  # noqa
+
+    converter = ConvertData("de_sl").converter
+    gdf = GeoDataFrame(
+        {
+            "description": [
+                "FLIK: DESLLI0123456789, Size in ha: 1.25",
+                "flik: deslli0123456780; size in ha: 3",
+                "unknown",
+                None,
+            ]
+        },
+        geometry=[None] * 4,
+        index=index,
+    )
+    gdf = converter.extract_columns(gdf)
+    if index is not None:
+        # e.g. after dropping duplicates, the values must stay on their rows
+        assert gdf.index.tolist() == index
+    assert gdf["flik"].tolist()[:2] == ["DESLLI0123456789", "deslli0123456780"]
+    assert gdf["flik"].isna().tolist() == [False, False, True, True]
+    assert gdf["area"].tolist()[:2] == [1.25, 3.0]
+    assert gdf["area"].isna().tolist() == [False, False, True, True]
+
+
+def test_converter_stream_sort(tmp_path):
+    path = f"{test_path}/de_sh"
+    ConvertData("de_sh").convert(target=tmp_path / "full.parquet", cache=path)
+    ConvertData("de_sh").convert(
+        target=tmp_path / "stream.parquet", cache=path, batch_size=30, sort=True
+    )
+    ValidateData().validate(tmp_path / "stream.parquet")
+
+    full = read_parquet(tmp_path / "full.parquet")
+    stream = read_parquet(tmp_path / "stream.parquet")
+    assert stream.geometry.geom_equals(full.geometry).all()
+
+
+def test_converter_stream_requires_all_data(tmp_path):
+    from fiboa_cli import Registry  # noqa
+
+    # Dissolving needs all data at once
+    with raises(ValueError, match="can't be streamed"):
+        ConvertData("us_usda_cropland").convert(
+            target=tmp_path / "stream.parquet", variant="2024", batch_size=10
+        )
+
+
+@mark.parametrize("stream", [False, True])
+def test_converter_perimeter_calculate_missing(tmp_path, monkeypatch, stream):
+    from fiboa_cli import Registry  # noqa
+
+    converter = ConvertData("ai4sf")
+    # ai4sf has no perimeter column
+    monkeypatch.setattr(converter.converter, "perimeter_calculate_missing", True)
+    target = tmp_path / "ai4sf.parquet"
+    converter.convert(target=target, stream=stream, **extra_convert_parameters["ai4sf"])
+
+    gdf = read_parquet(target)
+    assert "metrics:perimeter" in gdf.columns
+    assert (gdf["metrics:perimeter"] > 0).all()
+
+
+def test_download_variants(tmp_path, monkeypatch):
+    from fiboa_cli import Registry  # noqa
+
+    convert = ConvertData("jp")
+    calls = []
+
+    def download_files(converter, uris, cache_folder=None, **kwargs):
+        calls.append((converter, converter.variant, list(uris)))
+
+    monkeypatch.setattr(type(convert.converter), "download_files", download_files)
+    convert.download_variants(["2023", "2024"], tmp_path)
+
+    # Every download has its own converter with the variant of the source
+    assert len({id(converter) for converter, *_ in calls}) == len(calls) == 2
+    assert all(converter is not convert.converter for converter, *_ in calls)
+    for _, variant, uris in calls:
+        assert len(uris) == 1 and variant in uris[0]
+    assert convert.converter.variant is None
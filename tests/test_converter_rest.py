@@ -0,0 +1,249 @@
+import json
+import re
+
+import pytest
+from vecorel_cli.conversion.base import BaseConverter
+
+from fiboa_cli.conversion.converter_rest import EsriRESTConverterMixin
+from fiboa_cli.conversion.esri_json import read_esri_json
+
+IDS = [1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144]
+
+
+class RESTConverter(EsriRESTConverterMixin, BaseConverter):
+    id = "rest_test"
+
+
+def ring(x, y, size=1):
+    # Clockwise, as exterior rings in Esri JSON
+    return [[x, y], [x, y + size], [x + size, y + size], [x + size, y], [x, y]]
+
+
+def feature(oid, fmt):
+    properties = {"OBJECTID": oid, "crop": "wheat" if oid % 2 else "maize"}
+    if fmt == "json":
+        return {"attributes": properties, "geometry": {"rings": [ring(oid, 0)]}}
+    return {
+        "type": "Feature",
+        "properties": properties,
+        "geometry": {"type": "Polygon", "coordinates": [ring(oid, 0)[::-1]]},
+    }
+
+
+def query(params):
+    where = params["where"]
+    ids = IDS
+    if "crop='wheat'" in where:
+        ids = [i for i in ids if i % 2]
+    if params.get("returnIdsOnly") == "true":
+        return json.dumps({"objectIdFieldName": "OBJECTID", "objectIds": ids[::-1]}).encode()
+
+    if m := re.search(r"OBJECTID>=(\d+) AND OBJECTID<=(\d+)", where):
+        ids = [i for i in ids if int(m[1]) <= i <= int(m[2])]
+    elif m := re.search(r"OBJECTID>(-?\d+)", where):
+        ids = [i for i in ids if i > int(m[1])]
+    ids = ids[: int(params["resultRecordCount"])]
+    features = [feature(i, params["f"]) for i in ids]
+    if params["f"] == "json":
+        return json.dumps({"spatialReference": {"wkid": 4326}, "features": features}).encode()
+    return json.dumps({"type": "FeatureCollection", "features": features}).encode()
+
+
+@pytest.fixture
+def rest_service(http_server):
+    http_server.routes["/rest"] = json.dumps(
+        {"layers": [{"id": 0}], "maxRecordCount": 3, "supportedQueryFormats": "JSON, geoJSON"}
+    ).encode()
+    http_server.routes["/rest/0/query"] = query
+    return http_server
+
+
+def read_pages(url, tmp_path, workers, where=None, fmt="json"):
+    converter = RESTConverter()
+    converter.rest_workers = workers
+    if fmt is not None:
+        converter.rest_format = fmt
+    if where:
+        converter.rest_params = {"where": where}
+    converter.cache_folder = str(tmp_path)
+    return [page["OBJECTID"].tolist() for page, *_ in converter.get_data([url])]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_rest_pages(rest_service, tmp_path, workers):
+    pages = read_pages(rest_service.url + "/rest", tmp_path, workers)
+    assert [i for page in pages for i in page] == IDS
+    assert all(len(page) <= 3 for page in pages)
+
+
+def test_rest_concurrent_matches_sequential(rest_service, tmp_path):
+    sequential = read_pages(rest_service.url + "/rest", tmp_path / "seq", 1)
+    concurrent = read_pages(rest_service.url + "/rest", tmp_path / "con", 4)
+    assert concurrent == sequential
+    assert any("returnIdsOnly=true" in r for r in rest_service.requests)
+
+
+def test_rest_geojson(rest_service, tmp_path):
+    pages = read_pages(rest_service.url + "/rest", tmp_path, 4, fmt="geojson")
+    assert [i for page in pages for i in page] == IDS
+    assert all("f=geojson" in r for r in query_requests(rest_service) if "returnIdsOnly" not in r)
+
+
+def test_rest_default_format(rest_service, tmp_path):
+    # Esri JSON must be enabled per converter
+    pages = read_pages(rest_service.url + "/rest", tmp_path, 1, fmt=None)
+    assert [i for page in pages for i in page] == IDS
+    assert all("f=geojson" in r for r in query_requests(rest_service))
+
+
+@pytest.mark.parametrize(
+    "geometry,error",
+    [
+        ({"curveRings": [[[0, 0], {"a": [[1, 1], [0, 0], 0, 1]}]]}, "Curved geometries"),
+        ({"x": 1, "y": 2}, "Only polygons"),
+    ],
+)
+def test_read_esri_json_unsupported(geometry, error):
+    data = {"features": [{"attributes": {"OBJECTID": 1}, "geometry": geometry}]}
+    with pytest.raises(ValueError, match=error):
+        read_esri_json(json.dumps(data).encode())
+
+
+def test_read_esri_json():
+    hole = ring(2, 2, 2)[::-1]
+    data = {
+        "spatialReference": {"wkid": 25830, "latestWkid": 25830},
+        "fields": [{"name": "OBJECTID"}, {"name": "crop"}],
+        "features": [
+            {"attributes": {"OBJECTID": 1, "crop": "a"}, "geometry": {"rings": [ring(0, 0, 10)]}},
+            {"attributes": {"OBJECTID": 2, "crop": None}, "geometry": None},
+            {
+                "attributes": {"OBJECTID": 3, "crop": "b"},
+                "geometry": {"rings": [ring(0, 0, 10), hole]},
+            },
+            {
+                "attributes": {"OBJECTID": 4},
+                "geometry": {"rings": [ring(0, 0, 10), ring(20, 0, 5)]},
+            },
+            # Holes don't follow their exterior ring
+            {
+                "attributes": {"OBJECTID": 5},
+                "geometry": {"rings": [ring(20, 0, 5), ring(0, 0, 10), ring(21, 1)[::-1], hole]},
+            },
+        ],
+    }
+    gdf = read_esri_json(json.dumps(data).encode())
+    assert gdf.crs.to_epsg() == 25830
+    assert gdf.columns.tolist() == ["OBJECTID", "crop", "geometry"]
+    assert gdf.geometry.isna().tolist() == [False, True, False, False, False]
+    assert gdf.geometry.geom_type.dropna().tolist() == [
+        "Polygon",
+        "Polygon",
+        "MultiPolygon",
+        "MultiPolygon",
+    ]
+    assert gdf.geometry.area.fillna(0).tolist() == [100, 0, 96, 125, 120]
+    assert gdf.geometry.dropna().is_valid.all()
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_rest_where(rest_service, tmp_path, workers):
+    pages = read_pages(rest_service.url + "/rest", tmp_path, workers, where="crop='wheat'")
+    assert [i for page in pages for i in page] == [i for i in IDS if i % 2]
+
+
+def query_requests(server):
+    return [r for r in server.requests if r.startswith("/rest/0/query")]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_rest_cache_complete(rest_service, tmp_path, workers):
+    first = read_pages(rest_service.url + "/rest", tmp_path, workers)
+    manifest = json.loads((tmp_path / "rest_test_0.manifest.json").read_text())
+    assert manifest["complete"]
+    assert [page["count"] for page in manifest["pages"]] == [3, 3, 3, 2]
+
+    rest_service.requests.clear()
+    assert read_pages(rest_service.url + "/rest", tmp_path, workers) == first
+    assert rest_service.requests == []
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_rest_cache_resume(rest_service, tmp_path, workers):
+    first = read_pages(rest_service.url + "/rest", tmp_path, workers)
+
+    # Simulate an interrupted run: incomplete manifest and a corrupt page file
+    manifest_file = tmp_path / "rest_test_0.manifest.json"
+    manifest = json.loads(manifest_file.read_text())
+    manifest["complete"] = False
+    manifest_file.write_text(json.dumps(manifest))
+    (tmp_path / manifest["pages"][2]["file"]).write_bytes(b"{}")
+
+    rest_service.requests.clear()
+    assert read_pages(rest_service.url + "/rest", tmp_path, workers) == first
+    requests = query_requests(rest_service)
+    if workers == 1:
+        # Continues after the last valid page
+        assert "OBJECTID%3E-1" not in requests[0]
+        assert "OBJECTID%3E13" in requests[0]
+    else:
+        assert any("returnIdsOnly" in r for r in requests)
+        assert len([r for r in requests if "returnIdsOnly" not in r]) == 1
+    assert json.loads(manifest_file.read_text())["complete"]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_rest_cache_resume_gap(rest_service, tmp_path, workers):
+    url = rest_service.url + "/rest"
+    first = read_pages(url, tmp_path, workers)
+
+    # Simulate an interrupted run that left a gap between the cached pages
+    manifest_file = tmp_path / "rest_test_0.manifest.json"
+    manifest = json.loads(manifest_file.read_text())
+    manifest["complete"] = False
+    del manifest["pages"][2]
+    manifest_file.write_text(json.dumps(manifest))
+
+    rest_service.requests.clear()
+    assert sum(read_pages(url, tmp_path, 1), []) == sum(first, [])
+    requests = query_requests(rest_service)
+    if workers == 1:
+        # Continues after the last page before the gap
+        assert "OBJECTID%3E13" in requests[0]
+    else:
+        # Pages of a concurrent run are not resumed one by one
+        assert "OBJECTID%3E-1" in requests[0]
+    assert json.loads(manifest_file.read_text())["complete"]
+
+
+def service_requests(server):
+    return [r for r in server.requests if r.startswith("/rest?")]
+
+
+def test_rest_service_metadata_once(rest_service, tmp_path):
+    read_pages(rest_service.url + "/rest", tmp_path, 1)
+    assert len(service_requests(rest_service)) == 1
+
+
+def test_rest_service_metadata_error(rest_service, tmp_path):
+    # Errors are not cached, the next run fetches the metadata again
+    metadata = rest_service.routes["/rest"]
+    rest_service.routes["/rest"] = json.dumps({"error": {"code": 500}}).encode()
+    with pytest.raises(Exception, match="REST service returned an error"):
+        read_pages(rest_service.url + "/rest", tmp_path, 1)
+    assert list(tmp_path.glob("*.service.json")) == []
+
+    rest_service.routes["/rest"] = metadata
+    assert [i for page in read_pages(rest_service.url + "/rest", tmp_path, 1) for i in page] == IDS
+
+
+def test_rest_service_metadata_invalid_cache(rest_service, tmp_path):
+    first = read_pages(rest_service.url + "/rest", tmp_path, 1)
+
+    # e.g. cached by an earlier version
+    (cache_file,) = tmp_path.glob("*.service.json")
+    cache_file.write_text(json.dumps({"error": {"code": 500}}))
+    rest_service.requests.clear()
+    assert read_pages(rest_service.url + "/rest", tmp_path, 1) == first
+    assert len(service_requests(rest_service)) == 1
+    assert "layers" in json.loads(cache_file.read_text())
@@ -0,0 +1,18 @@
+from fiboa_cli.datasets.commons.data import data_mapping, read_data_csv
+
+
+def test_data_mapping():
+    rows = read_data_csv("jecam_crop.csv")
+    codes = data_mapping("jecam_crop.csv", "crop_name")
+    assert codes[rows[0]["crop_name"]] == 1
+    assert codes.index.is_unique
+    assert data_mapping("jecam_crop.csv", "crop_name") is codes
+
+    names = data_mapping("country_codes.csv", "name", "alpha-2")
+    assert names["Germany"] == "DE"
+
+
+def test_read_data_csv_copies():
+    rows = read_data_csv("country_codes.csv")
+    rows[0]["name"] = "changed"
+    assert read_data_csv("country_codes.csv")[0]["name"] != "changed"
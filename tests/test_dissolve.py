@@ -0,0 +1,29 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import box
+
+from fiboa_cli.conversion.dissolve import connected_components, dissolve_parts
+
+
+def test_connected_components():
+    # A chain of touching boxes, a separate box and a box touching only at a corner
+    geometries = np.array([box(2, 0, 3, 1), box(0, 0, 1, 1), box(1, 0, 2, 1), box(5, 5, 6, 6)])
+    geometries = np.append(geometries, box(6, 6, 7, 7))
+    labels = connected_components(geometries)
+    assert labels.tolist() == [0, 0, 0, 3, 3]
+
+
+def test_dissolve_parts():
+    path = "tests/data-files/convert/us_usda_cropland/NationalCSB_2017-2024_rev23.zip"
+    gdf = gpd.read_file(f"zip://{path}!NationalCSB_2017-2024_rev23/CSB1724.gdb").explode()
+    expected = gdf.dissolve(by="CDL2024", as_index=False).explode()
+
+    codes, wkb = dissolve_parts(gdf["CDL2024"].to_numpy(), shapely.to_wkb(gdf.geometry.values))
+    assert codes.tolist() == expected["CDL2024"].tolist()
+
+    # The parts are the same, but the rings may start at another vertex
+    def normalized(geometries):
+        return sorted(shapely.to_wkb(shapely.normalize(geometries)))
+
+    assert normalized(shapely.from_wkb(wkb)) == normalized(expected.geometry.values)
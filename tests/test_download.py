@@ -0,0 +1,55 @@
+from fiboa_cli.conversion.download import download_files, get_downloads
+from fiboa_cli.conversion.fiboa_converter import FiboaBaseConverter
+
+
+def test_download_files(http_server, tmp_path):
+    http_server.routes = {f"/{i}.zip": bytes([i]) * 1000 for i in range(5)}
+    downloads = {f"{http_server.url}/{i}.zip": str(tmp_path / f"{i}.zip") for i in range(6)}
+
+    summary = download_files(downloads, workers=3, retries=0)
+    assert summary["files"] == 5
+    assert summary["bytes"] == 5000
+    assert list(summary["failed"].keys()) == [f"{http_server.url}/5.zip"]
+    for i in range(5):
+        assert (tmp_path / f"{i}.zip").read_bytes() == bytes([i]) * 1000
+    # No partial files are left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"{i}.zip" for i in range(5)]
+
+
+def test_download_retries(http_server, tmp_path):
+    attempts = []
+
+    def flaky(query):
+        attempts.append(1)
+        return 503 if len(attempts) < 3 else b"data"
+
+    http_server.routes = {"/flaky.csv": flaky}
+    target = tmp_path / "flaky.csv"
+    summary = download_files({f"{http_server.url}/flaky.csv": str(target)}, retries=3)
+    assert summary["failed"] == {}
+    assert len(attempts) == 3
+    assert target.read_bytes() == b"data"
+
+
+def test_converter_prefetch(http_server, tmp_path):
+    http_server.routes = {"/a.csv": b"a", "/b.csv": b"b"}
+    uris = {
+        f"{http_server.url}/a.csv": "a.csv",
+        f"{http_server.url}/b.csv": "b.csv",
+        f"{http_server.url}/c.zip": ["c.shp"],
+    }
+    # Cached files are not downloaded again
+    (tmp_path / "extracted.c").mkdir()
+    assert list(get_downloads(uris, str(tmp_path)).values()) == [
+        str(tmp_path / "a.csv"),
+        str(tmp_path / "b.csv"),
+    ]
+
+    paths = FiboaBaseConverter().download_files(uris, str(tmp_path))
+    assert [path for path, _ in paths] == [
+        str(tmp_path / "a.csv"),
+        str(tmp_path / "b.csv"),
+        str(tmp_path / "extracted.c" / "c.shp"),
+    ]
+    assert (tmp_path / "b.csv").read_bytes() == b"b"
+    assert sorted(http_server.requests) == ["/a.csv", "/b.csv"]
@@ -0,0 +1,57 @@
+import pandas as pd
+from pytest import raises
+
+from fiboa_cli.datasets.commons.hcat import HCATLookup
+
+MAPPING = [
+    {"original_code": "1", "translated_name": "Wheat", "HCAT3_code": "3301010100"},
+    {"original_code": "2", "translated_name": "Maize", "HCAT3_code": "3301010600"},
+    {"original_code": "3", "translated_name": "", "HCAT3_code": "3301000000"},
+    # Later entries win
+    {"original_code": "2", "translated_name": "Grain maize", "HCAT3_code": "3301010699"},
+]
+
+
+def test_hcat_lookup():
+    lookup = HCATLookup(MAPPING, "original_code", ["translated_name", "HCAT3_code"])
+    codes = pd.Series([1, 2, 3, 4, 2, None], index=[5, 4, 3, 2, 1, 0], dtype="Int64")
+    result = lookup.lookup(codes)
+
+    names = result["translated_name"]
+    assert isinstance(names.dtype, pd.CategoricalDtype)
+    assert names.index.tolist() == codes.index.tolist()
+    assert names.isna().tolist() == [False, False, True, True, False, True]
+    assert names.dropna().tolist() == ["Wheat", "Grain maize", "Grain maize"]
+    assert result["HCAT3_code"].tolist()[:3] == ["3301010100", "3301010699", "3301000000"]
+
+
+def test_hcat_lookup_strings():
+    lookup = HCATLookup(MAPPING, "original_code", ["HCAT3_code"])
+    result = lookup.lookup(pd.Series(["3", "1", "x"]))
+    assert result["HCAT3_code"].isna().tolist() == [False, False, True]
+    assert lookup.lookup(pd.Series([None, None], dtype=object))["HCAT3_code"].isna().all()
+
+
+def test_add_hcat_batches():
+    from fiboa_cli.improve import ImproveData
+
+    converter = ImproveData().create_hcat_converter("tests/data-files/convert/dk/dk_2019.csv")
+    batch = pd.DataFrame({"crop:code": ["1", "2"]})
+    row = pd.DataFrame({"crop:code": ["3"]})
+
+    # All data at once: a single crop is an error
+    converter.add_hcat(batch.copy())
+    with raises(AssertionError, match="No HCAT crops mapped"):
+        converter.add_hcat(row.copy())
+
+    # Batch by batch: batches with a single crop are fine, if all batches have several crops
+    converter.start_hcat_batches()
+    converter.add_hcat(batch.copy())
+    assert converter.add_hcat(row.copy())["hcat:name_en"].tolist() == ["Spring oats"]
+    converter.finish_hcat_batches()
+
+    converter.start_hcat_batches()
+    converter.add_hcat(row.copy())
+    converter.add_hcat(row.copy())
+    with raises(AssertionError, match="No HCAT crops mapped"):
+        converter.finish_hcat_batches()
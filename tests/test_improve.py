@@ -1,9 +1,12 @@
 from pathlib import Path
 
 import geopandas
+import pyarrow.parquet as pq
+from pandas.testing import assert_series_equal
 from pytest import mark
+from vecorel_cli.encoding.geoparquet import GeoParquet
 
-from fiboa_cli.improve import ImproveData
+from fiboa_cli.improve import ImproveData, ImproveFiles
 from fiboa_cli.validate import ValidateData
 
 files = [
@@ -48,3 +51,120 @@ def test_improve_hcat(tmp_parquet_file, base, hcat):
 
     count = sum(mapping[k] == v for k, v in check.items() if k in mapping)
     assert count == 2, f"Missing {len(check) - count} of {len(check)} values in {mapping.keys()}"
+
+
+def test_improve_sizes(tmp_parquet_file):
+    source = Path("tests/data-files/fiboa-example.json")
+    ImproveData().improve_file(
+        source=source, target=tmp_parquet_file, add_sizes=True, geodesic=True
+    )
+    gdf = geopandas.read_parquet(tmp_parquet_file)
+    assert gdf["metrics:area"].notna().all()
+    assert (gdf["metrics:perimeter"] > 0).all()
+
+
+@mark.parametrize("base,hcat", list(zip(files[1:], ["be_vlg/be_vlg_2021.csv", "dk/dk_2019.csv"])))
+# The files have 100 rows, i.e. the last row group has a single row (and crop) with 33 rows
+@mark.parametrize("row_group_size", [30, 33])
+def test_improve_stream(tmp_path, monkeypatch, base, hcat, row_group_size):
+    # Read the files in several batches
+    monkeypatch.setattr(GeoParquet, "row_group_size", row_group_size)
+    source = Path("tests/data-files") / base
+    hcat = "tests/data-files/convert/" + hcat
+    full_file = tmp_path / "full.parquet"
+    stream_file = tmp_path / "stream.parquet"
+
+    ImproveData().improve_file(source=source, target=full_file, add_hcat=hcat)
+    ImproveData().improve_file(source=source, target=stream_file, add_hcat=hcat, stream=True)
+
+    full = geopandas.read_parquet(full_file)
+    stream = geopandas.read_parquet(stream_file)
+    assert stream.columns.tolist() == full.columns.tolist()
+    assert len(stream) == len(full)
+    for column in ["metrics:area", "hcat:code", "crop:name"]:
+        assert_series_equal(stream[column], full[column], check_dtype=False)
+    assert stream.geometry.geom_equals(full.geometry).all()
+
+
+def test_improve_stream_in_place(tmp_path):
+    target = tmp_path / "file.parquet"
+    target.write_bytes(Path("tests/data-files/improve/dk_2024_fiboa_0_2.parquet").read_bytes())
+    ImproveData().improve_file(source=target, stream=True, add_sizes=True)
+    gdf = geopandas.read_parquet(target)
+    assert gdf["metrics:perimeter"].notna().all()
+    assert not (tmp_path / "file.parquet.part").exists()
+
+
+@mark.parametrize("base", files[1:])
+def test_improve_migrate_file(tmp_path, base):
+    source = Path("tests/data-files") / base
+    fast_file = tmp_path / "fast.parquet"
+    full_file = tmp_path / "full.parquet"
+
+    ImproveData().improve_file(source=source, target=fast_file)
+    # Changing the CRS to the same CRS requires to read all data
+    ImproveData().improve_file(source=source, target=full_file, crs="EPSG:4326")
+
+    fast = pq.read_table(fast_file)
+    full = pq.read_table(full_file)
+    assert fast.schema.metadata[b"collection"] == full.schema.metadata[b"collection"]
+    assert fast.column_names == full.column_names
+    for name in fast.column_names:
+        assert fast.schema.field(name).nullable == full.schema.field(name).nullable
+    assert fast.column("metrics:area").equals(full.column("metrics:area"))
+    # The geometries are copied through
+    assert fast.column("geometry").equals(pq.read_table(source).column("geometry"))
+
+
+def test_improve_files(tmp_path):
+    sources = [Path("tests/data-files") / base for base in files[1:]]
+    target = tmp_path / "migrated"
+    broken = tmp_path / "broken.parquet"
+    broken.write_bytes(b"not a parquet file")
+
+    improve = ImproveData()
+    summary = improve.improve_files([*sources, broken], target, workers=2)
+    assert (summary["improved"], summary["skipped"], summary["failed"]) == (2, 0, 1)
+    assert [f["status"] for f in summary["files"]] == ["improved", "improved", "failed"]
+    assert "error" in summary["files"][2]
+
+    # Files that have been migrated already are skipped, unless other improvements are requested
+    migrated = [Path(f["target"]) for f in summary["files"][:2]]
+    assert all(improve.is_migrated(file) for file in migrated)
+    summary = improve.improve_files(migrated, workers=1)
+    assert summary["skipped"] == 2
+    summary = improve.improve_files(migrated, workers=1, add_sizes=True)
+    assert summary["improved"] == 2
+
+
+def test_improve_run(tmp_path):
+    source = Path("tests/data-files") / files[1]
+    target = tmp_path / "file.parquet"
+    ImproveData().run(source=source, target=target)
+    assert ValidateData().validate(target).is_valid()
+
+    folder = tmp_path / "migrated"
+    folder.mkdir()
+    sources = [Path("tests/data-files") / base for base in files[1:]]
+    assert ImproveFiles().improve_cli(sources, target=folder).startswith("Improved 2 and skipped 0")
+    assert len(list(folder.iterdir())) == 2
+
+
+def test_improve_files_same_name(tmp_path):
+    source = Path("tests/data-files") / files[1]
+    archive = tmp_path / "archive"
+    sources = []
+    for folder in ("2023", "2024/de"):
+        (archive / folder).mkdir(parents=True)
+        sources.append(archive / folder / "data.parquet")
+        sources[-1].write_bytes(source.read_bytes())
+
+    target = tmp_path / "migrated"
+    summary = ImproveData().improve_files(sources, target, workers=2)
+    assert summary["improved"] == 2
+    assert [f["target"] for f in summary["files"]] == [
+        str(target / "2023" / "data.parquet"),
+        str(target / "2024" / "de" / "data.parquet"),
+    ]
+    for file in summary["files"]:
+        assert ImproveData().is_migrated(file["target"])
@@ -0,0 +1,71 @@
+import json
+
+import geopandas
+import numpy as np
+import pyarrow.parquet as pq
+from pytest import fixture, mark
+
+from fiboa_cli.convert import ConvertData
+from fiboa_cli.merge import MergeDatasets
+from fiboa_cli.parquet.sort import hilbert_keys
+from fiboa_cli.validate import ValidateData
+
+includes = ["admin:country_code", "crop:name"]
+
+
+@fixture
+def ai4sf_files(tmp_path):
+    files = []
+    for name in ["1_vietnam_areas.gpkg", "4_cambodia_areas.gpkg"]:
+        files.append(tmp_path / f"{name}.parquet")
+        input_files = {f"tests/data-files/convert/ai4sf/{name}": name}
+        ConvertData("ai4sf").convert(target=files[-1], input_files=input_files)
+    return files
+
+
+@mark.parametrize("sort", [False, True])
+def test_merge_stream(tmp_path, ai4sf_files, sort):
+    full_file = tmp_path / "full.parquet"
+    stream_file = tmp_path / "stream.parquet"
+    MergeDatasets().merge(ai4sf_files, full_file, includes=includes)
+    MergeDatasets().merge(ai4sf_files, stream_file, includes=includes, stream=True, sort=sort)
+    ValidateData().validate(stream_file)
+
+    full = geopandas.read_parquet(full_file)
+    stream = geopandas.read_parquet(stream_file)
+    assert stream.crs == full.crs
+    assert len(stream) == len(full)
+    assert set(stream.columns) >= set(full.columns)
+    # The country code is constant per file, but not in the merged file
+    assert set(stream["admin:country_code"]) == {"VN", "KH"}
+    stream = stream.set_index("id").loc[full["id"]].reset_index()
+    assert stream.geometry.geom_equals_exact(full.geometry, 1e-9).all()
+    for column in full.columns.drop("geometry"):
+        assert stream[column].tolist() == full[column].tolist()
+
+    pf = pq.ParquetFile(stream_file)
+    collection = json.loads(pf.schema_arrow.metadata[b"collection"])
+    assert "ai4sf" in collection["schemas"]
+    if sort:
+        assert (np.diff(hilbert_keys(pf).astype(np.int64)) >= 0).all()
+
+
+def test_merge_stream_unify(tmp_path, ai4sf_files):
+    # Different CRS, geometry column name and types, no collection
+    other = tmp_path / "other.parquet"
+    gdf = geopandas.read_parquet(ai4sf_files[1]).to_crs("EPSG:3857")
+    gdf["metrics:area"] = np.arange(1, len(gdf) + 1, dtype="float64")
+    gdf.rename_geometry("geom").to_parquet(other)
+
+    target = tmp_path / "merged.parquet"
+    MergeDatasets().merge([ai4sf_files[0], other], target, stream=True)
+
+    merged = geopandas.read_parquet(target)
+    expected = geopandas.read_parquet(ai4sf_files[1]).to_crs("EPSG:4326")
+    assert merged.crs == "EPSG:4326"
+    assert pq.read_schema(target).field("metrics:area").type == "float"
+    part = merged.iloc[-len(expected) :].reset_index(drop=True)
+    assert part.geometry.geom_equals_exact(expected.geometry, 1e-7).all()
+    assert part["id"].tolist() == expected["id"].tolist()
+    assert part["metrics:area"].tolist() == list(range(1, len(expected) + 1))
+    assert merged["metrics:area"].isna().sum() == len(merged) - len(expected)
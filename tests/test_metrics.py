@@ -0,0 +1,71 @@
+import numpy as np
+from geopandas import GeoDataFrame, GeoSeries
+from pyproj import Geod
+from pytest import approx
+from shapely.geometry import MultiPolygon, box
+
+from fiboa_cli.metrics import calculate_area, calculate_metrics, fill_metrics, is_metric_crs
+
+
+def _fields(count=10):
+    return GeoSeries([box(10 + i * 0.01, 50, 10.005 + i * 0.01, 50.005) for i in range(count)])
+
+
+def test_is_metric_crs():
+    assert is_metric_crs("EPSG:25832")
+    assert not is_metric_crs("EPSG:4326")
+
+
+def test_calculate_area():
+    fields = _fields().set_crs("EPSG:4326")
+    expected = fields.to_crs("EPSG:6933").area.to_numpy()
+    assert calculate_area(fields) == approx(expected)
+
+    metric = fields.to_crs("EPSG:25832")
+    assert calculate_area(metric) == approx(metric.area.to_numpy())
+
+
+def test_calculate_area_chunked():
+    fields = _fields(25).set_crs("EPSG:4326")
+    expected = calculate_area(fields)
+    result = calculate_area(fields, workers=2, chunk_size=4)
+    assert isinstance(result, np.ndarray)
+    assert result == approx(expected)
+
+
+def test_calculate_metrics():
+    field = box(11, 50, 11.01, 50.01).difference(box(11.002, 50.002, 11.004, 50.004))
+    fields = GeoSeries([field, MultiPolygon([field, box(12, 50, 12.01, 50.01)]), None])
+    fields = fields.set_crs("EPSG:4326")
+    geod = Geod(ellps="WGS84")
+
+    area, perimeter = calculate_metrics(fields, geodesic=True)
+    expected_area = abs(geod.geometry_area_perimeter(field.exterior)[0]) - abs(
+        geod.geometry_area_perimeter(field.interiors[0])[0]
+    )
+    assert area[0] == approx(expected_area)
+    # The perimeter includes the holes, as in shapely
+    expected_perimeter = sum(
+        geod.geometry_length(ring) for ring in (field.exterior, *field.interiors)
+    )
+    assert perimeter[0] == approx(expected_perimeter)
+    assert np.isnan(area[2]) and np.isnan(perimeter[2])
+
+    # Same result in a projected CRS and in parallel chunks
+    projected = calculate_metrics(fields.to_crs("EPSG:25832"), geodesic=True)
+    assert projected[0][:2] == approx(area[:2])
+    chunked = calculate_metrics(fields, geodesic=True, workers=2, chunk_size=1)
+    assert chunked[1][:2] == approx(perimeter[:2])
+
+    # Planar metrics are close to the geodesic metrics for small fields
+    planar_area, planar_perimeter = calculate_metrics(fields)
+    assert planar_area[:2] == approx(area[:2], rel=1e-4)
+    assert planar_perimeter[:2] == approx(perimeter[:2], rel=0.05)
+
+
+def test_fill_metrics():
+    gdf = GeoDataFrame({"area": [0, 5.0, None]}, geometry=_fields(3), crs="EPSG:4326")
+    gdf = fill_metrics(gdf, area="area", perimeter="perimeter")
+    assert gdf["area"][1] == 5
+    assert gdf["area"][[0, 2]].tolist() == approx(calculate_area(gdf.geometry)[[0, 2]])
+    assert gdf["perimeter"].notna().all()
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import shapely
+from pytest import mark
+from vecorel_cli.validation.data import validate_column
+
+from fiboa_cli.parquet.checks import check_column, check_required, format_rows
+
+strings = pa.chunked_array([["DE", "x", None], ["FRA", "de"]])
+numbers = pa.array([0.5, None, 12, -1, float("nan")], pa.float64())
+
+
+@mark.parametrize(
+    "column,rules,expected",
+    [
+        (strings, {"type": "string"}, []),
+        (strings, {"type": "string", "minLength": 2}, [("x", [1])]),
+        (strings, {"type": "string", "minLength": 2, "maxLength": 2}, [("x", [1]), ("FRA", [3])]),
+        (strings, {"type": "string", "pattern": "[A-Z]{2}$"}, [("x", [1, 3, 4])]),
+        (strings, {"type": "string", "enum": ["DE", "FRA"]}, [("x", [1, 4])]),
+        (
+            strings.cast(pa.dictionary(pa.int32(), pa.string())),
+            {"type": "string", "enum": ["DE", "FRA"]},
+            [("x", [1, 4])],
+        ),
+        (numbers, {"type": "double", "minimum": 0, "maximum": 10}, [("-1", [3]), ("12", [2])]),
+        (numbers, {"type": "double", "exclusiveMinimum": 0.5}, [("0.5", [0, 3])]),
+        (pa.array([1, 2, 3], pa.uint8()), {"type": "uint8", "enum": [1, 3]}, [("2", [1])]),
+        (pa.array([[1], [], None]), {"type": "array", "minItems": 1}, [("fewer", [1])]),
+    ],
+)
+def test_check_column(column, rules, expected):
+    issues = check_column(column, rules)
+    assert [list(rows) for _, rows in issues] == [rows for _, rows in expected]
+    for (issue, _), (value, _) in zip(issues, expected):
+        assert value in issue
+
+    # The issue for the first offending value is the same as in the per-value validation
+    if len(issues) == 1:
+        assert issues[0][0] in validate_column(column.to_pandas(), rules)[0]
+
+
+def test_check_column_rows():
+    rows = np.arange(100, 105)
+    issues = check_column(numbers, {"type": "double", "minimum": 0}, rows)
+    assert [list(rows) for _, rows in issues] == [[103]]
+
+
+@mark.parametrize(
+    "rules",
+    [
+        {"type": "object"},
+        {"type": "array", "uniqueItems": True},
+        {"type": "string", "format": "uri"},
+        # Lookarounds are not supported by Arrow (RE2)
+        {"type": "string", "pattern": "^(?!x)"},
+    ],
+)
+def test_check_column_fallback(rules):
+    assert check_column(strings, rules) is None
+
+
+def test_check_column_geometry():
+    geometries = [
+        shapely.box(0, 0, 1, 1),
+        shapely.Polygon([(0, 0), (1, 1), (1, 0), (0, 1), (0, 0)]),
+        None,
+        shapely.Point(0, 0),
+    ]
+    column = pa.array(shapely.to_wkb(geometries), pa.binary())
+    rules = {"type": "geometry", "geometryTypes": ["Polygon", "MultiPolygon"]}
+    issues = check_column(column, rules)
+    assert (
+        issues[0][0]
+        == "Geometry type 'Point' is not one of the allowed types: Polygon, MultiPolygon"
+    )
+    assert list(issues[0][1]) == [3]
+    assert issues[1][0].startswith("Geometry POLYGON ((0 0, 1 1, 1 0, 0 1, 0 0)) is not valid: ")
+    assert list(issues[1][1]) == [1]
+
+
+def test_check_required():
+    assert check_required(pa.array([1, 2])) == []
+    ((issue, rows),) = check_required(strings, np.arange(5) + 10)
+    assert issue == "Required value is missing"
+    assert list(rows) == [12]
+
+
+def test_format_rows():
+    assert format_rows(np.array([5])) == "row 5"
+    assert format_rows(np.arange(3)) == "3 rows: 0, 1, 2"
+    assert format_rows(np.arange(12)) == "12 rows: 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, ..."
+
+
+def test_validate_column_equivalence():
+    # Random values, the same values are invalid with both validations
+    rng = np.random.default_rng(0)
+    values = pd.Series(rng.integers(-5, 20, 50))
+    rules = {"type": "int64", "minimum": 0, "exclusiveMaximum": 15}
+    issues = check_column(pa.array(values), rules)
+    invalid = sorted(np.concatenate([rows for _, rows in issues]))
+    expected = [i for i, v in enumerate(values) if validate_column([v], rules)]
+    assert invalid == expected
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import geopandas
+import numpy as np
+import pyarrow.parquet as pq
+from pytest import mark
+
+from fiboa_cli.parquet.sort import hilbert_keys, hilbert_sort_file
+from fiboa_cli.validate import ValidateData
+
+source = Path("tests/data-files/improve/dk_2024_fiboa_0_2.parquet")
+
+
+@mark.parametrize("bucket_rows", [1_000_000, 50])
+def test_hilbert_sort_file(tmp_path, bucket_rows):
+    target = tmp_path / "sorted.parquet"
+    hilbert_sort_file(source, target, row_group_size=30, bucket_rows=bucket_rows)
+    ValidateData().validate(target)
+
+    pf = pq.ParquetFile(target)
+    assert pf.metadata.num_rows == pq.ParquetFile(source).metadata.num_rows
+    assert pf.metadata.row_group(0).num_rows == 30
+    assert pf.schema_arrow.metadata.keys() == pq.ParquetFile(source).schema_arrow.metadata.keys()
+    assert (np.diff(hilbert_keys(pf).astype(np.int64)) >= 0).all()
+
+    # Same order as GeoDataFrame.sort_values, except for the order of equal keys
+    expected = geopandas.read_parquet(source).sort_values("geometry", kind="stable")
+    actual = geopandas.read_parquet(target)
+    assert actual["id"].tolist() == expected["id"].tolist()
+    assert not list(tmp_path.glob("*.part")) and not list(tmp_path.glob("fiboa-sort-*"))
+
+
+def test_hilbert_sort_file_in_place(tmp_path):
+    target = tmp_path / "file.parquet"
+    target.write_bytes(source.read_bytes())
+    hilbert_sort_file(target, row_group_size=30, bucket_rows=50)
+    assert pq.ParquetFile(target).metadata.num_rows == pq.ParquetFile(source).metadata.num_rows
+    assert [p.name for p in tmp_path.iterdir()] == ["file.parquet"]
+
+
+def test_hilbert_sort_file_without_covering(tmp_path):
+    # The bounding boxes are computed from the geometries
+    unsorted = tmp_path / "unsorted.parquet"
+    geopandas.read_parquet(source).to_parquet(unsorted, write_covering_bbox=False)
+    target = hilbert_sort_file(unsorted, tmp_path / "sorted.parquet", bucket_rows=50)
+
+    expected = geopandas.read_parquet(source).sort_values("geometry", kind="stable")
+    assert geopandas.read_parquet(target)["id"].tolist() == expected["id"].tolist()
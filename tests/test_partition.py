@@ -0,0 +1,112 @@
+import json
+import shutil
+
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from vecorel_cli.vecorel.collection import Collection
+
+from fiboa_cli.convert import ConvertData
+from fiboa_cli.merge import MergeDatasets
+from fiboa_cli.parallel import ordered_map
+from fiboa_cli.parquet.partition import COLLECTION_FILE, PartitionedWriter
+from fiboa_cli.validate import ValidateData
+
+test_path = "tests/data-files/convert/de_sh"
+
+
+def read_dataset(folder, **kwargs):
+    return ds.dataset(folder, format="parquet", partitioning="hive").to_table(**kwargs)
+
+
+def test_convert_partitioned(tmp_path):
+    folder = tmp_path / "de_sh"
+    ConvertData("de_sh").convert(target=tmp_path / "full.parquet", cache=test_path)
+    ConvertData("de_sh").convert(
+        target=folder, cache=test_path, partition_by=["admin:subdivision_code", "year"]
+    )
+
+    # The default variant 2026 contains data for 2024
+    part = folder / "admin:subdivision_code=SH" / "year=2024" / "part-2026.parquet"
+    assert part.exists()
+    ValidateData().validate(part)
+    collection = json.loads((folder / "_collection.json").read_text())
+    assert "de_sh" in collection["schemas"]
+    assert "admin:subdivision_code" not in collection
+
+    full = pq.read_table(tmp_path / "full.parquet")
+    table = read_dataset(folder)
+    assert table.num_rows == full.num_rows
+    assert table.column("admin:subdivision_code").unique().to_pylist() == ["SH"]
+    assert table.column("admin:country_code").unique().to_pylist() == ["DE"]
+    assert read_dataset(folder, filter=ds.field("year") == 2023).num_rows == 0
+
+    # Converting again only replaces the partitions in the data
+    other = folder / "admin:subdivision_code=SH" / "year=2023"
+    other.mkdir()
+    shutil.copy(part, other / "part-2026.parquet")
+    ConvertData("de_sh").convert(
+        target=folder, cache=test_path, partition_by=["admin:subdivision_code", "year"]
+    )
+    assert read_dataset(folder).num_rows == 2 * full.num_rows
+    assert read_dataset(folder, filter=ds.field("year") == 2024).num_rows == full.num_rows
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".")] == []
+
+
+def test_convert_variants_partitioned(tmp_path):
+    # Two variants with data for the same year, converted in parallel processes
+    cache = tmp_path / "cache"
+    cache.mkdir()
+    for year in ["2025", "2026"]:
+        shutil.copy(
+            f"{test_path}/Feldbloecke_2026_GPKG.zip", cache / f"Feldbloecke_{year}_GPKG.zip"
+        )
+    folder = tmp_path / "de_sh"
+    ConvertData("de_sh").convert(
+        target=folder, variant="2025,2026", cache=cache, workers=2, partition_by=["year"]
+    )
+
+    assert sorted(p.name for p in (folder / "year=2024").iterdir()) == [
+        "part-2025.parquet",
+        "part-2026.parquet",
+    ]
+    full = pq.read_table(folder / "year=2024" / "part-2026.parquet")
+    assert read_dataset(folder).num_rows == 2 * full.num_rows
+
+
+def test_merge_partitioned(tmp_path):
+    files = []
+    for name in ["1_vietnam_areas.gpkg", "4_cambodia_areas.gpkg"]:
+        files.append(tmp_path / f"{name}.parquet")
+        input_files = {f"tests/data-files/convert/ai4sf/{name}": name}
+        ConvertData("ai4sf").convert(target=files[-1], input_files=input_files)
+    folder = tmp_path / "merged"
+    MergeDatasets().merge(
+        files, folder, includes=["admin:country_code"], partition_by=["admin:country_code"]
+    )
+
+    assert {p.name for p in folder.iterdir()} == {
+        "_collection.json",
+        "admin:country_code=KH",
+        "admin:country_code=VN",
+    }
+    rows = [pq.ParquetFile(f).metadata.num_rows for f in files]
+    assert read_dataset(folder).num_rows == sum(rows)
+    kh = read_dataset(folder, filter=ds.field("admin:country_code") == "KH")
+    assert kh.num_rows == rows[1]
+
+
+def _write_collection(job):
+    # Runs in a separate process
+    folder, i = job
+    collection = Collection({"schemas": {f"variant-{i}": ["https://example.com/schema.yaml"]}})
+    PartitionedWriter(folder, ["year"], collection).write_collection()
+
+
+def test_write_collection_parallel(tmp_path):
+    # e.g. variants that are converted into the same folder in parallel
+    jobs = [(tmp_path, i) for i in range(16)]
+    list(ordered_map(_write_collection, jobs, workers=8, processes=True))
+
+    collection = json.loads((tmp_path / COLLECTION_FILE).read_text())
+    assert sorted(collection["schemas"]) == sorted(f"variant-{i}" for i in range(16))
+    assert sorted(p.name for p in tmp_path.iterdir()) == [COLLECTION_FILE]
@@ -1,8 +1,14 @@
+import json
 from pathlib import Path
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
+import shapely
 from jsonschema.exceptions import ValidationError
+from vecorel_cli.encoding.geoparquet import GeoParquet
 
+from fiboa_cli.convert import ConvertData
 from fiboa_cli.validate import ValidateData
 
 
@@ -51,3 +57,62 @@ def test_validate(test):
                 assert error == expect
 
         assert not result.is_valid()
+
+
+@pytest.fixture
+def de_sh_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(GeoParquet, "row_group_size", 30)
+    file = tmp_path / "de_sh.parquet"
+    ConvertData("de_sh").convert(target=file, cache="tests/data-files/convert/de_sh")
+    return file
+
+
+def test_validate_row_groups(tmp_path, de_sh_file):
+    result = ValidateData().validate(de_sh_file, num=-1, workers=2)
+    assert result.is_valid()
+    assert result.warnings == []
+
+    # Self-intersecting polygons in the first, second and last row group
+    table = pq.read_table(de_sh_file)
+    geometries = table.column("geometry").to_pylist()
+    bowtie = shapely.to_wkb(shapely.Polygon([(0, 0), (1, 1), (1, 0), (0, 1), (0, 0)]))
+    for i in [0, 40, 95]:
+        geometries[i] = bowtie
+    index = table.column_names.index("geometry")
+    table = table.set_column(index, table.field("geometry"), pa.array(geometries, pa.binary()))
+    invalid_file = tmp_path / "invalid.parquet"
+    pq.write_table(table, invalid_file, row_group_size=30)
+
+    result = ValidateData().validate(invalid_file, num=-1, workers=2)
+    assert not result.is_valid()
+    assert [str(e).split(" (")[-1] for e in result.errors] == [
+        "row group 0, row 0)",
+        "row group 1, row 40)",
+        "row group 3, row 95)",
+    ]
+    assert all(str(e).startswith("geometry: Geometry ") for e in result.errors)
+
+    result = ValidateData().validate(invalid_file, num=-1, workers=2, max_errors=1)
+    assert len(result.errors) == 1
+    assert "only 1 of 4 row groups were checked" in result.warnings[0]
+
+
+@pytest.mark.parametrize("constant", [None, "de_sh", "unknown"])
+def test_validate_row_groups_collection_constant(tmp_path, de_sh_file, constant):
+    # Multiple collections, but no collection column
+    table = pq.read_table(de_sh_file).drop_columns(["collection"])
+    collection = json.loads(table.schema.metadata[b"collection"])
+    collection["schemas"]["other"] = collection["schemas"]["de_sh"]
+    if constant is not None:
+        collection["collection"] = constant
+    metadata = table.schema.metadata | {b"collection": json.dumps(collection).encode()}
+    file = tmp_path / "multiple.parquet"
+    pq.write_table(table.replace_schema_metadata(metadata), file, row_group_size=30)
+
+    result = ValidateData().validate(file, num=-1, workers=2)
+    if constant == "de_sh":
+        assert result.errors == []
+    else:
+        assert [str(e) for e in result.errors] == [
+            "collection: Required field is missing, the rows can't be assigned to one of the collections"
+        ]
@@ -0,0 +1,87 @@
+from io import BytesIO
+
+import geopandas as gpd
+from pytest import mark
+from shapely.geometry import box
+
+from fiboa_cli.conversion.converter_wfs import TiledWFSConverterMixin, WFSConverterMixin
+from fiboa_cli.conversion.fiboa_converter import FiboaBaseConverter
+
+features = gpd.GeoDataFrame(
+    {"fid_": range(250)}, geometry=[box(i, 0, i + 1, 1) for i in range(250)], crs="EPSG:4326"
+)
+
+
+class Converter(WFSConverterMixin, FiboaBaseConverter):
+    wfs_type_names = "fields"
+    wfs_page_size = 100
+    wfs_workers = 2
+
+
+class TiledConverter(TiledWFSConverterMixin, FiboaBaseConverter):
+    wfs_type_names = "fields"
+    wfs_page_size = 100
+    wfs_workers = 2
+    wfs_bbox = (0, 0, 250, 1)
+    wfs_id_column = "fid_"
+
+
+def to_gml(page, **attributes):
+    if len(page) == 0:
+        return b'<wfs:FeatureCollection numberReturned="0"></wfs:FeatureCollection>'
+    file = BytesIO()
+    page.to_file(file, driver="GML")
+    content = file.getvalue()
+    for key, value in attributes.items():
+        content = content.replace(
+            b"<ogr:FeatureCollection", f'<ogr:FeatureCollection {key}="{value}"'.encode(), 1
+        )
+    return content
+
+
+def wfs_route(hits):
+    def respond(query):
+        if query.get("resultType") == "hits":
+            return f'<wfs:FeatureCollection numberMatched="{hits}"/>'.encode()
+        start, count = int(query["startIndex"]), int(query["count"])
+        return to_gml(features.iloc[start : start + count])
+
+    return respond
+
+
+@mark.parametrize("hits", ["250", "unknown"])
+def test_wfs_paging(http_server, hits):
+    http_server.routes["/wfs"] = wfs_route(hits)
+    converter = Converter()
+    converter.wfs_url = f"{http_server.url}/wfs"
+
+    paths = converter.download_files(converter.get_urls())
+    pages = [data for data, *_ in converter.get_data(paths)]
+    assert [len(page) for page in pages] == [100, 100, 50]
+    assert [fid for page in pages for fid in page["fid_"]] == list(range(250))
+
+    page_requests = [r for r in http_server.requests if "startIndex" in r]
+    if hits == "unknown":
+        # Paging stops at the first empty page, but pages are requested ahead of time
+        assert len(page_requests) >= 4
+    else:
+        assert len(page_requests) == 3
+
+
+def test_wfs_tiles(http_server):
+    def respond(query):
+        x1, y1, x2, y2 = map(float, query["bbox"].split(","))
+        # Features on the tile edges are returned for both tiles
+        matched = features.cx[x1:x2, y1:y2]
+        return to_gml(matched.iloc[: int(query["count"])], numberMatched=len(matched))
+
+    http_server.routes["/wfs"] = respond
+    converter = TiledConverter()
+    converter.wfs_url = f"{http_server.url}/wfs"
+
+    paths = converter.download_files(converter.get_urls())
+    data = [data for data, *_ in converter.get_data(paths)]
+    ids = [fid for page in data for fid in page["fid_"]]
+    assert sorted(ids) == list(range(250))
+    # All features span the full height, so every tile has 125 features and is split once
+    assert len(http_server.requests) == 4 + 4 * 4